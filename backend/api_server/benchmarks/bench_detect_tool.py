@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: compiled DomainIndex vs the original linear substring scan
+used by /detect-tool, at 20, 1k and 100k patterns.
+
+Usage:
+    python benchmarks/bench_detect_tool.py
+    python benchmarks/bench_detect_tool.py --sizes 20 1000 100000 --lookups 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from tool_index import DomainIndex  # noqa: E402
+
+BASE_PATTERNS = {
+    "github.com": "GitHub",
+    "gitlab.com": "GitLab",
+    "bitbucket.org": "Bitbucket",
+    "stackoverflow.com": "Stack Overflow",
+    "docs.python.org": "Python Docs",
+    "developer.mozilla.org": "MDN",
+    "reactjs.org": "React",
+    "angular.io": "Angular",
+    "vuejs.org": "Vue.js",
+    "nodejs.org": "Node.js",
+    "aws.amazon.com": "AWS",
+    "cloud.google.com": "Google Cloud",
+    "azure.microsoft.com": "Azure",
+    "docker.com": "Docker",
+    "kubernetes.io": "Kubernetes",
+    "figma.com": "Figma",
+    "notion.so": "Notion",
+    "slack.com": "Slack",
+    "trello.com": "Trello",
+    "jira.atlassian.com": "Jira",
+}
+
+
+def make_patterns(size, rng):
+    patterns = dict(list(BASE_PATTERNS.items())[:size])
+    i = 0
+    while len(patterns) < size:
+        host = f"app{i}.customer{rng.randrange(size)}.example.com"
+        if i % 10 == 0:
+            host += f"/workspace{i % 97}"
+        patterns[host] = f"Tool {i}"
+        i += 1
+    return patterns
+
+
+def make_urls(patterns, count, rng):
+    keys = list(patterns)
+    urls = []
+    for n in range(count):
+        if n % 4 == 3:
+            urls.append(f"https://unknown{n}.example.org/some/page")  # miss
+        else:
+            urls.append(f"https://{rng.choice(keys)}/path/{n}?q=1")
+    return urls
+
+
+def linear_detect(patterns, url):
+    """The original /detect-tool loop."""
+    url = url.lower()
+    for pattern, tool_name in patterns.items():
+        if pattern in url:
+            return tool_name
+    return None
+
+
+def bench(fn, urls, budget):
+    """Runs fn over urls until budget seconds pass; returns (lookups, µs/lookup)."""
+    done = 0
+    start = time.perf_counter()
+    while True:
+        for url in urls:
+            fn(url)
+        done += len(urls)
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return done, elapsed / done * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 1000, 100000])
+    parser.add_argument("--lookups", type=int, default=2000, help="Distinct URLs per size")
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds per measurement")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    results = []
+    print(f"{'patterns':>10}{'build ms':>12}{'linear µs':>14}{'index µs':>12}{'speedup':>10}{'agree':>8}")
+    for size in args.sizes:
+        patterns = make_patterns(size, rng)
+        urls = make_urls(patterns, args.lookups, rng)
+
+        start = time.perf_counter()
+        index = DomainIndex.from_mapping(patterns)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        _, linear_us = bench(lambda u: linear_detect(patterns, u), urls, args.budget)
+        _, index_us = bench(index.lookup, urls, args.budget)
+        agree = sum(1 for u in urls if linear_detect(patterns, u) == index.lookup(u)) / len(urls)
+
+        results.append({
+            "patterns": size,
+            "build_ms": round(build_ms, 3),
+            "linear_us_per_lookup": round(linear_us, 3),
+            "index_us_per_lookup": round(index_us, 3),
+            "speedup": round(linear_us / index_us, 1),
+            "agreement": round(agree, 4),
+        })
+        print(f"{size:>10}{build_ms:>12.2f}{linear_us:>14.2f}{index_us:>12.2f}"
+              f"{linear_us / index_us:>9.1f}x{agree:>8.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Bytes, write syscalls and CPU per /chat answer under different flush policies.
+
+For each policy (STREAM_FLUSH_MS / STREAM_FLUSH_BYTES) this starts
+benchmarks/fake_ollama.py and the API server (uvicorn main:app) as
+subprocesses, streams --answers general-path answers through /chat with
+--concurrency clients, and reads the server's CPU time and write syscalls
+from /proc/<pid>/stat and /proc/<pid>/io (Linux only). Client-side it
+records HTTP chunks received, body bytes and time to first token; the
+server's bytes written include chunked-encoding framing and its own logs.
+
+Usage:
+    python benchmarks/bench_flush.py
+    python benchmarks/bench_flush.py --policies 0:0 50:1024 100:4096 --rate 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(HERE)
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def proc_counters(pid: int) -> dict:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    counters = {"cpu_s": (int(fields[11]) + int(fields[12])) / CLOCK_TICKS}
+    with open(f"/proc/{pid}/io") as f:
+        for line in f:
+            key, value = line.split(":")
+            counters[key] = int(value)
+    return counters
+
+
+async def wait_ready(url: str, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def run_answers(port: int, answers: int, concurrency: int) -> dict:
+    body = {"query": "What is a variable in programming?", "url": "https://example.com", "context_text": "page"}
+    chunks, sizes, ttfts = [], [], []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client):
+        async with semaphore:
+            start = time.perf_counter()
+            count = size = 0
+            async with client.stream("POST", f"http://127.0.0.1:{port}/chat", json=body) as response:
+                async for chunk in response.aiter_raw():
+                    if count == 0:
+                        ttfts.append(time.perf_counter() - start)
+                    count += 1
+                    size += len(chunk)
+            chunks.append(count)
+            sizes.append(size)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await asyncio.gather(*(one(client) for _ in range(answers)))
+    return {
+        "chunks_per_answer": statistics.mean(chunks),
+        "bytes_per_answer": statistics.mean(sizes),
+        "ttft_ms_p50": statistics.median(ttfts) * 1000,
+    }
+
+
+def bench_policy(args, interval_ms: float, max_bytes: int) -> dict:
+    env = dict(
+        os.environ,
+        OLLAMA_URLS=f"http://127.0.0.1:{args.ollama_port}",
+        CONVEX_URL="http://127.0.0.1:9",
+        STREAM_FLUSH_MS=str(interval_ms),
+        STREAM_FLUSH_BYTES=str(max_bytes),
+        CLASSIFIER_LLM_FALLBACK="false",
+        OLLAMA_WARMUP="false",
+        OLLAMA_MAX_INFLIGHT=str(args.concurrency),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(wait_ready(f"http://127.0.0.1:{args.port}/"))
+        asyncio.run(run_answers(args.port, min(args.concurrency, 4), args.concurrency))  # warm up
+        before = proc_counters(server.pid)
+        client = asyncio.run(run_answers(args.port, args.answers, args.concurrency))
+        after = proc_counters(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "policy": f"{interval_ms:g}ms/{max_bytes}B" if interval_ms > 0 else "every token",
+        "chunks_per_answer": round(client["chunks_per_answer"], 1),
+        "bytes_per_answer": round(client["bytes_per_answer"]),
+        "bytes_written_per_answer": round((after["wchar"] - before["wchar"]) / args.answers),
+        "write_syscalls_per_answer": round((after["syscw"] - before["syscw"]) / args.answers, 1),
+        "cpu_ms_per_answer": round((after["cpu_s"] - before["cpu_s"]) * 1000 / args.answers, 2),
+        "ttft_ms_p50": round(client["ttft_ms_p50"], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policies", nargs="+", default=["0:0", "50:1024", "100:4096", "250:8192"],
+                        help="interval_ms:max_bytes pairs; 0:0 flushes every token")
+    parser.add_argument("--answers", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens per answer")
+    parser.add_argument("--rate", type=float, default=40.0, help="Fake Ollama tokens/sec per stream")
+    parser.add_argument("--port", type=int, default=8197)
+    parser.add_argument("--ollama-port", type=int, default=11597)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    fake = subprocess.Popen([
+        sys.executable, os.path.join(HERE, "fake_ollama.py"), "--port", str(args.ollama_port),
+        "--tokens", str(args.tokens), "--tokens-per-second", str(args.rate),
+    ])
+    try:
+        report = []
+        for policy in args.policies:
+            interval_ms, max_bytes = policy.split(":")
+            report.append(bench_policy(args, float(interval_ms), int(max_bytes)))
+    finally:
+        fake.terminate()
+        fake.wait()
+
+    print(f"\n{args.answers} answers, {args.tokens} tokens at {args.rate:g} tok/s, {args.concurrency} concurrent\n")
+    print(f"{'policy':<16}{'chunks':>8}{'body bytes':>12}{'bytes written':>15}{'write syscalls':>16}"
+          f"{'cpu ms':>9}{'ttft ms':>9}")
+    for row in report:
+        print(f"{row['policy']:<16}{row['chunks_per_answer']:>8}{row['bytes_per_answer']:>12}"
+              f"{row['bytes_written_per_answer']:>15}"
+              f"{row['write_syscalls_per_answer']:>16}{row['cpu_ms_per_answer']:>9}{row['ttft_ms_p50']:>9}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Offline recall/latency benchmark for RAG retrieval.
+
+Compares local BM25, vector and hybrid (RRF) retrieval from the vector index
+with the remote Convex text search (KNOWLEDGE_SEARCH_PATH). A hit is any returned
+chunk whose url is one of the query's relevant urls.
+
+Without --dataset, queries are synthesized from the index: a sentence is
+sampled from a random chunk and its page url is the relevant answer.
+
+Usage:
+    python benchmarks/bench_retrieval.py --index-dir vector_store --tools GitHub Figma
+    python benchmarks/bench_retrieval.py --dataset labeled.jsonl --no-remote
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from embeddings import build_embedder  # noqa: E402
+from retrieval import HybridRetriever  # noqa: E402
+from upstreams import convex_upstream, ollama_upstream  # noqa: E402
+from vector_index import VectorIndex  # noqa: E402
+
+
+def synthesize_queries(index, tools, count, rng):
+    queries = []
+    for tool in tools:
+        chunks = index.partition(tool).chunks
+        if not chunks:
+            continue
+        for _ in range(count):
+            chunk = rng.choice(chunks)
+            sentences = [s for s in re.split(r"(?<=[.!?])\s+|\n+", chunk["content"]) if len(s.split()) >= 5]
+            if not sentences:
+                continue
+            words = rng.choice(sentences).split()[:12]
+            queries.append({"tool_name": tool, "query": " ".join(words), "relevant_urls": [chunk["url"]]})
+    return queries
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def evaluate(name, search, queries, k):
+    hits, latencies, reciprocal_ranks = 0, [], []
+    for q in queries:
+        start = time.perf_counter()
+        results = await search(q["tool_name"], q["query"], k)
+        latencies.append(time.perf_counter() - start)
+        urls = [r.get("url") for r in results]
+        rank = next((i for i, url in enumerate(urls, 1) if url in q["relevant_urls"]), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    return {
+        "retriever": name,
+        f"recall@{k}": round(hits / len(queries), 4),
+        "mrr": round(statistics.mean(reciprocal_ranks), 4),
+        "latency_ms_p50": round(percentile(latencies, 50) * 1000, 3),
+        "latency_ms_p95": round(percentile(latencies, 95) * 1000, 3),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", default=os.getenv("VECTOR_INDEX_DIR", "vector_store"))
+    parser.add_argument("--dataset", help="JSONL with tool_name, query, relevant_urls")
+    parser.add_argument("--tools", nargs="+", help="Tools to sample synthetic queries from")
+    parser.add_argument("--queries-per-tool", type=int, default=50)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--no-remote", action="store_true", help="Skip the Convex searchKnowledge baseline")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    ollama = ollama_upstream(os.getenv("OLLAMA_URL", "http://127.0.0.1:11434"))
+    convex = convex_upstream(os.getenv("CONVEX_URL", "https://abundant-porpoise-181.convex.cloud"))
+    await ollama.start()
+    await convex.start()
+    try:
+        index = VectorIndex(args.index_dir, build_embedder(ollama))
+        if args.dataset:
+            with open(args.dataset) as f:
+                queries = [json.loads(line) for line in f if line.strip()]
+        else:
+            tools = args.tools or sorted(os.listdir(args.index_dir))
+            queries = synthesize_queries(index, tools, args.queries_per_tool, random.Random(7))
+        if not queries:
+            sys.exit("No queries: build the index first or pass --dataset")
+
+        searchers = {}
+        for mode in ("bm25", "vector", "hybrid"):
+            retriever = HybridRetriever(index, mode=mode)
+            # Warm the per-tool BM25 index so build time is not counted as query latency
+            for tool in {q["tool_name"] for q in queries}:
+                await retriever.bm25(tool)
+            searchers[mode] = retriever.retrieve
+
+        if not args.no_remote:
+            async def remote(tool_name, query, limit):
+                response = await convex.client.post("/api/query", json={
+                    "path": os.getenv("KNOWLEDGE_SEARCH_PATH", "doc_chunks:search"),
+                    "args": {"query": query, "tool_name": tool_name, "limit": limit}
+                })
+                response.raise_for_status()
+                return response.json().get("value", [])
+            searchers["convex (remote)"] = remote
+
+        report = [await evaluate(name, search, queries, args.k) for name, search in searchers.items()]
+    finally:
+        await ollama.close()
+        await convex.close()
+
+    recall_key = f"recall@{args.k}"
+    print(f"{len(queries)} queries\n")
+    print(f"{'retriever':<18}{recall_key:>10}{'mrr':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in report:
+        print(f"{row['retriever']:<18}{row[recall_key]:>10.3f}{row['mrr']:>8.3f}"
+              f"{row['latency_ms_p50']:>10.2f}{row['latency_ms_p95']:>10.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"queries": len(queries), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
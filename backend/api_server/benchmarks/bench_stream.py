@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+CPU cost of relaying Ollama chat streams through stream_ollama_response.
+
+Starts benchmarks/fake_ollama.py in a subprocess (so its CPU is not counted),
+then drives N concurrent /api/chat streams through the server's own
+stream_ollama_response in three modes:
+
+    reparse (json)     json.loads + json.dumps on every line (the old path)
+    reparse (orjson)   the same with orjson, if installed
+    passthrough        raw bytes forwarded untouched (STREAM_PASSTHROUGH=true)
+
+Reports CPU per stream and per token, and the streams one worker could
+sustain at --rate tokens/sec per stream before a core is saturated.
+
+Usage:
+    python benchmarks/bench_stream.py
+    python benchmarks/bench_stream.py --concurrency 100 --tokens 400 --rate 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def stdlib_dumps_line(obj) -> bytes:
+    return (json.dumps(obj) + "\n").encode()
+
+
+async def drive(main, concurrency: int, rounds: int) -> tuple:
+    messages = [{"role": "user", "content": "benchmark"}]
+
+    async def one():
+        received = 0
+        async for chunk in main.stream_ollama_response(messages, is_chat=True):
+            received += len(chunk)
+        return received
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    received = 0
+    for _ in range(rounds):
+        received += sum(await asyncio.gather(*(one() for _ in range(concurrency))))
+    return time.process_time() - cpu_start, time.perf_counter() - wall_start, received
+
+
+async def run(args):
+    import main
+    import ndjson
+
+    await main.ollama.start()
+    modes = [("reparse (json)", False, json.loads, stdlib_dumps_line)]
+    if ndjson.CODEC == "orjson":
+        modes.append(("reparse (orjson)", False, ndjson.loads, ndjson.dumps_line))
+    modes.append(("passthrough", True, ndjson.loads, ndjson.dumps_line))
+
+    report = []
+    try:
+        await drive(main, 4, 1)  # warm connections
+        for name, passthrough, loads, dumps_line in modes:
+            main.STREAM_PASSTHROUGH = passthrough
+            main.ndjson.loads, main.ndjson.dumps_line = loads, dumps_line
+            cpu, wall, received = await drive(main, args.concurrency, args.rounds)
+            streams = args.concurrency * args.rounds
+            cpu_per_token = cpu / (streams * args.tokens)
+            report.append({
+                "mode": name,
+                "streams": streams,
+                "cpu_ms_per_stream": round(cpu * 1000 / streams, 3),
+                "cpu_us_per_token": round(cpu_per_token * 1e6, 2),
+                "max_streams_per_worker": int(1 / (cpu_per_token * args.rate)),
+                "wall_s": round(wall, 2),
+                "bytes": received,
+            })
+    finally:
+        await main.ollama.close()
+    return report
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--tokens", type=int, default=300, help="Tokens per answer")
+    parser.add_argument("--rate", type=float, default=30.0, help="Tokens/sec per stream in production")
+    parser.add_argument("--port", type=int, default=11598)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    fake = subprocess.Popen([
+        sys.executable, os.path.join(HERE, "fake_ollama.py"), "--port", str(args.port),
+        "--tokens", str(args.tokens), "--tokens-per-second", "2000", "--first-token-delay", "0",
+    ])
+    os.environ["OLLAMA_URLS"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("OLLAMA_MAX_CONNECTIONS", str(args.concurrency * 2))
+    try:
+        time.sleep(1.5)
+        report = asyncio.run(run(args))
+    finally:
+        fake.terminate()
+        fake.wait()
+
+    print(f"\n{args.concurrency} concurrent streams x {args.rounds} rounds, {args.tokens} tokens each\n")
+    print(f"{'mode':<18}{'cpu ms/stream':>15}{'cpu us/token':>14}{'max streams @' + str(int(args.rate)) + 'tok/s':>22}")
+    for row in report:
+        print(f"{row['mode']:<18}{row['cpu_ms_per_stream']:>15.2f}{row['cpu_us_per_token']:>14.2f}"
+              f"{row['max_streams_per_worker']:>22}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the /chat query classifier tiers.
+
+Reports accuracy and per-query latency for each local tier, the tiered
+classifier (local tiers only) and, with --llm, the original Ollama
+classifier plus how often the tiered classifier agrees with it. For each
+tier, coverage is the share of queries it answers at or above the
+confidence threshold (the ones the cascade would not pass on), and
+covered accuracy is its accuracy on those.
+
+Two labeled sets ship in benchmarks/data: classifier_eval.jsonl was
+written alongside the rules and only shows they do what they were written
+for; classifier_heldout.jsonl was written afterwards without looking at
+them, and is the one that says how the rules generalize.
+
+Usage:
+    python benchmarks/eval_classifier.py
+    python benchmarks/eval_classifier.py --dataset benchmarks/data/classifier_eval.jsonl
+    python benchmarks/eval_classifier.py --examples train.jsonl --llm
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from classifier import (  # noqa: E402
+    CentroidClassifier,
+    RuleClassifier,
+    TieredClassifier,
+    load_tool_vocabulary,
+)
+
+
+def load_dataset(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, predictions, latencies, dataset, confident=None):
+    correct = [p == row["label"] for p, row in zip(predictions, dataset)]
+    confident = confident or [True] * len(dataset)
+    covered = [ok for ok, sure in zip(correct, confident) if sure]
+    return {
+        "classifier": name,
+        "accuracy": round(sum(correct) / len(dataset), 4),
+        "coverage": round(len(covered) / len(dataset), 4),
+        "covered_accuracy": round(sum(covered) / len(covered), 4) if covered else None,
+        "latency_ms_mean": round(statistics.mean(latencies) * 1000, 4),
+        "latency_ms_p50": round(percentile(latencies, 50) * 1000, 4),
+        "latency_ms_p95": round(percentile(latencies, 95) * 1000, 4),
+    }
+
+
+def run_sync(classifier, dataset, threshold):
+    predictions, latencies, confident = [], [], []
+    for row in dataset:
+        start = time.perf_counter()
+        result = classifier.classify(row["query"], row.get("tool_name"), row.get("context_text", ""))
+        latencies.append(time.perf_counter() - start)
+        predictions.append(result.label)
+        confident.append(result.confidence >= threshold)
+    return predictions, latencies, confident
+
+
+async def run_async(classify, dataset):
+    predictions, latencies = [], []
+    for row in dataset:
+        start = time.perf_counter()
+        label = await classify(row["query"], row.get("tool_name"), row.get("context_text", ""))
+        latencies.append(time.perf_counter() - start)
+        predictions.append(label if isinstance(label, str) else label.label)
+    return predictions, latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=os.path.join(HERE, "data", "classifier_heldout.jsonl"))
+    parser.add_argument("--tools-config", default=os.path.join(os.path.dirname(HERE), "tools_config.json"))
+    parser.add_argument("--examples", help="Labeled JSONL to train the centroid tier")
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--llm", action="store_true", help="Also run the Ollama classifier (needs OLLAMA_URL)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.dataset)
+    rules = RuleClassifier(load_tool_vocabulary(args.tools_config))
+    tiers = [rules]
+    if args.examples:
+        centroid = CentroidClassifier.from_file(args.examples)
+        if centroid is not None:
+            tiers.append(centroid)
+
+    report = []
+    local_predictions = {}
+    unanswered = [True] * len(dataset)  # no local tier confident: the cascade would ask the LLM
+    for tier in tiers:
+        predictions, latencies, confident = run_sync(tier, dataset, args.threshold)
+        local_predictions[tier.name] = predictions
+        unanswered = [u and not c for u, c in zip(unanswered, confident)]
+        report.append(summarize(tier.name, predictions, latencies, dataset, confident))
+
+    tiered = TieredClassifier(tiers, None, args.threshold)
+    tiered_predictions, latencies = await run_async(tiered.classify, dataset)
+    row = summarize("tiered (no llm)", tiered_predictions, latencies, dataset, [not u for u in unanswered])
+    row["llm_fallback_rate"] = round(sum(unanswered) / len(dataset), 4)
+    report.append(row)
+
+    if args.llm:
+        import main as server
+
+        await server.ollama.start()
+        try:
+            llm_predictions, latencies = await run_async(server.llm_classify_query, dataset)
+            report.append(summarize("llm", llm_predictions, latencies, dataset))
+
+            tiered = TieredClassifier(tiers, server.llm_classify_query, args.threshold)
+            predictions, latencies = await run_async(tiered.classify, dataset)
+            row = summarize("tiered (llm fallback)", predictions, latencies, dataset)
+            row["agreement_with_llm"] = round(
+                sum(1 for a, b in zip(predictions, llm_predictions) if a == b) / len(dataset), 4
+            )
+            row["llm_fallback_rate"] = tiered.stats()["llm_fallback_rate"]
+            report.append(row)
+        finally:
+            await server.ollama.close()
+
+    print(f"{len(dataset)} queries from {os.path.basename(args.dataset)}, threshold {args.threshold}\n")
+    print(f"{'classifier':<24}{'accuracy':>10}{'coverage':>10}{'covered acc':>13}"
+          f"{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in report:
+        covered_accuracy = "-" if row["covered_accuracy"] is None else f"{row['covered_accuracy']:.3f}"
+        print(f"{row['classifier']:<24}{row['accuracy']:>10.3f}{row['coverage']:>10.3f}{covered_accuracy:>13}"
+              f"{row['latency_ms_mean']:>10.3f}{row['latency_ms_p50']:>10.3f}{row['latency_ms_p95']:>10.3f}")
+        if "agreement_with_llm" in row:
+            print(f"{'':<24}agreement with llm: {row['agreement_with_llm']:.3f}, "
+                  f"llm fallback rate: {row['llm_fallback_rate']:.3f}")
+        elif "llm_fallback_rate" in row:
+            print(f"{'':<24}would fall back to the llm: {row['llm_fallback_rate']:.3f}")
+
+    misses = [row for row, p in zip(dataset, tiered_predictions) if p != row["label"]]
+    if misses:
+        print(f"\nTiered (no llm) misses ({len(misses)}):")
+        for row in misses:
+            print(f"  [{row['label']}] {row['query']} ({row.get('tool_name')})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"dataset": args.dataset, "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Fake Convex deployment for load tests: answers the /api/query functions the
+API server calls with canned scrapedata documents after a configurable delay.
+
+    scrapedata:listTools          tool names with documents
+    doc_chunks:search             up to `limit` documents for the tool
+    knowledge:searchKnowledge     same (KNOWLEDGE_SEARCH_PATH=knowledge:searchKnowledge)
+    scrapedata:searchKnowledge    same (KNOWLEDGE_FALLBACK_PATH)
+    scrapedata:pageForBackfill    paginated documents (vector_index.py sync)
+
+Usage:
+    python benchmarks/fake_convex.py --port 3210 --latency 0.05
+    CONVEX_URL=http://127.0.0.1:3210 python main.py
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from fastapi import FastAPI, Request
+
+TOOLS = {
+    "GitHub": [
+        ("Creating a pull request", "https://docs.github.com/pull-requests",
+         "To create a pull request, push your branch and click Compare & pull request. "
+         "Add a title and description, then request reviewers from the sidebar."),
+        ("Managing issues", "https://docs.github.com/issues",
+         "Open the Issues tab and click New issue. Labels and milestones help triage; "
+         "assignees get notified when the issue changes."),
+        ("Branch protection", "https://docs.github.com/branch-protection",
+         "Under Settings > Branches add a rule to require reviews and passing status checks before merging."),
+    ],
+    "Figma": [
+        ("Exporting assets", "https://help.figma.com/export",
+         "Select a frame and use the Export panel in the right sidebar to export PNG, JPG, SVG or PDF."),
+        ("Auto layout", "https://help.figma.com/auto-layout",
+         "Press Shift+A to add auto layout. Padding and spacing are set in the design panel."),
+    ],
+}
+
+
+def documents() -> list:
+    docs = []
+    for tool, pages in TOOLS.items():
+        for i, (title, url, content) in enumerate(pages):
+            docs.append({"_id": f"{tool.lower()}-{i}", "tool_name": tool, "title": title, "url": url,
+                         "content": f"# {title}\n\n{content}", "crawled_at": 1})
+    return docs
+
+
+def create_app(latency: float = 0.05, jitter: float = 0.0, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Fake Convex")
+    rng = random.Random(seed)
+    docs = documents()
+    state = {"queries": {}}
+
+    @app.post("/api/query")
+    async def query(request: Request):
+        body = await request.json()
+        path, args = body.get("path"), body.get("args") or {}
+        state["queries"][path] = state["queries"].get(path, 0) + 1
+        await asyncio.sleep(max(latency + rng.uniform(-jitter, jitter), 0))
+        if path == "scrapedata:listTools":
+            value = sorted(TOOLS)
+        elif path in ("doc_chunks:search", "knowledge:searchKnowledge", "scrapedata:searchKnowledge"):
+            value = [d for d in docs if d["tool_name"].lower() == str(args.get("tool_name", "")).lower()]
+            value = value[: int(args.get("limit", 5))]
+        elif path == "scrapedata:pageForBackfill":
+            start = int(args.get("cursor") or 0)
+            end = start + int(args.get("limit", 100))
+            value = {"page": docs[start:end], "isDone": end >= len(docs), "continueCursor": str(end)}
+        else:
+            return {"status": "error", "errorMessage": f"Unknown function {path}"}
+        return {"status": "success", "value": value}
+
+    @app.get("/fake/stats")
+    async def stats():
+        return {"queries": state["queries"], "time": time.time()}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=3210)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per query")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to each query")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.jitter), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Fake Ollama server for exercising the backend pool without GPUs.
+
+Implements /api/chat, /api/generate (streaming or not), /api/embed, /api/ps
+and /api/tags with a configurable token rate and failure modes:
+
+    --fail-rate     fraction of streams answered with HTTP 500
+    --drop-rate     fraction of streams whose connection drops before any token
+    --down          refuse health checks (simulates a box being drained)
+
+Usage:
+    python benchmarks/fake_ollama.py --port 11501 --tokens-per-second 40
+    python benchmarks/fake_ollama.py --port 11502 --fail-rate 0.5
+    OLLAMA_URLS=http://127.0.0.1:11501,http://127.0.0.1:11502 python main.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = "Navigator reads the page context and answers with grounded steps for the current tool".split()
+
+
+def create_app(tokens: int = 24, tokens_per_second: float = 50.0, first_token_delay: float = 0.05,
+               fail_rate: float = 0.0, drop_rate: float = 0.0, down: bool = False, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+    rng = random.Random(seed)
+    state = {"requests": 0, "inflight": 0, "models": set()}
+
+    def final_line(model: str, key: str) -> dict:
+        line = {"model": model, "done": True, "eval_count": tokens,
+                "eval_duration": int(tokens / tokens_per_second * 1e9)}
+        line[key] = {"role": "assistant", "content": ""} if key == "message" else ""
+        return line
+
+    async def generate(body: dict, key: str):
+        model = body.get("model", "fake")
+        state["requests"] += 1
+        if rng.random() < fail_rate:
+            raise HTTPException(status_code=500, detail="fake failure")
+        if not body.get("stream", True):
+            await asyncio.sleep(first_token_delay)
+            state["models"].add(model)
+            line = final_line(model, key)
+            line[key] = {"role": "assistant", "content": "general"} if key == "message" else "general"
+            return line
+        drop = rng.random() < drop_rate
+
+        async def lines():
+            state["inflight"] += 1
+            try:
+                await asyncio.sleep(first_token_delay)
+                if drop:
+                    raise ConnectionResetError("fake connection drop")
+                state["models"].add(model)
+                for i in range(tokens):
+                    text = ("" if i == 0 else " ") + WORDS[i % len(WORDS)]
+                    content = {"role": "assistant", "content": text} if key == "message" else text
+                    yield json.dumps({"model": model, key: content, "done": False}) + "\n"
+                    await asyncio.sleep(1 / tokens_per_second)
+                yield json.dumps(final_line(model, key)) + "\n"
+            finally:
+                state["inflight"] -= 1
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        return await generate(await request.json(), "message")
+
+    @app.post("/api/generate")
+    async def generate_endpoint(request: Request):
+        return await generate(await request.json(), "response")
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {"embeddings": [[float(len(t) % 7), 1.0, float(t.count(" "))] for t in texts]}
+
+    @app.get("/api/ps")
+    async def ps():
+        if down:
+            raise HTTPException(status_code=503, detail="down")
+        return {"models": [{"name": m, "model": m} for m in sorted(state["models"])]}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": m} for m in sorted(state["models"])]}
+
+    @app.get("/fake/stats")
+    async def stats():
+        return {"requests": state["requests"], "inflight": state["inflight"], "time": time.time()}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens", type=int, default=24)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--down", action="store_true")
+    args = parser.parse_args()
+    app = create_app(args.tokens, args.tokens_per_second, args.first_token_delay,
+                     args.fail_rate, args.drop_rate, args.down)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Load test for /chat and /detect-tool against stub upstreams.
+
+Starts benchmarks/fake_ollama.py, benchmarks/fake_convex.py and the API
+server (uvicorn main:app) as subprocesses, then runs each scenario at each
+concurrency level with a closed loop of clients:
+
+    detect-tool    POST /detect-tool over known and unknown URLs
+    chat-general   POST /chat with general questions (no retrieval)
+    chat-rag       POST /chat with tool questions (Convex retrieval + prompt)
+
+and reports throughput, latency and time to first token (p50/p95/p99),
+rejected (429) and failed requests, and the /chat path split from /metrics.
+Results are written as JSON; pass a previous run as --baseline to print the
+change in throughput and tail latency between versions.
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --concurrency 1 10 50 --requests 300 --output after.json --baseline before.json
+    python benchmarks/load_test.py --target http://127.0.0.1:8000 --scenarios detect-tool
+    python benchmarks/load_test.py --env OLLAMA_MAX_INFLIGHT=8 --env STREAM_FLUSH_MS=0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(HERE)
+
+DETECT_URLS = [
+    ("https://github.com/user/repo/pulls", "Pull requests"),
+    ("https://www.figma.com/file/abc/Design", "Design - Figma"),
+    ("https://example.com/blog/post", "A blog post"),
+]
+GENERAL_QUERIES = [
+    "What is a variable in programming?",
+    "Explain recursion with a short example",
+    "What is the difference between HTTP and HTTPS?",
+]
+RAG_QUERIES = [
+    ("GitHub", "https://github.com/user/repo", "How do I create a pull request in GitHub?"),
+    ("GitHub", "https://github.com/user/repo/settings", "How do I require reviews before merging on this repo?"),
+    ("Figma", "https://www.figma.com/file/abc", "How do I export this frame as SVG in Figma?"),
+]
+SCENARIOS = ("detect-tool", "chat-general", "chat-rag")
+
+
+def percentile(values: list, q: float):
+    """Nearest-rank percentile; None for no samples."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def summarize_ms(values: list) -> dict:
+    return {f"p{int(q * 100)}": round(percentile(values, q) * 1000, 1) if values else None
+            for q in (0.5, 0.95, 0.99)}
+
+
+def request_for(scenario: str, i: int) -> tuple:
+    if scenario == "detect-tool":
+        url, title = DETECT_URLS[i % len(DETECT_URLS)]
+        return "/detect-tool", {"url": url, "title": title}
+    if scenario == "chat-general":
+        query = GENERAL_QUERIES[i % len(GENERAL_QUERIES)]
+        return "/chat", {"query": query, "url": "https://example.com", "context_text": "An article about code."}
+    tool, url, query = RAG_QUERIES[i % len(RAG_QUERIES)]
+    return "/chat", {"query": query, "tool_name": tool, "url": url, "context_text": f"{tool} page"}
+
+
+def count_tokens(body: bytes) -> int:
+    tokens = 0
+    for line in body.split(b"\n"):
+        if line.strip():
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue
+            if not data.get("done") and (data.get("message") or {}).get("content", data.get("response")):
+                tokens += 1
+    return tokens
+
+
+async def chat_paths(client: httpx.AsyncClient) -> dict:
+    """navigator_chat_requests_total samples keyed "path/outcome"."""
+    try:
+        text = (await client.get("/metrics")).text
+    except httpx.HTTPError:
+        return {}
+    counts = {}
+    for line in text.splitlines():
+        if line.startswith("navigator_chat_requests_total{"):
+            labels, value = line[len("navigator_chat_requests_total{"):].rsplit("} ", 1)
+            fields = dict(part.split("=", 1) for part in labels.split(","))
+            counts[f"{fields['path'].strip(chr(34))}/{fields['outcome'].strip(chr(34))}"] = float(value)
+    return counts
+
+
+async def run_level(base_url: str, scenario: str, concurrency: int, requests: int) -> dict:
+    latencies, ttfts, statuses = [], [], {}
+    tokens = errors = 0
+    issued = 0
+
+    async def one(client, i):
+        nonlocal tokens, errors
+        path, body = request_for(scenario, i)
+        start = time.perf_counter()
+        try:
+            if path == "/detect-tool":
+                response = await client.post(path, json=body)
+                status = response.status_code
+            else:
+                chunks = []
+                async with client.stream("POST", path, json=body) as response:
+                    status = response.status_code
+                    async for chunk in response.aiter_bytes():
+                        if not chunks:
+                            ttfts.append(time.perf_counter() - start)
+                        chunks.append(chunk)
+                if status == 200:
+                    tokens += count_tokens(b"".join(chunks))
+        except httpx.HTTPError:
+            errors += 1
+            return
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+
+    async def worker(client):
+        nonlocal issued
+        while issued < requests:
+            i, issued = issued, issued + 1
+            await one(client, i)
+
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        paths_before = await chat_paths(client)
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - wall_start
+        paths_after = await chat_paths(client)
+
+    paths = {key: int(value - paths_before.get(key, 0)) for key, value in paths_after.items()
+             if value - paths_before.get(key, 0) > 0}
+    result = {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "rejected": statuses.get(429, 0),
+        "failed": errors + sum(n for code, n in statuses.items() if code not in (200, 429)),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "latency_ms": summarize_ms(latencies),
+    }
+    if scenario != "detect-tool":
+        result["ttft_ms"] = summarize_ms(ttfts)
+        result["tokens_per_second"] = round(tokens / wall, 1) if wall else None
+        result["paths"] = paths
+    return result
+
+
+async def wait_ready(url: str, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def start_stack(args) -> list:
+    ollama_url = f"http://127.0.0.1:{args.ollama_port}"
+    convex_url = f"http://127.0.0.1:{args.convex_port}"
+    processes = [
+        subprocess.Popen([
+            sys.executable, os.path.join(HERE, "fake_ollama.py"), "--port", str(args.ollama_port),
+            "--tokens", str(args.tokens), "--tokens-per-second", str(args.token_rate),
+            "--first-token-delay", str(args.first_token_delay),
+        ]),
+        subprocess.Popen([
+            sys.executable, os.path.join(HERE, "fake_convex.py"), "--port", str(args.convex_port),
+            "--latency", str(args.convex_latency),
+        ]),
+    ]
+    env = dict(os.environ, OLLAMA_URLS=ollama_url, CONVEX_URL=convex_url, OLLAMA_WARMUP="false",
+               LOG_LEVEL="WARNING")
+    env.update(dict(item.split("=", 1) for item in args.env))
+    try:
+        asyncio.run(wait_ready(f"{ollama_url}/api/tags"))
+        asyncio.run(wait_ready(f"{convex_url}/fake/stats"))
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=SERVER_DIR, env=env,
+        ))
+        asyncio.run(wait_ready(f"http://127.0.0.1:{args.port}/"))
+    except BaseException:
+        stop_stack(processes)
+        raise
+    return processes
+
+
+def stop_stack(processes: list):
+    for process in reversed(processes):
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        previous = json.load(f)
+    baseline = {(r["scenario"], r["concurrency"]): r for r in previous["results"]}
+    print(f"\nChange vs {baseline_path} (revision {previous['meta'].get('revision', '?')})\n")
+    print(f"{'scenario':<14}{'conc':>6}{'rps':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttft p95':>10}")
+
+    def delta(new, old):
+        if new is None or not old:
+            return "-"
+        return f"{(new - old) / old * 100:+.0f}%"
+
+    for row in report["results"]:
+        old = baseline.get((row["scenario"], row["concurrency"]))
+        if not old:
+            continue
+        print(f"{row['scenario']:<14}{row['concurrency']:>6}"
+              f"{delta(row['throughput_rps'], old['throughput_rps']):>10}"
+              f"{delta(row['latency_ms']['p95'], old['latency_ms']['p95']):>10}"
+              f"{delta(row['latency_ms']['p99'], old['latency_ms']['p99']):>10}"
+              f"{delta(row.get('ttft_ms', {}).get('p95'), old.get('ttft_ms', {}).get('p95')):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--target", help="Load an already running server instead of starting the stub stack")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the API server (repeatable)")
+    parser.add_argument("--tokens", type=int, default=100, help="Fake Ollama tokens per answer")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Fake Ollama tokens/sec per stream")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="Fake Ollama prompt eval seconds")
+    parser.add_argument("--convex-latency", type=float, default=0.05, help="Fake Convex seconds per query")
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--ollama-port", type=int, default=11599)
+    parser.add_argument("--convex-port", type=int, default=3299)
+    parser.add_argument("--output", default="load_test.json", help="JSON report path")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    processes = [] if args.target else start_stack(args)
+    base_url = args.target or f"http://127.0.0.1:{args.port}"
+    results = []
+    try:
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                results.append(asyncio.run(run_level(base_url, scenario, concurrency, args.requests)))
+    finally:
+        stop_stack(processes)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "target": args.target or "stub stack",
+            "config": {key: getattr(args, key) for key in (
+                "requests", "tokens", "token_rate", "first_token_delay", "convex_latency", "env")},
+        },
+        "results": results,
+    }
+
+    print(f"\n{'scenario':<14}{'conc':>6}{'ok':>6}{'429':>6}{'fail':>6}{'rps':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttft p50':>10}{'ttft p95':>10}{'ttft p99':>10}")
+    for row in results:
+        ttft = row.get("ttft_ms", {})
+        print(f"{row['scenario']:<14}{row['concurrency']:>6}{row['ok']:>6}{row['rejected']:>6}{row['failed']:>6}"
+              f"{row['throughput_rps']:>9}{row['latency_ms']['p50']!s:>9}{row['latency_ms']['p95']!s:>9}"
+              f"{row['latency_ms']['p99']!s:>9}{ttft.get('p50', '-')!s:>10}{ttft.get('p95', '-')!s:>10}"
+              f"{ttft.get('p99', '-')!s:>10}")
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+    if args.baseline:
+        compare(report, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
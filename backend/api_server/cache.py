@@ -0,0 +1,150 @@
+"""
+In-process async cache with TTL, LRU eviction and single-flight loading.
+
+Concurrent lookups of the same missing key share one loader call. The
+loader runs in its own task, so a caller that gets cancelled (for example a
+discarded speculative retrieval) does not cancel the load for the others.
+Entries can carry a tag (the tool name) to invalidate them as a group.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Set
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    tag: Optional[str]
+
+
+class AsyncTTLCache:
+    """Size-bounded LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._tag_generation: Dict[str, int] = {}
+        self._epoch = 0  # bumped by clear(), which also covers untagged keys and unseen tags
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry.expires_at <= self._clock():
+            self._remove(key)
+            self.expirations += 1
+            return default
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: Hashable, value, tag: Optional[str] = None):
+        if not self.enabled:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, self._clock() + self.ttl, tag)
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        if entry.tag is not None:
+            keys = self._tags.get(entry.tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[entry.tag]
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], tag: Optional[str] = None):
+        """
+        Returns the cached value for key, or awaits loader() once for all
+        concurrent callers and caches its result. Loader exceptions are
+        propagated to every waiter and nothing is cached.
+        """
+        if not self.enabled:
+            self.misses += 1
+            return await loader()
+
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader, tag))
+            # Nobody may be left to await a failed load; mark it retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader, tag: Optional[str]):
+        epoch, generation = self._epoch, self._tag_generation.get(tag, 0)
+        try:
+            value = await loader()
+            # Skip storing if the cache was cleared or the tag invalidated while loading
+            if self._epoch == epoch and self._tag_generation.get(tag, 0) == generation:
+                self.set(key, value, tag)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drops every entry stored under tag; returns how many were removed."""
+        self._tag_generation[tag] = self._tag_generation.get(tag, 0) + 1
+        keys = list(self._tags.get(tag, ()))
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self):
+        self._epoch += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "inflight": len(self._inflight),
+        }
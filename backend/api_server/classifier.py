@@ -0,0 +1,271 @@
+"""
+Tiered query classifier for the /chat endpoint.
+
+Decides whether a query is "general" or "domain-specific" without paying for
+an LLM generation whenever a cheap local tier is confident enough:
+
+1. RuleClassifier: keyword rules plus tool vocabulary from tools_config.json
+2. CentroidClassifier (optional): hashed bag-of-words centroids trained from
+   labeled examples, needs numpy
+3. LLM fallback: the original Ollama prompt, only when confidence is low
+"""
+
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+GENERAL = "general"
+DOMAIN = "domain-specific"
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9.+#-]*")
+
+# Phrases that point at doing something inside the current tool/page
+DOMAIN_PHRASES = [
+    "how do i", "how can i", "how to", "where is", "where do i", "where can i",
+    "can i", "is there a way", "in this", "on this page", "this page", "here",
+    "my account", "my project", "my repo", "my workspace", "my team",
+]
+DOMAIN_WORDS = {
+    "click", "button", "menu", "tab", "settings", "setting", "dashboard",
+    "enable", "disable", "configure", "setup", "install", "create", "delete",
+    "remove", "rename", "invite", "share", "export", "import", "upload",
+    "download", "connect", "integrate", "integration", "shortcut", "permission",
+    "permissions", "billing", "plan", "workspace", "project", "deploy",
+    "pricing", "feature", "api", "token", "webhook", "template", "sidebar",
+}
+# Phrases that point at conceptual or general-knowledge questions
+GENERAL_PHRASES = [
+    "what is", "what are", "what does", "explain", "define", "definition of",
+    "difference between", "meaning of", "why is", "why do", "why does",
+    "history of", "who is", "who invented", "tell me about", "give me an example",
+    "best practice", "best practices", "compare", "vs",
+]
+GENERAL_WORDS = {
+    "concept", "theory", "algorithm", "recursion", "variable", "function",
+    "loop", "joke", "poem", "weather", "translate", "summarize", "essay",
+}
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "for", "of", "to", "in", "on", "with",
+    "tool", "platform", "service", "services", "official", "open", "source",
+    "app", "com", "org", "io", "dev", "www",
+}
+
+
+class Classification(NamedTuple):
+    label: str
+    confidence: float
+    tier: str
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def tool_vocabulary(tools: List[dict]) -> Dict[str, set]:
+    """
+    Builds {tool_name: vocabulary} from tools_config.json entries using the
+    tool name, the labels of its URL patterns and its description.
+    """
+    vocabulary = {}
+    for tool in tools:
+        words = set(tokenize(tool["name"]))
+        words.add(tool["name"].lower())
+        for pattern in tool.get("patterns", []):
+            for part in re.split(r"[./]", pattern.lower()):
+                words.add(part)
+        words.update(tokenize(tool.get("description", "")))
+        vocabulary[tool["name"]] = {w for w in words if w and w not in STOPWORDS and len(w) > 2}
+    return vocabulary
+
+
+def load_tool_vocabulary(config_path: str) -> Dict[str, set]:
+    try:
+        with open(config_path) as f:
+            tools = json.load(f).get("tools", [])
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load tool vocabulary from %s: %s", config_path, e)
+        return {}
+    return tool_vocabulary(tools)
+
+
+class RuleClassifier:
+    """Keyword and tool-vocabulary rules, microseconds per query."""
+
+    name = "rules"
+
+    def __init__(self, vocabulary: Optional[Dict[str, set]] = None):
+        self.set_vocabulary(vocabulary or {})
+
+    def set_vocabulary(self, vocabulary: Dict[str, set]):
+        all_tool_words = set()
+        for words in vocabulary.values():
+            all_tool_words |= words
+        self.tool_vocabulary, self.all_tool_words = vocabulary, all_tool_words
+
+    def classify(self, query: str, tool_name: Optional[str], context_text: str = "") -> Classification:
+        # Without a detected tool there is no knowledge base to retrieve from
+        if not tool_name:
+            return Classification(GENERAL, 1.0, self.name)
+
+        text = " " + " ".join(tokenize(query)) + " "
+        words = set(text.split())
+        domain = general = 0.0
+
+        tool_words = self.tool_vocabulary.get(tool_name, set(tokenize(tool_name)))
+        if words & tool_words or f" {tool_name.lower()} " in text:
+            domain += 2.0
+        elif words & self.all_tool_words:
+            domain += 1.0
+
+        domain += sum(1.0 for p in DOMAIN_PHRASES if f" {p} " in text)
+        domain += 0.5 * len(words & DOMAIN_WORDS)
+        general += sum(1.0 for p in GENERAL_PHRASES if f" {p} " in text)
+        general += 0.5 * len(words & GENERAL_WORDS)
+
+        # Words the user can see on the page are a weak domain signal
+        if context_text:
+            context_words = set(tokenize(context_text[:2000]))
+            overlap = len((words - STOPWORDS) & context_words)
+            domain += min(overlap, 4) * 0.25
+
+        total = domain + general
+        if total == 0:
+            return Classification(DOMAIN, 0.5, self.name)
+        label = DOMAIN if domain >= general else GENERAL
+        confidence = 0.5 + 0.5 * abs(domain - general) / total
+        # A single weak signal is not enough to skip the next tier
+        confidence *= min(1.0, 0.6 + 0.2 * total)
+        return Classification(label, round(confidence, 3), self.name)
+
+
+class CentroidClassifier:
+    """
+    Small vectorized model: hashed unigram/bigram features, one L2-normalized
+    centroid per label, cosine similarity at query time.
+    """
+
+    name = "centroid"
+
+    def __init__(self, examples: List[dict], dims: int = 4096):
+        import numpy as np
+
+        self.np = np
+        self.dims = dims
+        by_label = {}
+        for example in examples:
+            by_label.setdefault(example["label"], []).append(self.vectorize(example["query"]))
+        self.labels = sorted(by_label)
+        centroids = np.stack([np.mean(by_label[label], axis=0) for label in self.labels])
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = (centroids / np.maximum(norms, 1e-9)).astype(np.float32)
+
+    @classmethod
+    def from_file(cls, path: str) -> Optional["CentroidClassifier"]:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            logger.warning("numpy not installed, centroid classifier disabled")
+            return None
+        try:
+            with open(path) as f:
+                examples = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load classifier examples from %s: %s", path, e)
+            return None
+        if len({e["label"] for e in examples}) < 2:
+            return None
+        return cls(examples)
+
+    def vectorize(self, text: str):
+        np = self.np
+        tokens = tokenize(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vec = np.zeros(self.dims, dtype=np.float32)
+        for feature in features:
+            vec[zlib.crc32(feature.encode()) % self.dims] += 1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def classify(self, query: str, tool_name: Optional[str], context_text: str = "") -> Classification:
+        scores = self.centroids @ self.vectorize(query)
+        order = scores.argsort()[::-1]
+        best, second = float(scores[order[0]]), float(scores[order[1]])
+        confidence = 0.5 + 0.5 * (best - second) / max(best + second, 1e-9)
+        return Classification(self.labels[order[0]], round(confidence, 3), self.name)
+
+
+LLMFallback = Callable[[str, Optional[str], str], Awaitable[str]]
+
+
+class TieredClassifier:
+    """
+    Runs local tiers in order and returns the first confident answer,
+    otherwise asks the LLM fallback.
+    """
+
+    def __init__(self, tiers: list, llm_fallback: Optional[LLMFallback], threshold: float = 0.75):
+        self.tiers = tiers
+        self.llm_fallback = llm_fallback
+        self.threshold = threshold
+        self.counts = {tier.name: 0 for tier in tiers}
+        self.counts["llm"] = 0
+        self.seconds = dict.fromkeys(self.counts, 0.0)
+
+    async def classify(self, query: str, tool_name: Optional[str], context_text: str) -> Classification:
+        best = None
+        for tier in self.tiers:
+            start = time.perf_counter()
+            result = tier.classify(query, tool_name, context_text)
+            self.seconds[tier.name] += time.perf_counter() - start
+            if result.confidence >= self.threshold:
+                self.counts[tier.name] += 1
+                return result
+            if best is None or result.confidence > best.confidence:
+                best = result
+
+        if self.llm_fallback is None and best is not None:
+            self.counts[best.tier] += 1
+            return best
+
+        start = time.perf_counter()
+        label = await self.llm_fallback(query, tool_name, context_text)
+        self.seconds["llm"] += time.perf_counter() - start
+        self.counts["llm"] += 1
+        return Classification(label, 1.0, "llm")
+
+    def set_tool_vocabulary(self, vocabulary: Dict[str, set]):
+        for tier in self.tiers:
+            if isinstance(tier, RuleClassifier):
+                tier.set_vocabulary(vocabulary)
+
+    def stats(self) -> dict:
+        total = sum(self.counts.values())
+        return {
+            "threshold": self.threshold,
+            "decisions": dict(self.counts),
+            "llm_fallback_rate": round(self.counts["llm"] / total, 4) if total else 0.0,
+            "avg_ms": {
+                name: round(self.seconds[name] * 1000 / self.counts[name], 3) if self.counts[name] else 0.0
+                for name in self.counts
+            },
+        }
+
+
+def build_classifier(config_path: str, llm_fallback: Optional[LLMFallback]) -> TieredClassifier:
+    """Builds the classifier tiers from env configuration."""
+    tiers = [RuleClassifier(load_tool_vocabulary(config_path))]
+    examples_path = os.getenv("CLASSIFIER_EXAMPLES")
+    if examples_path:
+        centroid = CentroidClassifier.from_file(examples_path)
+        if centroid is not None:
+            tiers.append(centroid)
+    if os.getenv("CLASSIFIER_LLM_FALLBACK", "true").lower() not in ("1", "true", "yes", "on"):
+        llm_fallback = None
+    threshold = float(os.getenv("CLASSIFIER_CONFIDENCE", "0.75"))
+    return TieredClassifier(tiers, llm_fallback, threshold)
@@ -0,0 +1,104 @@
+"""
+Text embedding providers for the RAG API server.
+
+Providers expose `async embed(texts) -> list of vectors`, L2-normalized so
+cosine similarity is a plain dot product.
+"""
+
+import asyncio
+import math
+import os
+import re
+import zlib
+from typing import List
+
+
+def normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    """Dot product of two already-normalized vectors."""
+    return sum(x * y for x, y in zip(a, b))
+
+
+class OllamaEmbedder:
+    """Embeddings from Ollama's /api/embed using the shared Ollama upstream."""
+
+    def __init__(self, upstream, model: str, timeout: float = 30.0):
+        self.upstream = upstream
+        self.model = model
+        self.timeout = timeout
+
+    @property
+    def name(self) -> str:
+        return f"ollama:{self.model}"
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        response = await self.upstream.client.post(
+            "/api/embed",
+            json={"model": self.model, "input": texts},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return [normalize(v) for v in response.json()["embeddings"]]
+
+
+class SentenceTransformerEmbedder:
+    """Local model via sentence-transformers (optional dependency), run off the event loop."""
+
+    def __init__(self, model: str = "all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model
+        self.model = SentenceTransformer(model)
+
+    @property
+    def name(self) -> str:
+        return f"sentence-transformers:{self.model_name}"
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = await asyncio.to_thread(self.model.encode, texts, normalize_embeddings=True)
+        return [list(map(float, v)) for v in vectors]
+
+
+class HashingEmbedder:
+    """
+    Dependency-free hashed bag-of-words vectors. Lexical only, but fast and
+    deterministic; useful offline and for tests.
+    """
+
+    _word_re = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, dims: int = 512):
+        self.dims = dims
+
+    @property
+    def name(self) -> str:
+        return f"hashing:{self.dims}"
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            vec = [0.0] * self.dims
+            tokens = self._word_re.findall(text.lower())
+            for token in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                h = zlib.crc32(token.encode())
+                vec[h % self.dims] += 1.0 if h & 0x80000000 else -1.0
+            vectors.append(normalize(vec))
+        return vectors
+
+
+def build_embedder(ollama_upstream=None):
+    """Picks the provider from EMBEDDER (ollama | sentence-transformers | hashing)."""
+    kind = os.getenv("EMBEDDER", "ollama").lower()
+    if kind == "sentence-transformers":
+        return SentenceTransformerEmbedder(os.getenv("LOCAL_EMBED_MODEL", "all-MiniLM-L6-v2"))
+    if kind == "hashing":
+        return HashingEmbedder(int(os.getenv("HASHING_EMBED_DIMS", "512")))
+    return OllamaEmbedder(ollama_upstream, os.getenv("EMBED_MODEL", "nomic-embed-text"))
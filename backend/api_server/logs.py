@@ -0,0 +1,138 @@
+"""
+Structured, non-blocking logging for the API server.
+
+Log calls only enqueue the record; a QueueListener thread formats and writes
+it, so a slow stdout or log collector never stalls the event loop. Every
+record carries the id of the request it was logged under (a ContextVar set by
+RequestIdMiddleware and inherited by tasks the request spawns).
+
+    logger = logging.getLogger(__name__)
+    logger.info("Classified query", extra={"label": "general", "ms": 3.1})
+
+LOG_FORMAT=json writes one JSON object per line with the extra fields as
+keys; LOG_FORMAT=text (default) appends them as key=value pairs.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+import uuid
+from contextvars import ContextVar
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+_queue_handler = None
+_writer = None  # the listener's handler, on the root logger after shutdown_logging()
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-5s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+def setup_logging():
+    """Routes the root logger through a queue to a background writer. Idempotent."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    root = logging.getLogger()
+    if _writer is not None:
+        # Attached directly by shutdown_logging(); the queue takes over again
+        root.removeHandler(_writer)
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if os.getenv("LOG_FORMAT", "text").lower() == "json" else TextFormatter())
+    records = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    # The filter runs in the logging task, where the request's ContextVar is visible
+    _queue_handler.addFilter(RequestIdFilter())
+    root.addHandler(_queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    # One line per upstream call is too chatty at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """
+    Flushes queued records and stops the writer thread. Later records (e.g.
+    from shutdown hooks) are written directly rather than queued for a
+    listener that is gone.
+    """
+    global _listener, _queue_handler, _writer
+    if _listener is not None:
+        _listener.stop()
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        _writer = _listener.handlers[0]
+        _writer.addFilter(RequestIdFilter())
+        root.addHandler(_writer)
+        _listener = _queue_handler = None
+
+
+class RequestIdMiddleware:
+    """
+    Assigns each HTTP request an id (the caller's X-Request-ID if present),
+    exposes it to logging and echoes it in the X-Request-ID response header.
+    Plain ASGI, so streamed bodies pass through without extra buffering.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")[:64]
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -12,15 +12,109 @@ Architecture:
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-import httpx
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager, contextmanager
 import json
 import asyncio
+import time
 from typing import Optional
 import os
+import logging
+
+from logs import setup_logging, shutdown_logging, RequestIdMiddleware
+from metrics import REGISTRY, CHAT_STAGE_SECONDS, CHAT_REQUESTS
+from upstreams import convex_upstream
+from ollama_pool import ollama_pool, OllamaRequestError, OllamaUnavailable
+from classifier import build_classifier, tool_vocabulary
+from tool_registry import ToolRegistry, KnowledgeCatalog
+from cache import AsyncTTLCache
+from embeddings import build_embedder
+from response_cache import ResponseCache
+from prompt import build_assembler, SYSTEM_PROMPT
+import ndjson
+from scheduler import build_scheduler, SchedulerSaturated, STREAM, CLASSIFY
+
+# Structured logging through a background writer thread (LOG_FORMAT, LOG_LEVEL)
+setup_logging()
+logger = logging.getLogger("navigator")
 
-app = FastAPI(title="Navigator RAG API", version="2.0.4")
+# Configuration
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
+# Comma-separated Ollama hosts to route across; defaults to OLLAMA_URL alone
+OLLAMA_URLS = [url.strip() for url in os.getenv("OLLAMA_URLS", OLLAMA_URL).split(",") if url.strip()]
+CONVEX_URL = os.getenv("CONVEX_URL", "https://abundant-porpoise-181.convex.cloud")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen3:8b")
+# Keep the model resident between requests (Ollama duration string, -1 = forever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Runtime options must be identical on every call, or Ollama reloads the model
+OLLAMA_OPTIONS = {"num_ctx": int(os.getenv("OLLAMA_NUM_CTX", os.getenv("PROMPT_TOKEN_BUDGET", "4096")))}
+OLLAMA_OPTIONS.update(json.loads(os.getenv("OLLAMA_OPTIONS", "{}")))
+# Preload the model (and the fixed system prompt prefix) on startup
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() in ("1", "true", "yes", "on")
+TOOLS_CONFIG = os.getenv("TOOLS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools_config.json"))
+# Seconds between tools_config.json mtime checks / scrapedata:listTools refreshes
+TOOLS_CONFIG_POLL_INTERVAL = float(os.getenv("TOOLS_CONFIG_POLL_INTERVAL", "5"))
+KNOWLEDGE_REFRESH_INTERVAL = float(os.getenv("KNOWLEDGE_REFRESH_INTERVAL", "300"))
+# Chunks retrieved per RAG query; the prompt token budget decides how many are used
+KNOWLEDGE_LIMIT = int(os.getenv("KNOWLEDGE_LIMIT", "5"))
+# Convex text search: doc_chunks (written by crawl_tools.py) or whole scrapedata pages
+KNOWLEDGE_SEARCH_PATH = os.getenv("KNOWLEDGE_SEARCH_PATH", "doc_chunks:search")
+# Searched when KNOWLEDGE_SEARCH_PATH finds nothing (tools not recrawled with chunks yet); '' disables
+KNOWLEDGE_FALLBACK_PATH = os.getenv("KNOWLEDGE_FALLBACK_PATH", "scrapedata:searchKnowledge")
+# Knowledge retrieval cache (entries, seconds); size 0 disables it
+KNOWLEDGE_CACHE_SIZE = int(os.getenv("KNOWLEDGE_CACHE_SIZE", "1024"))
+KNOWLEDGE_CACHE_TTL = float(os.getenv("KNOWLEDGE_CACHE_TTL", "300"))
+# Local vector index directory (built with `python vector_index.py sync`); unset disables it
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR")
+# Replay cached answers for repeated RAG questions (off by default)
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() in ("1", "true", "yes", "on")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Cosine similarity for paraphrase hits; 0 means exact normalized match only
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+# Start Convex retrieval alongside classification when a tool is detected
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() in ("1", "true", "yes", "on")
+# Forward Ollama's chat stream bytes untouched instead of parsing every line
+STREAM_PASSTHROUGH = os.getenv("STREAM_PASSTHROUGH", "true").lower() in ("1", "true", "yes", "on")
+# Coalesce per-token lines into one HTTP chunk per interval (0 = every token)
+STREAM_FLUSH_MS = float(os.getenv("STREAM_FLUSH_MS", "100"))
+STREAM_FLUSH_BYTES = int(os.getenv("STREAM_FLUSH_BYTES", "4096"))
+# Longest a /chat answer waits for an Ollama slot before a 429
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "30"))
+# Classification is cheap to skip: fall back to the default label after this
+CLASSIFY_QUEUE_TIMEOUT = float(os.getenv("CLASSIFY_QUEUE_TIMEOUT", "2"))
+
+# Shared, pooled clients (one per upstream), opened and closed with the app.
+# Ollama is a pool of backends with least-loaded routing and failover.
+ollama = ollama_pool(OLLAMA_URLS)
+convex = convex_upstream(CONVEX_URL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ollama.start()
+    await convex.start()
+    tool_registry.load()
+    background = [
+        asyncio.create_task(tool_registry.watch()),
+        asyncio.create_task(knowledge_catalog.run()),
+        asyncio.create_task(ollama.run()),
+    ]
+    if OLLAMA_WARMUP:
+        background.append(asyncio.create_task(warmup_ollama()))
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await ollama.close()
+        await convex.close()
+        shutdown_logging()
+
+app = FastAPI(title="Navigator RAG API", version="2.0.4", lifespan=lifespan)
 
 # CORS middleware for extension
 app.add_middleware(
@@ -29,12 +123,107 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+# Request ids for log correlation (X-Request-ID in and out)
+app.add_middleware(RequestIdMiddleware)
+
+class SpeculationStats:
+    """Counters for speculative retrieval in /chat."""
+
+    def __init__(self):
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+        self.time_saved_ms = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": SPECULATIVE_RETRIEVAL,
+            "started": self.started,
+            "used": self.used,
+            "wasted": self.wasted,
+            "waste_rate": round(self.wasted / self.started, 4) if self.started else 0.0,
+            "time_saved_ms_total": round(self.time_saved_ms, 1),
+            "time_saved_ms_avg": round(self.time_saved_ms / self.used, 1) if self.used else 0.0,
+        }
+
+speculation_stats = SpeculationStats()
+
+class ChatTrace:
+    """
+    Per-request stage timings for /chat, recorded into the
+    navigator_chat_stage_seconds histogram and logged when the answer ends.
+    """
 
-# Configuration
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
-CONVEX_URL = os.getenv("CONVEX_URL", "https://abundant-porpoise-181.convex.cloud")
-OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen3:8b")
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.path = "general"
+        self.stages = {}
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage] = seconds
+        CHAT_STAGE_SECONDS.labels(stage).observe(seconds)
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def finish(self, outcome: str):
+        self.record("total", time.perf_counter() - self.start)
+        CHAT_REQUESTS.labels(self.path, outcome).inc()
+        logger.info("Chat finished", extra={
+            "path": self.path,
+            "outcome": outcome,
+            **{f"{stage}_ms": round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+        })
+
+    async def stream(self, stream):
+        """Passes the answer through, timing first token and generation."""
+        outcome = "ok"
+        first = None
+        try:
+            async for chunk in stream:
+                if first is None:
+                    first = time.perf_counter()
+                    self.record("ttft", first - self.start)
+                if chunk.startswith(b'{"error"'):
+                    outcome = "error"
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "disconnected"
+            raise
+        finally:
+            if first is not None:
+                self.record("generate", time.perf_counter() - first)
+            self.finish(outcome)
+
+# Admission control in front of Ollama (OLLAMA_MAX_INFLIGHT, OLLAMA_MAX_QUEUE)
+scheduler = build_scheduler(backends=len(ollama.backends))
+knowledge_cache = AsyncTTLCache(maxsize=KNOWLEDGE_CACHE_SIZE, ttl=KNOWLEDGE_CACHE_TTL)
+# Token-budget prompt assembly (PROMPT_TOKEN_BUDGET, TOKENIZER, ...)
+prompt_assembler = build_assembler()
+# Embedding provider (EMBEDDER=ollama|sentence-transformers|hashing)
+embedder = build_embedder(ollama)
+vector_index = None
+retriever = None
+if VECTOR_INDEX_DIR:
+    from vector_index import VectorIndex
+    from retrieval import build_retriever
+    vector_index = VectorIndex(VECTOR_INDEX_DIR, embedder)
+    # BM25 + vector with reciprocal rank fusion (RETRIEVAL_MODE=hybrid|vector|bm25)
+    retriever = build_retriever(vector_index)
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    ttl=RESPONSE_CACHE_TTL,
+    embedder=embedder,
+    similarity=RESPONSE_CACHE_SIMILARITY
+) if RESPONSE_CACHE else None
 
 # Request models
 class DetectToolRequest(BaseModel):
@@ -47,31 +236,22 @@ class ChatRequest(BaseModel):
     url: str
     context_text: str
 
-# Tool detection database (maps URL patterns to tool names)
-# This should ideally be loaded from Convex or a config file
-TOOL_PATTERNS = {
-    "github.com": "GitHub",
-    "gitlab.com": "GitLab",
-    "bitbucket.org": "Bitbucket",
-    "stackoverflow.com": "Stack Overflow",
-    "docs.python.org": "Python Docs",
-    "developer.mozilla.org": "MDN",
-    "reactjs.org": "React",
-    "angular.io": "Angular",
-    "vuejs.org": "Vue.js",
-    "nodejs.org": "Node.js",
-    "aws.amazon.com": "AWS",
-    "cloud.google.com": "Google Cloud",
-    "azure.microsoft.com": "Azure",
-    "docker.com": "Docker",
-    "kubernetes.io": "Kubernetes",
-    "figma.com": "Figma",
-    "notion.so": "Notion",
-    "slack.com": "Slack",
-    "trello.com": "Trello",
-    "jira.atlassian.com": "Jira",
-    # Add more tools as needed (89 total)
-}
+class InvalidateCacheRequest(BaseModel):
+    tool_name: Optional[str] = None
+
+# Tool detection database, built from tools_config.json and hot reloaded
+tool_registry = ToolRegistry(TOOLS_CONFIG, poll_interval=TOOLS_CONFIG_POLL_INTERVAL)
+
+async def fetch_knowledge_tools():
+    """Tool names that have documents in Convex scrapedata."""
+    response = await convex.client.post(
+        "/api/query",
+        json={"path": "scrapedata:listTools", "args": {}}
+    )
+    response.raise_for_status()
+    return response.json().get("value", [])
+
+knowledge_catalog = KnowledgeCatalog(fetch_knowledge_tools, refresh_interval=KNOWLEDGE_REFRESH_INTERVAL)
 
 @app.get("/")
 async def root():
@@ -80,7 +260,46 @@ async def root():
         "service": "Navigator RAG API",
         "version": "2.0.4",
         "status": "online",
-        "endpoints": ["/detect-tool", "/chat"]
+        "endpoints": ["/detect-tool", "/chat", "/upstreams", "/stats", "/metrics", "/cache/invalidate"]
+    }
+
+@app.get("/stats")
+async def stats():
+    """Runtime counters for the /chat pipeline"""
+    return {
+        "scheduler": scheduler.stats(),
+        "speculative_retrieval": speculation_stats.snapshot(),
+        "knowledge_cache": knowledge_cache.stats(),
+        "response_cache": response_cache.stats() if response_cache else {"enabled": False},
+        "vector_index": vector_index.stats() if vector_index else {"enabled": False},
+        "retrieval": retriever.stats() if retriever else {"enabled": False},
+        "prompt": prompt_assembler.stats(),
+        "classifier": query_classifier.stats(),
+        "tool_registry": tool_registry.stats(),
+        "knowledge_catalog": knowledge_catalog.stats()
+    }
+
+@app.post("/cache/invalidate")
+async def invalidate_cache(request: InvalidateCacheRequest):
+    """
+    Drops cached knowledge and cached answers for a tool (crawl_tools.py
+    calls this once the tool's writes are confirmed), or everything when
+    tool_name is omitted.
+    """
+    if request.tool_name:
+        removed = knowledge_cache.invalidate_tag(request.tool_name.strip().lower())
+    else:
+        removed = len(knowledge_cache)
+        knowledge_cache.clear()
+    answers = response_cache.invalidate_tool(request.tool_name) if response_cache else 0
+    return {"invalidated": removed, "answers_invalidated": answers, "tool_name": request.tool_name}
+
+@app.get("/upstreams")
+async def upstream_stats():
+    """Connection pool stats for each upstream client"""
+    return {
+        "ollama": ollama.stats(),
+        "convex": convex.stats()
     }
 
 @app.post("/detect-tool")
@@ -89,17 +308,15 @@ async def detect_tool(request: DetectToolRequest):
     Detects which tool/service the page belongs to.
     Returns tool information if detected, otherwise returns detected=False.
     """
-    url = request.url.lower()
-
     # Check URL patterns
-    for pattern, tool_name in TOOL_PATTERNS.items():
-        if pattern in url:
-            return {
-                "detected": True,
-                "tool_name": tool_name,
-                "confidence": 0.95,
-                "has_knowledge": True  # TODO: Check Convex for actual knowledge
-            }
+    tool = tool_registry.lookup(request.url)
+    if tool:
+        return {
+            "detected": True,
+            "tool_name": tool["name"],
+            "confidence": 0.95,
+            "has_knowledge": knowledge_catalog.has_knowledge(tool["name"])
+        }
 
     # No tool detected
     return {
@@ -110,6 +327,17 @@ async def detect_tool(request: DetectToolRequest):
     }
 
 async def classify_query(query: str, tool_name: Optional[str], context_text: str) -> str:
+    """
+    Classifies if query is general or domain-specific.
+    Local rule/centroid tiers answer confident cases; the LLM is only asked
+    when they are unsure.
+    Returns: "general" or "domain-specific"
+    """
+    result = await query_classifier.classify(query, tool_name, context_text)
+    logger.info("Classified query", extra={"label": result.label, "tier": result.tier, "confidence": result.confidence})
+    return result.label
+
+async def llm_classify_query(query: str, tool_name: Optional[str], context_text: str) -> str:
     """
     Uses Ollama to classify if query is general or domain-specific.
     Returns: "general" or "domain-specific"
@@ -128,167 +356,240 @@ Respond with ONLY one word: "general" or "domain-specific"
 """
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{OLLAMA_URL}/api/generate",
-                json={
+        async with await scheduler.acquire(OLLAMA_MODEL, CLASSIFY, max_wait=CLASSIFY_QUEUE_TIMEOUT):
+            response = await ollama.post(
+                "/api/generate",
+                {
                     "model": OLLAMA_MODEL,
                     "prompt": classification_prompt,
-                    "stream": False
-                }
+                    "stream": False,
+                    "keep_alive": OLLAMA_KEEP_ALIVE,
+                    "options": OLLAMA_OPTIONS
+                },
+                timeout=10.0
             )
 
-            if response.status_code == 200:
-                result = response.json()
-                classification = result.get("response", "").strip().lower()
-
-                # Validate response
-                if "domain-specific" in classification or "domain" in classification:
-                    return "domain-specific"
-                elif "general" in classification:
-                    return "general"
-                else:
-                    # Default to domain-specific if tool is detected
-                    return "domain-specific" if tool_name else "general"
+        if response.status_code == 200:
+            result = response.json()
+            classification = result.get("response", "").strip().lower()
+
+            # Validate response
+            if "domain-specific" in classification or "domain" in classification:
+                return "domain-specific"
+            elif "general" in classification:
+                return "general"
             else:
-                print(f"Classification failed: {response.status_code}")
+                # Default to domain-specific if tool is detected
                 return "domain-specific" if tool_name else "general"
+        else:
+            logger.warning("LLM classification failed", extra={"status": response.status_code})
+            ollama.record_error()
+            return "domain-specific" if tool_name else "general"
 
+    except SchedulerSaturated as e:
+        logger.warning("Skipping LLM classification: %s", e)
+        return "domain-specific" if tool_name else "general"
     except Exception as e:
-        print(f"Error classifying query: {e}")
+        logger.error("Error classifying query: %s", e)
+        ollama.record_error()
         # Default: if tool detected, assume domain-specific
         return "domain-specific" if tool_name else "general"
 
-async def query_convex_knowledge(tool_name: str, query: str, limit: int = 5):
+query_classifier = build_classifier(TOOLS_CONFIG, llm_classify_query)
+tool_registry.on_reload(lambda tools: query_classifier.set_tool_vocabulary(tool_vocabulary(tools)))
+
+async def timed(coro):
+    """Awaits coro and returns (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+def knowledge_cache_key(tool_name: str, query: str, limit: int):
+    """Normalizes case, whitespace and trailing punctuation of the query."""
+    normalized = " ".join(query.lower().split()).rstrip("?!. ")
+    return (tool_name.strip().lower(), normalized, limit)
+
+async def search_convex(path: str, tool_name: str, query: str, limit: int):
+    response = await convex.client.post(
+        "/api/query",
+        json={
+            "path": path,
+            "args": {
+                "query": query,
+                "tool_name": tool_name,
+                "limit": limit
+            }
+        }
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Convex query failed: {response.status_code} - {response.text}")
+    return response.json().get("value", [])
+
+async def fetch_convex_knowledge(tool_name: str, query: str, limit: int):
     """
-    Queries Convex scrapedata database for relevant knowledge chunks.
-    Uses simple text search for now (can be upgraded to vector search).
+    Raw Convex search; raises on failure so errors are never cached. Falls
+    back to KNOWLEDGE_FALLBACK_PATH when the primary search comes back empty
+    or fails, so tools whose pages predate doc_chunks still get answers.
     """
+    path = KNOWLEDGE_SEARCH_PATH
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{CONVEX_URL}/api/query",
-                json={
-                    "path": "knowledge:searchKnowledge",
-                    "args": {
-                        "query": query,
-                        "tool_name": tool_name,
-                        "limit": limit
-                    }
-                }
-            )
+        chunks = await search_convex(path, tool_name, query, limit)
+    except RuntimeError as e:
+        if not KNOWLEDGE_FALLBACK_PATH or KNOWLEDGE_FALLBACK_PATH == path:
+            raise
+        logger.warning("%s failed, trying %s: %s", path, KNOWLEDGE_FALLBACK_PATH, e)
+        chunks = []
+    if not chunks and KNOWLEDGE_FALLBACK_PATH and KNOWLEDGE_FALLBACK_PATH != path:
+        path = KNOWLEDGE_FALLBACK_PATH
+        chunks = await search_convex(path, tool_name, query, limit)
+    logger.info("Retrieved knowledge", extra={"source": "convex", "path": path, "tool": tool_name,
+                                              "chunks": len(chunks)})
+    return chunks
+
+async def retrieve_knowledge(tool_name: str, query: str, limit: int):
+    """
+    Local hybrid (BM25 + vector) retrieval when the tool is in the on-disk
+    index, otherwise (or if the local search fails) Convex text search.
+    """
+    if retriever is not None and vector_index.has_tool(tool_name):
+        try:
+            chunks = await retriever.retrieve(tool_name, query, limit)
+            logger.info("Retrieved knowledge", extra={"source": f"local:{retriever.mode}", "tool": tool_name,
+                                                      "chunks": len(chunks)})
+            return chunks
+        except Exception as e:
+            logger.warning("Local vector search failed, using Convex: %s", e)
+    return await fetch_convex_knowledge(tool_name, query, limit)
 
-            if response.status_code == 200:
-                data = response.json()
-                chunks = data.get("value", [])
-                print(f"Retrieved {len(chunks)} chunks from scrapedata for {tool_name}")
-                return chunks
-            else:
-                print(f"Convex query failed: {response.status_code} - {response.text}")
-                return []
+async def query_convex_knowledge(tool_name: str, query: str, limit: int = 5):
+    """
+    Queries the knowledge base for relevant chunks: the local vector index
+    when VECTOR_INDEX_DIR is set, otherwise Convex text search (KNOWLEDGE_SEARCH_PATH).
+    Results are cached per normalized (tool, query, limit) and identical
+    concurrent lookups share one Convex request.
+    """
+    key = knowledge_cache_key(tool_name, query, limit)
+    try:
+        return await knowledge_cache.get_or_load(
+            key,
+            lambda: retrieve_knowledge(tool_name, query, limit),
+            tag=key[0]
+        )
     except Exception as e:
-        print(f"Error querying Convex scrapedata: {e}")
+        logger.error("Error querying Convex scrapedata: %s", e)
+        convex.record_error()
         return []
 
-def build_rag_prompt(query: str, tool_name: Optional[str], context_text: str, knowledge_chunks: list):
+def build_rag_messages(query: str, tool_name: Optional[str], context_text: str, knowledge_chunks: list,
+                       instruction: str = "Provide a helpful, grounded answer:"):
     """
-    Builds the augmented prompt for Ollama with:
-    - User query
+    Builds the chat messages for Ollama with:
+    - Fixed system instructions
+    - Retrieved knowledge from database (if any)
     - Page context (UI elements, text)
-    - Retrieved knowledge from database
+    - User query
+    Near-duplicate chunks are dropped and the rest fill the token budget by
+    relevance; stable content comes first so Ollama can reuse the prefix.
     """
+    return prompt_assembler.build_messages(query, tool_name, context_text, knowledge_chunks, instruction)
 
-    # Base system prompt
-    system = """You are Navigator, a contextual AI assistant that helps users understand and navigate tools.
-
-Key principles:
-1. Ground answers in the provided page context and knowledge base
-2. If you don't see relevant information, say so clearly
-3. Be concise and actionable
-4. Consider the user's current screen context to understand their objective
-"""
-
-    # Add tool-specific context
-    if tool_name and knowledge_chunks:
-        system += f"\n\nYou are currently helping with {tool_name}. Use the following knowledge base:\n\n"
-        for i, chunk in enumerate(knowledge_chunks, 1):
-            system += f"[Source {i}]\n{chunk.get('content', '')[:500]}...\n\n"
-
-    # Add page context
-    system += f"\n\nCurrent page context:\n{context_text[:2000]}\n"
+async def warmup_ollama():
+    """
+    Loads the model and evaluates the fixed system prompt once on every
+    backend, so the first user request pays neither the model load nor the
+    shared prefix.
+    """
+    async def warm(backend):
+        start = time.perf_counter()
+        try:
+            response = await backend.upstream.client.post(
+                "/api/chat",
+                json={
+                    "model": OLLAMA_MODEL,
+                    "messages": [
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": "Hi"}
+                    ],
+                    "stream": False,
+                    "keep_alive": OLLAMA_KEEP_ALIVE,
+                    "options": dict(OLLAMA_OPTIONS, num_predict=1)
+                },
+                timeout=300.0
+            )
+            response.raise_for_status()
+            backend.resident_models.add(OLLAMA_MODEL)
+            logger.info("Warmed up %s on %s", OLLAMA_MODEL, backend.name,
+                        extra={"seconds": round(time.perf_counter() - start, 2)})
+        except Exception as e:
+            logger.warning("Ollama warmup failed on %s: %s", backend.name, e)
 
-    # User query
-    user_prompt = f"\nUser question: {query}\n\nProvide a helpful, grounded answer:"
+    await asyncio.gather(*(warm(backend) for backend in ollama.backends))
 
-    return system + user_prompt
+async def release_when_done(stream, slot):
+    """Passes the stream through and frees the Ollama slot when it ends."""
+    try:
+        async for line in stream:
+            yield line
+    finally:
+        slot.release()
 
-async def stream_ollama_response(prompt: str, is_chat: bool = True):
+async def stream_ollama_response(messages: list, is_chat: bool = True):
     """
     Streams response from Ollama.
-    Yields JSON lines compatible with the extension's stream parser.
+    Yields NDJSON bytes compatible with the extension's stream parser.
+    A backend that fails before the first line is retried on another one.
     Args:
-        prompt: The prompt to send to Ollama
-        is_chat: If True, use chat API. If False, use generate API.
+        messages: Chat messages to send to Ollama
+        is_chat: If True, use chat API. If False, use generate API
+                 with the message contents joined into one prompt.
     """
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            if is_chat:
-                # Use chat API for structured prompts
-                async with client.stream(
-                    "POST",
-                    f"{OLLAMA_URL}/api/chat",
-                    json={
-                        "model": OLLAMA_MODEL,
-                        "messages": [
-                            {"role": "system", "content": prompt.split("User question:")[0] if "User question:" in prompt else "You are Navigator, a helpful AI assistant."},
-                            {"role": "user", "content": prompt.split("User question:")[1] if "User question:" in prompt else prompt}
-                        ],
-                        "stream": True
-                    }
-                ) as response:
-                    if response.status_code != 200:
-                        error_text = await response.aread()
-                        yield json.dumps({"error": f"Ollama error: {error_text.decode()}"}) + "\n"
-                        return
-
-                    async for line in response.aiter_lines():
-                        if line.strip():
-                            try:
-                                data = json.loads(line)
-                                # Forward the Ollama response format
-                                yield json.dumps(data) + "\n"
-                            except json.JSONDecodeError:
-                                continue
+    try:
+        if is_chat:
+            # Use chat API for structured prompts
+            payload = {
+                "model": OLLAMA_MODEL,
+                "messages": messages,
+                "stream": True,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "options": OLLAMA_OPTIONS
+            }
+            if STREAM_PASSTHROUGH:
+                # Already in the extension's format: forward the bytes as they arrive
+                async for chunk in ollama.stream_raw("/api/chat", payload):
+                    yield chunk
             else:
-                # Use generate API for simple prompts
-                async with client.stream(
-                    "POST",
-                    f"{OLLAMA_URL}/api/generate",
-                    json={
-                        "model": OLLAMA_MODEL,
-                        "prompt": prompt,
-                        "stream": True
-                    }
-                ) as response:
-                    if response.status_code != 200:
-                        error_text = await response.aread()
-                        yield json.dumps({"error": f"Ollama error: {error_text.decode()}"}) + "\n"
-                        return
-
-                    async for line in response.aiter_lines():
-                        if line.strip():
-                            try:
-                                data = json.loads(line)
-                                # Convert generate API response to chat API format for compatibility
-                                if "response" in data:
-                                    yield json.dumps({"message": {"content": data["response"]}}) + "\n"
-                            except json.JSONDecodeError:
-                                continue
-
-        except httpx.ConnectError:
-            yield json.dumps({"error": "Cannot connect to Ollama. Is it running on port 11434?"}) + "\n"
-        except Exception as e:
-            yield json.dumps({"error": f"Stream error: {str(e)}"}) + "\n"
+                async for line in ollama.stream_lines("/api/chat", payload):
+                    try:
+                        # Forward the Ollama response format
+                        yield ndjson.dumps_line(ndjson.loads(line))
+                    except ValueError:
+                        continue
+        else:
+            # Use generate API for simple prompts
+            lines = ollama.stream_lines(
+                "/api/generate",
+                {
+                    "model": OLLAMA_MODEL,
+                    "prompt": "\n\n".join(m["content"] for m in messages),
+                    "stream": True,
+                    "keep_alive": OLLAMA_KEEP_ALIVE,
+                    "options": OLLAMA_OPTIONS
+                }
+            )
+            async for line in lines:
+                try:
+                    data = ndjson.loads(line)
+                    # Convert generate API response to chat API format for compatibility
+                    if "response" in data:
+                        yield ndjson.dumps_line({"message": {"content": data["response"]}})
+                except ValueError:
+                    continue
+
+    except (OllamaUnavailable, OllamaRequestError) as e:
+        yield ndjson.dumps_line({"error": str(e)})
+    except Exception as e:
+        ollama.record_error()
+        yield ndjson.dumps_line({"error": f"Stream error: {str(e)}"})
 
 @app.post("/chat")
 async def chat(request: ChatRequest):
@@ -296,83 +597,184 @@ async def chat(request: ChatRequest):
     Main chat endpoint with intelligent RAG.
 
     Flow:
-    1. Classify query: general or domain-specific (using Ollama)
+    1. Classify query: general or domain-specific (local tiers, Ollama fallback)
+       With SPECULATIVE_RETRIEVAL and a detected tool, step 2 starts at the
+       same time and its result is discarded if the query is general.
     2. If domain-specific: Query Convex scrapedata for relevant knowledge
-    3. Build augmented prompt with context + knowledge (RAG)
+    3. Build augmented chat messages with context + knowledge (RAG)
     4. If general: Send query directly to Ollama (no RAG)
-    5. Stream response from Ollama
-    """
+    5. Stream response from Ollama (or replay a cached answer for the same
+       tool, question and retrieved chunks when RESPONSE_CACHE is on)
 
-    print(f"\n{'='*60}")
-    print(f"New query: {request.query}")
-    print(f"Tool: {request.tool_name}")
-    print(f"{'='*60}")
+    Each stage is timed into navigator_chat_stage_seconds (see /metrics).
+    """
+    trace = ChatTrace()
+    logger.info("New query", extra={"tool": request.tool_name, "query_chars": len(request.query)})
+
+    # Speculatively start retrieval while the classifier runs
+    speculative = None
+    if SPECULATIVE_RETRIEVAL and request.tool_name:
+        speculation_stats.started += 1
+        speculative = asyncio.create_task(timed(query_convex_knowledge(
+            request.tool_name,
+            request.query,
+            limit=KNOWLEDGE_LIMIT
+        )))
 
-    # Step 1: Classify query using Ollama
-    classification = await classify_query(
+    # Step 1: Classify query (local tiers first, Ollama when unsure)
+    classification, classify_seconds = await timed(classify_query(
         request.query,
         request.tool_name,
         request.context_text
-    )
-
-    print(f"Classification: {classification}")
+    ))
+    trace.record("classify", classify_seconds)
 
     # Step 2 & 3: Handle based on classification
+    knowledge_chunks = []
     if classification == "domain-specific" and request.tool_name:
         # Domain-specific path: Use RAG
-        print(f"[RAG PATH] Querying scrapedata for {request.tool_name}")
-
-        knowledge_chunks = await query_convex_knowledge(
-            request.tool_name,
-            request.query,
-            limit=5
-        )
+        trace.path = "rag"
+        if speculative is not None:
+            knowledge_chunks, retrieve_seconds = await speculative
+            # Sequentially this would have cost classify + retrieve
+            saved_ms = min(classify_seconds, retrieve_seconds) * 1000
+            speculation_stats.used += 1
+            speculation_stats.time_saved_ms += saved_ms
+            logger.info("Speculative retrieval used", extra={"saved_ms": round(saved_ms, 1)})
+        else:
+            knowledge_chunks, retrieve_seconds = await timed(query_convex_knowledge(
+                request.tool_name,
+                request.query,
+                limit=KNOWLEDGE_LIMIT
+            ))
+        trace.record("retrieve", retrieve_seconds)
+
+        with trace.span("prompt"):
+            if knowledge_chunks:
+                # Build RAG messages with knowledge
+                messages = build_rag_messages(
+                    request.query,
+                    request.tool_name,
+                    request.context_text,
+                    knowledge_chunks
+                )
+            else:
+                # No knowledge available, use general path
+                trace.path = "fallback"
+                messages = build_rag_messages(
+                    request.query,
+                    None,
+                    request.context_text,
+                    [],
+                    instruction="Provide a helpful answer:"
+                )
+    else:
+        trace.path = "general"
+        if speculative is not None:
+            # Query turned out to be general: drop the speculative retrieval
+            speculative.cancel()
+            speculation_stats.wasted += 1
+            logger.info("Discarded speculative retrieval")
 
-        if knowledge_chunks:
-            print(f"[RAG PATH] Found {len(knowledge_chunks)} knowledge chunks")
-            # Build RAG prompt with knowledge
-            prompt = build_rag_prompt(
+        # General path: Direct Ollama (no RAG) but WITH page context
+        with trace.span("prompt"):
+            messages = build_rag_messages(
                 request.query,
-                request.tool_name,
+                None,
                 request.context_text,
-                knowledge_chunks
+                [],
+                instruction="Provide a clear, helpful answer based on the page context when relevant:"
             )
-        else:
-            print(f"[RAG PATH] No knowledge found, falling back to general path")
-            # No knowledge available, use general path
-            prompt = f"""You are Navigator, a helpful AI assistant.
-
-Current page context:
-{request.context_text[:1000]}
 
-User question: {request.query}
+    logger.info("Routed query", extra={"path": trace.path, "chunks": len(knowledge_chunks)})
 
-Provide a helpful answer:"""
-    else:
-        # General path: Direct Ollama (no RAG) but WITH page context
-        print(f"[GENERAL PATH] Responding directly from Ollama with page context")
-        prompt = f"""You are Navigator, a helpful AI assistant.
+    # Step 4: Stream response from Ollama
 
-Current page context:
-{request.context_text[:2000]}
+    # Only RAG answers are cached: they are keyed on the retrieved chunks
+    if response_cache is not None and knowledge_chunks:
+        answer, cache_state = await response_cache.lookup(request.tool_name, request.query, knowledge_chunks)
+        if answer is not None:
+            logger.info("Replaying cached answer", extra={"tool": request.tool_name})
+            trace.finish("cached")
+            return StreamingResponse(
+                response_cache.replay(answer, OLLAMA_MODEL),
+                media_type="application/x-ndjson"
+            )
 
-User question: {request.query}
+    # Wait for a generation slot; shed load instead of queueing without bound
+    try:
+        with trace.span("queue"):
+            slot = await scheduler.acquire(OLLAMA_MODEL, STREAM, max_wait=OLLAMA_QUEUE_TIMEOUT)
+    except SchedulerSaturated as e:
+        logger.warning("Rejecting request: %s", e)
+        trace.finish("rejected")
+        return JSONResponse(
+            {"error": "Navigator is busy, please retry shortly"},
+            status_code=429,
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
 
-Provide a clear, helpful answer based on the page context when relevant:"""
+    if response_cache is not None and knowledge_chunks:
+        stream = response_cache.capture(request.tool_name, cache_state, stream_ollama_response(messages, is_chat=True))
+    else:
+        stream = stream_ollama_response(messages, is_chat=True)
 
-    # Step 4: Stream response from Ollama
-    print(f"Streaming response from Ollama ({OLLAMA_MODEL})...")
+    logger.info("Streaming response from Ollama", extra={"model": OLLAMA_MODEL})
     return StreamingResponse(
-        stream_ollama_response(prompt, is_chat=True),
-        media_type="application/x-ndjson"
+        # First token goes out at once; later tokens are batched per flush interval
+        ndjson.coalesce(release_when_done(trace.stream(stream), slot), STREAM_FLUSH_MS, STREAM_FLUSH_BYTES),
+        media_type="application/x-ndjson",
+        # Also frees the slot if the client disconnects before streaming starts
+        background=BackgroundTask(slot.release)
     )
 
+def collect_runtime_metrics():
+    """Exports counters the components already keep (read at scrape time)."""
+    upstreams = [(b.upstream, b.name) for b in ollama.backends] + [(convex, convex.base_url)]
+    yield ("navigator_upstream_requests_total", "counter", "HTTP requests sent per upstream.",
+           [({"upstream": u.name, "url": url}, u.requests_total) for u, url in upstreams])
+    yield ("navigator_upstream_errors_total", "counter", "Failed calls per upstream.",
+           [({"upstream": u.name, "url": url}, u.errors_total) for u, url in upstreams])
+    yield ("navigator_ollama_backend_healthy", "gauge", "1 if the Ollama backend is in rotation.",
+           [({"backend": b.name}, int(b.healthy)) for b in ollama.backends])
+    yield ("navigator_ollama_backend_inflight", "gauge", "Requests in flight per Ollama backend.",
+           [({"backend": b.name}, b.inflight) for b in ollama.backends])
+    yield ("navigator_ollama_errors_total", "counter",
+           "Failed Ollama calls per backend; (none) is errors outside a backend call, e.g. a bad body.",
+           [({"backend": b.name}, b.upstream.errors_total) for b in ollama.backends]
+           + [({"backend": "(none)"}, ollama.errors_total)])
+    yield ("navigator_ollama_failovers_total", "counter", "Requests moved off each Ollama backend.",
+           [({"backend": b.name}, b.failovers) for b in ollama.backends])
+    yield ("navigator_ollama_tokens_per_second", "gauge", "Recent generation speed per Ollama backend.",
+           [({"backend": b.name}, b.tokens_per_second) for b in ollama.backends if b.tokens_per_second])
+    lanes = scheduler.lanes.items()
+    yield ("navigator_scheduler_inflight", "gauge", "Generations holding a scheduler slot.",
+           [({"model": model}, lane.inflight) for model, lane in lanes])
+    yield ("navigator_scheduler_queued", "gauge", "Requests waiting for a scheduler slot.",
+           [({"model": model}, lane.queued) for model, lane in lanes])
+    yield ("navigator_scheduler_queue_depth", "histogram", "Queue depth seen by arriving requests.",
+           [({"model": model}, lane.depth) for model, lane in lanes])
+    yield ("navigator_scheduler_wait_seconds", "histogram", "Time waited for a scheduler slot.",
+           [({"model": model, "priority": name}, hist) for model, lane in lanes for name, hist in lane.wait.items()])
+    yield ("navigator_scheduler_rejected_total", "counter", "Requests rejected by the scheduler.",
+           [({"model": model, "priority": name}, n) for model, lane in lanes for name, n in lane.rejected.items()])
+    cache = knowledge_cache.stats()
+    yield ("navigator_knowledge_cache_lookups_total", "counter", "Knowledge cache lookups by result.",
+           [({"result": result}, cache[result]) for result in ("hits", "misses", "coalesced")])
+
+REGISTRY.add_collector(collect_runtime_metrics)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text-format metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     print("=" * 60)
     print("Navigator RAG API Server v2.0.4")
     print("=" * 60)
-    print(f"Ollama URL: {OLLAMA_URL}")
+    print(f"Ollama URLs: {', '.join(OLLAMA_URLS)}")
     print(f"Ollama Model: {OLLAMA_MODEL}")
     print(f"Convex URL: {CONVEX_URL}")
     print(f"Knowledge Database: scrapedata (89 tools)")
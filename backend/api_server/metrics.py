@@ -0,0 +1,184 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Metric families are registered once at import time and updated from the
+request path; components that already keep their own counters (upstreams,
+caches, scheduler) are exported through collectors that read their stats()
+at scrape time instead of being instrumented twice.
+
+    CHAT_STAGE_SECONDS.labels("classify").observe(0.012)
+    REGISTRY.add_collector(lambda: [("navigator_queue_depth", "gauge", "...", [({}, 3)])])
+"""
+
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative counts (Prometheus layout)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[tuple]:
+        """[(upper bound, observations <= bound)], ending with ("+Inf", count)."""
+        running, result = 0, []
+        for bound, n in zip(self.buckets + ("+Inf",), self.counts):
+            running += n
+            result.append((bound, running))
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, running in self.cumulative():
+            if running >= target:
+                return bound if bound != "+Inf" else self.buckets[-1]
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class MetricFamily:
+    """One metric name with a child Counter or Histogram per label combination."""
+
+    def __init__(self, name: str, kind: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.children: Dict[tuple, object] = {}
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self.children.get(values)
+        if child is None:
+            child = Histogram(self.buckets) if self.kind == "histogram" else Counter()
+            self.children[values] = child
+        return child
+
+    def samples(self) -> list:
+        return [(dict(zip(self.labelnames, values)), child) for values, child in self.children.items()]
+
+
+Collector = Callable[[], Iterable[tuple]]
+
+
+class Registry:
+    def __init__(self):
+        self.families: List[MetricFamily] = []
+        self.collectors: List[Collector] = []
+
+    def counter(self, name: str, help_text: str, labelnames=()) -> MetricFamily:
+        family = MetricFamily(name, "counter", help_text, tuple(labelnames))
+        self.families.append(family)
+        return family
+
+    def histogram(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS) -> MetricFamily:
+        family = MetricFamily(name, "histogram", help_text, tuple(labelnames), buckets)
+        self.families.append(family)
+        return family
+
+    def add_collector(self, collector: Collector):
+        """collector() yields (name, kind, help, [(labels, value or Histogram)])."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        entries = [(f.name, f.kind, f.help, f.samples()) for f in self.families]
+        for collector in self.collectors:
+            entries.extend(collector())
+        for name, kind, help_text, samples in entries:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if isinstance(value, Histogram):
+                    for bound, running in value.cumulative():
+                        le = bound if bound == "+Inf" else _format_value(bound)
+                        lines.append(f"{name}_bucket{_format_labels(dict(labels, le=le))} {running}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value.total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+                else:
+                    if isinstance(value, Counter):
+                        value = value.value
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "NaN"
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+REGISTRY = Registry()
+
+CHAT_STAGE_SECONDS = REGISTRY.histogram(
+    "navigator_chat_stage_seconds",
+    "Time spent in each /chat stage (classify, retrieve, prompt, queue, ttft, generate, total).",
+    ("stage",),
+)
+CHAT_REQUESTS = REGISTRY.counter(
+    "navigator_chat_requests_total",
+    "/chat requests by path (rag, fallback, general) and outcome.",
+    ("path", "outcome"),
+)
+GENERATED_TOKENS = REGISTRY.counter(
+    "navigator_generated_tokens_total",
+    "Tokens generated by Ollama (eval_count), per model and backend.",
+    ("model", "backend"),
+)
+GENERATION_SECONDS = REGISTRY.counter(
+    "navigator_generation_seconds_total",
+    "Ollama eval time (eval_duration); tokens/sec = rate(tokens) / rate(seconds).",
+    ("model", "backend"),
+)
@@ -0,0 +1,128 @@
+"""
+NDJSON helpers for the Ollama stream.
+
+Lines are encoded and decoded with orjson when it is installed (several times
+faster than the json module on the small objects Ollama streams per token),
+otherwise with the standard library. Both work on bytes.
+
+coalesce() batches the per-token lines into fewer, larger HTTP chunks.
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, List, Optional
+
+try:
+    import orjson
+
+    CODEC = "orjson"
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps_line(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+
+except ImportError:
+    CODEC = "json"
+
+    def loads(data):
+        return json.loads(data)
+
+    def dumps_line(obj) -> bytes:
+        return (json.dumps(obj) + "\n").encode()
+
+
+class LineBuffer:
+    """Reassembles complete lines from arbitrarily split byte chunks."""
+
+    __slots__ = ("_partial",)
+
+    def __init__(self):
+        self._partial = b""
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        if b"\n" not in chunk:
+            self._partial += chunk
+            return []
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        return [line for line in lines if line.strip()]
+
+    def flush(self) -> List[bytes]:
+        rest, self._partial = self._partial, b""
+        return [rest] if rest.strip() else []
+
+
+def last_line(previous: Optional[bytes], last: Optional[bytes]) -> Optional[bytes]:
+    """Final complete NDJSON line from the last two chunks of a stream."""
+    tail = (previous or b"") + (last or b"") if last and last.rstrip().count(b"\n") == 0 else last
+    if not tail:
+        return None
+    lines = [line for line in tail.split(b"\n") if line.strip()]
+    return lines[-1] if lines else None
+
+
+async def coalesce(stream: AsyncIterator[bytes], interval_ms: float, max_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Re-chunks a byte stream: the first chunk is sent at once (time to first
+    token), later chunks are buffered and sent every interval_ms or once
+    max_bytes are pending, whichever comes first. interval_ms <= 0 passes
+    chunks through unchanged.
+
+    Lines may be split across or merged into output chunks; NDJSON readers
+    that buffer partial lines (like the extension's) are unaffected.
+    """
+    if interval_ms <= 0:
+        async for chunk in stream:
+            yield chunk
+        return
+
+    interval = interval_ms / 1000
+    iterator = stream.__aiter__()
+    pending: List[bytes] = []
+    size = 0
+    first = True
+    deadline = None
+    next_chunk = None
+    try:
+        while True:
+            if next_chunk is None and deadline is None:
+                # Nothing buffered: no flush timer to race against
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+            else:
+                if next_chunk is None:
+                    next_chunk = asyncio.ensure_future(iterator.__anext__())
+                # Wait without cancelling the read, so a flush never interrupts the upstream
+                done, _ = await asyncio.wait((next_chunk,), timeout=max(deadline - time.monotonic(), 0)
+                                             if deadline is not None else None)
+                if not done:
+                    yield b"".join(pending)
+                    pending, size, deadline = [], 0, None
+                    continue
+                task, next_chunk = next_chunk, None
+                try:
+                    chunk = task.result()
+                except StopAsyncIteration:
+                    break
+            if first:
+                first = False
+                yield chunk
+                continue
+            pending.append(chunk)
+            size += len(chunk)
+            if deadline is None:
+                deadline = time.monotonic() + interval
+            if size >= max_bytes:
+                yield b"".join(pending)
+                pending, size, deadline = [], 0, None
+        if pending:
+            yield b"".join(pending)
+    finally:
+        if next_chunk is not None and not next_chunk.done():
+            next_chunk.cancel()
+            await asyncio.gather(next_chunk, return_exceptions=True)
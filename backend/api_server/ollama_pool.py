@@ -0,0 +1,290 @@
+"""
+A pool of Ollama backends with least-loaded routing and failover.
+
+OLLAMA_URLS lists several Ollama hosts (OLLAMA_URL alone is a pool of one).
+Each request goes to the healthy backend with the lowest expected wait:
+in-flight generations divided by the backend's observed tokens/sec, with a
+penalty when the model is not already loaded there (from /api/ps). A
+background loop health-checks every backend; a backend that refuses a
+connection is taken out of rotation until its next successful check.
+
+Streams are retried on another backend when they fail (connection error or
+5xx) before the first line arrives; a 4xx goes straight back to the caller.
+Once the first line has been forwarded, the answer is committed to that
+backend.
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+
+import httpx
+
+from metrics import GENERATED_TOKENS, GENERATION_SECONDS
+from ndjson import last_line, loads
+from upstreams import _env_float, ollama_upstream
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaUnavailable(Exception):
+    """Every backend failed before producing a response."""
+
+
+class OllamaRequestError(Exception):
+    """A backend rejected the request itself (4xx); another backend would too."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OllamaBackend:
+    """One Ollama host: its pooled client plus routing state."""
+
+    def __init__(self, upstream, default_tps: float = 20.0):
+        self.upstream = upstream
+        self.inflight = 0
+        self.healthy = True
+        self.resident_models: set = set()
+        self.tokens_per_second: Optional[float] = None
+        self.default_tps = default_tps
+        self.failovers = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_check: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return self.upstream.base_url
+
+    def expected_wait(self, model: Optional[str], load_penalty: float) -> float:
+        cost = self.inflight + 1
+        if model and model not in self.resident_models:
+            cost += load_penalty
+        return cost / (self.tokens_per_second or self.default_tps)
+
+    def observe_done(self, data: dict):
+        """Updates tokens/sec from the eval counters on Ollama's final line."""
+        count, duration = data.get("eval_count"), data.get("eval_duration")
+        if count and duration:
+            model = data.get("model", "")
+            GENERATED_TOKENS.labels(model, self.name).inc(count)
+            GENERATION_SECONDS.labels(model, self.name).inc(duration / 1e9)
+            tps = count / (duration / 1e9)
+            if self.tokens_per_second is None:
+                self.tokens_per_second = tps
+            else:
+                self.tokens_per_second += 0.2 * (tps - self.tokens_per_second)
+        if data.get("model"):
+            self.resident_models.add(data["model"])
+
+    def mark_failed(self, error: Exception, max_failures: int = 3):
+        self.upstream.record_error()
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        # Out of rotation until the next successful health check
+        refused = isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+        if refused or self.consecutive_failures >= max_failures:
+            self.healthy = False
+
+    async def check(self, timeout: float):
+        try:
+            response = await self.upstream.client.get("/api/ps", timeout=timeout)
+            response.raise_for_status()
+            models = response.json().get("models") or []
+            self.resident_models = {m.get("name") or m.get("model") for m in models}
+            self.healthy = True
+            self.consecutive_failures = 0
+        except Exception as e:
+            self.healthy = False
+            self.last_error = f"{type(e).__name__}: {e}"
+        self.last_check = time.time()
+
+    def stats(self) -> dict:
+        return {
+            **self.upstream.stats(),
+            "healthy": self.healthy,
+            "inflight": self.inflight,
+            "tokens_per_second": (round(self.tokens_per_second, 1)
+                                  if self.tokens_per_second else None),
+            "resident_models": sorted(m for m in self.resident_models if m),
+            "failovers": self.failovers,
+            "last_error": self.last_error,
+        }
+
+
+class OllamaPool:
+    """
+    Drop-in for the single Ollama Upstream: start/close/client/record_error/
+    stats, plus post() and stream_lines() with routing and failover.
+    """
+
+    def __init__(self, base_urls: List[str], health_interval: float = 10.0,
+                 health_timeout: float = 2.0, load_penalty: float = 2.0):
+        if not base_urls:
+            raise ValueError("At least one Ollama URL is required")
+        self.backends = [
+            OllamaBackend(ollama_upstream(
+                url, name=f"ollama[{i}]" if len(base_urls) > 1 else "ollama"))
+            for i, url in enumerate(base_urls)
+        ]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.load_penalty = load_penalty
+        self.errors_total = 0
+
+    @property
+    def base_url(self) -> str:
+        return ", ".join(b.name for b in self.backends)
+
+    async def start(self):
+        for backend in self.backends:
+            await backend.upstream.start()
+
+    async def close(self):
+        for backend in self.backends:
+            await backend.upstream.close()
+
+    async def check_health(self):
+        await asyncio.gather(*(b.check(self.health_timeout) for b in self.backends))
+
+    async def run(self):
+        """Health-checks every backend every health_interval seconds."""
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    def pick(self, model: Optional[str] = None, exclude=()) -> OllamaBackend:
+        candidates = [b for b in self.backends if b not in exclude]
+        if not candidates:
+            raise OllamaUnavailable("No Ollama backend left to try")
+        healthy = [b for b in candidates if b.healthy]
+        # With nothing healthy, still try: a health check may just be stale
+        return min(healthy or candidates, key=lambda b: b.expected_wait(model, self.load_penalty))
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Client of the least-loaded backend, for callers that need no failover."""
+        return self.pick().upstream.client
+
+    def record_error(self):
+        """Errors outside a backend call (e.g. a bad response body)."""
+        self.errors_total += 1
+
+    async def post(self, path: str, payload: dict, **kwargs) -> httpx.Response:
+        """POST with failover to the next backend on connection errors or 5xx."""
+        tried, last_error = [], None
+        while len(tried) < len(self.backends):
+            backend = self.pick(payload.get("model"), tried)
+            tried.append(backend)
+            backend.inflight += 1
+            try:
+                response = await backend.upstream.client.post(path, json=payload, **kwargs)
+                if response.status_code >= 500:
+                    raise httpx.HTTPStatusError(f"HTTP {response.status_code}",
+                                                request=response.request, response=response)
+                if payload.get("stream") is False and response.status_code == 200:
+                    backend.observe_done(response.json())
+                backend.consecutive_failures = 0
+                return response
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                backend.mark_failed(e)
+                backend.failovers += 1
+                last_error = e
+            finally:
+                backend.inflight -= 1
+        raise OllamaUnavailable(f"All Ollama backends failed: {last_error}")
+
+    async def stream_lines(self, path: str, payload: dict) -> AsyncIterator[str]:
+        """
+        Streams NDJSON lines from the first backend that produces one.
+        Raises OllamaUnavailable if every backend fails before its first line,
+        OllamaRequestError if a backend answers 4xx.
+        """
+        async for line in self._stream(path, payload, raw=False):
+            yield line
+
+    async def stream_raw(self, path: str, payload: dict) -> AsyncIterator[bytes]:
+        """
+        Like stream_lines, but forwards the response bytes as they arrive,
+        without splitting or decoding them. Chunks need not end on a line.
+        """
+        async for chunk in self._stream(path, payload, raw=True):
+            yield chunk
+
+    async def _stream(self, path: str, payload: dict, raw: bool):
+        tried, last_error = [], None
+        while len(tried) < len(self.backends):
+            backend = self.pick(payload.get("model"), tried)
+            tried.append(backend)
+            backend.inflight += 1
+            committed = False
+            try:
+                async with backend.upstream.client.stream("POST", path, json=payload) as response:
+                    if response.status_code != 200:
+                        error_text = (await response.aread()).decode(errors="replace")
+                        if response.status_code < 500:
+                            # The request's fault (unknown model, bad options), not the backend's:
+                            # no failover, and it does not count against the backend's health
+                            raise OllamaRequestError(response.status_code,
+                                                     f"Ollama error: {error_text}")
+                        raise OllamaUnavailable(f"Ollama error: {error_text}")
+                    if raw:
+                        # aiter_raw skips the decoder; only needed if Ollama ever compresses
+                        if "content-encoding" in response.headers:
+                            chunks = response.aiter_bytes()
+                        else:
+                            chunks = response.aiter_raw()
+                    else:
+                        chunks = response.aiter_lines()
+                    previous = last = None
+                    async for chunk in chunks:
+                        # Raw chunks are forwarded as-is: a lone b"\n" may end the previous line
+                        if not raw and not chunk.strip():
+                            continue
+                        if not committed:
+                            committed = True
+                            backend.consecutive_failures = 0
+                        previous, last = last, chunk
+                        yield chunk
+                    final = last_line(previous, last) if raw else last
+                    if final is not None:
+                        try:
+                            backend.observe_done(loads(final))
+                        except ValueError:
+                            pass
+                    return
+            except (httpx.TransportError, OllamaUnavailable) as e:
+                backend.mark_failed(e)
+                if committed:
+                    raise
+                backend.failovers += 1
+                last_error = e
+                logger.warning("%s failed before first token, trying another backend: %s",
+                               backend.name, e)
+            finally:
+                backend.inflight -= 1
+        if len(self.backends) > 1:
+            raise OllamaUnavailable(f"All Ollama backends failed (last: {last_error})")
+        if isinstance(last_error, OllamaUnavailable):
+            raise last_error
+        raise OllamaUnavailable(
+            f"Cannot connect to Ollama at {self.backends[0].name}: {last_error}")
+
+    def stats(self) -> dict:
+        return {
+            "backends": [b.stats() for b in self.backends],
+            "healthy": sum(b.healthy for b in self.backends),
+            "inflight": sum(b.inflight for b in self.backends),
+            "errors_total": self.errors_total,
+        }
+
+
+def ollama_pool(base_urls: List[str]) -> OllamaPool:
+    return OllamaPool(
+        base_urls,
+        health_interval=_env_float("OLLAMA_HEALTH_INTERVAL", 10.0),
+        load_penalty=_env_float("OLLAMA_LOAD_PENALTY", 2.0),
+    )
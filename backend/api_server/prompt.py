@@ -0,0 +1,220 @@
+"""
+Token-budget-aware prompt assembly for the RAG path.
+
+Instead of cutting every chunk at 500 characters and the page context at
+2000, the assembler counts tokens, drops near-duplicate chunks, and fills a
+token budget with the most relevant chunks first. The prompt is laid out
+most-stable-first (fixed instructions, tool knowledge in a deterministic
+order, then a user message with page context and the question) so Ollama can
+reuse the KV cache for the shared prefix across turns.
+"""
+
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = """You are Navigator, a contextual AI assistant that helps users understand and navigate tools.
+
+Key principles:
+1. Ground answers in the provided page context and knowledge base
+2. If you don't see relevant information, say so clearly
+3. Be concise and actionable
+4. Consider the user's current screen context to understand their objective
+"""
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?:])\s+|\n+")
+
+
+class TokenCounter:
+    """
+    Counts tokens with a Hugging Face tokenizer when TOKENIZER names one
+    (needs the `tokenizers` package), otherwise with a fast word-piece
+    estimate. Counts of chunk-sized texts are memoized since the same chunks
+    recur across requests; long one-off texts like page context are not.
+    """
+
+    def __init__(self, tokenizer_name: Optional[str] = None, cache_size: int = 8192, cache_max_chars: int = 4096):
+        self.name = "estimate"
+        self._tokenizer = None
+        if tokenizer_name:
+            try:
+                from tokenizers import Tokenizer
+
+                self._tokenizer = Tokenizer.from_pretrained(tokenizer_name)
+                self.name = tokenizer_name
+            except Exception as e:
+                logger.warning("Tokenizer %s unavailable, estimating token counts: %s", tokenizer_name, e)
+        self.cache_max_chars = cache_max_chars
+        self._cached_count = lru_cache(maxsize=cache_size)(self._count)
+
+    def count(self, text: str) -> int:
+        if len(text) <= self.cache_max_chars:
+            return self._cached_count(text)
+        return self._count(text)
+
+    def _count(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        # Long words split into several BPE pieces; roughly one per 4 chars
+        return sum(max(1, (len(p) + 3) // 4) for p in _PIECE_RE.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of text within max_tokens, cut at a sentence end when possible."""
+        if max_tokens <= 0:
+            return ""
+        total = self.count(text)
+        if total <= max_tokens:
+            return text
+        cut = int(len(text) * max_tokens / total)
+        while cut > 0 and self.count(text[:cut]) > max_tokens:
+            cut = int(cut * 0.9)
+        head = text[:cut]
+        ends = [m.start() for m in _SENTENCE_END_RE.finditer(head)]
+        # Prefer a sentence boundary unless it throws away most of the budget
+        if ends and ends[-1] > cut * 0.6:
+            head = head[:ends[-1]]
+        return head.rstrip()
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def dedupe_chunks(chunks: List[dict], threshold: float = 0.8) -> List[dict]:
+    """Drops chunks whose word-shingle Jaccard similarity to a kept chunk is >= threshold."""
+    kept, kept_shingles = [], []
+    for chunk in chunks:
+        shingles = _shingles(chunk.get("content", ""))
+        if not shingles:
+            continue
+        if any(len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(chunk)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def relevance(chunk: dict) -> float:
+    for key in ("rerank_score", "rrf_score", "score", "_score"):
+        if isinstance(chunk.get(key), (int, float)):
+            return float(chunk[key])
+    return 0.0
+
+
+def _stable_id(chunk: dict) -> str:
+    return str(chunk.get("_id") or chunk.get("url") or chunk.get("content", "")[:64])
+
+
+class PromptAssembler:
+    """Builds prompts that fit a token budget."""
+
+    def __init__(
+        self,
+        counter: TokenCounter,
+        budget: int = 4096,
+        response_reserve: int = 1024,
+        page_context_tokens: int = 1024,
+        min_chunk_tokens: int = 64,
+        dedupe_threshold: float = 0.8,
+    ):
+        self.counter = counter
+        self.budget = budget
+        self.response_reserve = response_reserve
+        self.page_context_tokens = page_context_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self.prompts = 0
+        self.prompt_tokens = 0
+        self.chunks_in = 0
+        self.chunks_used = 0
+        self.duplicates_dropped = 0
+
+    def select_chunks(self, chunks: List[dict], budget: int) -> List[dict]:
+        """Most relevant unique chunks that fit budget, returned in a stable order."""
+        # Keep retrieval order for equal scores (e.g. Convex search without scores)
+        ranked = sorted(enumerate(chunks), key=lambda item: (-relevance(item[1]), item[0]))
+        unique = dedupe_chunks([chunk for _, chunk in ranked], self.dedupe_threshold)
+        self.duplicates_dropped += len(chunks) - len(unique)
+
+        selected = []
+        for chunk in unique:
+            content = chunk.get("content", "").strip()
+            cost = self.counter.count(content) + 8  # source header
+            if cost <= budget:
+                selected.append((chunk, content))
+                budget -= cost
+            elif budget - 8 >= self.min_chunk_tokens:
+                selected.append((chunk, self.counter.truncate(content, budget - 8)))
+                budget = 0
+            if budget < self.min_chunk_tokens:
+                break
+        # Same chunks in the same order on every turn keep the prompt prefix identical
+        selected.sort(key=lambda item: _stable_id(item[0]))
+        return [dict(chunk, content=content) for chunk, content in selected]
+
+    def build_messages(self, query: str, tool_name: Optional[str], context_text: str, knowledge_chunks: list,
+                       instruction: str = "Provide a helpful, grounded answer:") -> List[dict]:
+        """
+        Chat messages laid out most stable first, so consecutive requests
+        share the longest possible token prefix:
+
+        1. system: fixed instructions (identical for every request)
+        2. system (same message): per-tool knowledge, in a stable chunk order
+        3. user: page context, then the question
+        """
+        question = f"User question: {query}\n\n{instruction}"
+        available = self.budget - self.response_reserve - self.counter.count(SYSTEM_PROMPT) - self.counter.count(question)
+
+        # Without knowledge, the page context may use the whole remaining budget
+        page_limit = self.page_context_tokens if tool_name and knowledge_chunks else available
+        page = self.counter.truncate(context_text, min(page_limit, max(available, 0)))
+        available -= self.counter.count(page)
+
+        system = SYSTEM_PROMPT
+        if tool_name and knowledge_chunks:
+            chunks = self.select_chunks(knowledge_chunks, max(available, 0))
+            self.chunks_in += len(knowledge_chunks)
+            self.chunks_used += len(chunks)
+            if chunks:
+                system += f"\nYou are currently helping with {tool_name}. Use the following knowledge base:\n\n"
+                for i, chunk in enumerate(chunks, 1):
+                    system += f"[Source {i}]\n{chunk['content']}\n\n"
+
+        user = f"Current page context:\n{page}\n\n{question}"
+        self.prompts += 1
+        self.prompt_tokens += self.counter.count(system) + self.counter.count(user)
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "tokenizer": self.counter.name,
+            "budget": self.budget,
+            "response_reserve": self.response_reserve,
+            "prompts": self.prompts,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.prompts, 1) if self.prompts else 0.0,
+            "chunks_in": self.chunks_in,
+            "chunks_used": self.chunks_used,
+            "duplicates_dropped": self.duplicates_dropped,
+            "token_cache": self.counter._cached_count.cache_info()._asdict(),
+        }
+
+
+def build_assembler() -> PromptAssembler:
+    return PromptAssembler(
+        TokenCounter(os.getenv("TOKENIZER")),
+        budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "4096")),
+        response_reserve=int(os.getenv("PROMPT_RESPONSE_RESERVE", "1024")),
+        page_context_tokens=int(os.getenv("PAGE_CONTEXT_TOKENS", "1024")),
+        dedupe_threshold=float(os.getenv("CHUNK_DEDUPE_THRESHOLD", "0.8")),
+    )
@@ -0,0 +1,214 @@
+"""
+Response cache for repeated /chat questions.
+
+Answers are keyed on (tool, normalized query, hash of retrieved chunk IDs),
+so a cached answer is only replayed when the same knowledge was retrieved.
+With an embedder and a similarity threshold, a query that misses the exact
+key can still hit a cached answer for a paraphrase with the same chunks.
+
+Memory is bounded by entry count and total bytes, with LRU eviction and TTL.
+Hits are replayed in the same NDJSON format Ollama's chat stream uses, so the
+extension's parser needs no changes.
+"""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+
+from embeddings import cosine
+from ndjson import LineBuffer, dumps_line, loads
+
+logger = logging.getLogger(__name__)
+
+REPLAY_CHUNK_CHARS = 200
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+def chunks_fingerprint(chunks: List[dict]) -> str:
+    """Stable hash of the retrieved chunk IDs (falls back to url/content)."""
+    ids = sorted(
+        str(c.get("_id") or c.get("id") or c.get("url") or hashlib.sha1(c.get("content", "").encode()).hexdigest())
+        for c in chunks
+    )
+    return hashlib.sha1("\n".join(ids).encode()).hexdigest()[:16]
+
+
+class _Entry(NamedTuple):
+    answer: str
+    vector: Optional[List[float]]
+    expires_at: float
+    size: int
+
+
+class ResponseCache:
+    """Bounded LRU/TTL store of final answers, with optional semantic lookup."""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        max_bytes: int = 8 * 1024 * 1024,
+        ttl: float = 3600.0,
+        embedder=None,
+        similarity: float = 0.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.embedder = embedder if similarity > 0 else None
+        self.similarity = similarity
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        # (tool, fingerprint) -> keys, limits the semantic scan to answers built on the same chunks
+        self._buckets: Dict[tuple, set] = {}
+        self.bytes = 0
+        self.evictions = 0
+        self.per_tool: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, tool: Optional[str], outcome: str):
+        counts = self.per_tool.setdefault(tool or "(none)", {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0})
+        counts[outcome] += 1
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        bucket = self._buckets.get(key[:1] + key[2:])
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[key[:1] + key[2:]]
+
+    def _live(self, key: tuple) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def _embed(self, query: str) -> Optional[List[float]]:
+        if self.embedder is None:
+            return None
+        try:
+            return (await self.embedder.embed([query]))[0]
+        except Exception as e:
+            logger.warning("Response cache embedding failed: %s", e)
+            return None
+
+    async def lookup(self, tool: Optional[str], query: str, chunks: List[dict]):
+        """
+        Returns (answer or None, lookup state). Pass the state to store() so
+        the query embedding is computed once.
+        """
+        fingerprint = chunks_fingerprint(chunks)
+        key = ((tool or "").lower(), normalize_query(query), fingerprint)
+        entry = self._live(key)
+        if entry is not None:
+            self._count(tool, "hits")
+            return entry.answer, (key, entry.vector)
+
+        vector = await self._embed(normalize_query(query))
+        if vector is not None:
+            best_key, best_score = None, self.similarity
+            for other in list(self._buckets.get(key[:1] + key[2:], ())):
+                candidate = self._live(other)
+                if candidate is not None and candidate.vector is not None:
+                    score = cosine(vector, candidate.vector)
+                    if score >= best_score:
+                        best_key, best_score = other, score
+            if best_key is not None:
+                self._count(tool, "semantic_hits")
+                return self._entries[best_key].answer, (key, vector)
+
+        self._count(tool, "misses")
+        return None, (key, vector)
+
+    def store(self, tool: Optional[str], state, answer: str):
+        key, vector = state
+        size = len(answer.encode()) + (len(vector) * 8 if vector else 0) + 256
+        if not answer or size > self.max_bytes or self.max_entries <= 0:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(answer, vector, time.monotonic() + self.ttl, size)
+        self._buckets.setdefault(key[:1] + key[2:], set()).add(key)
+        self.bytes += size
+        self._count(tool, "stores")
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate_tool(self, tool: Optional[str] = None) -> int:
+        """Drops every answer for tool, or all answers when tool is None; returns how many."""
+        if tool is None:
+            keys = list(self._entries)
+        else:
+            tool = tool.strip().lower()
+            keys = [key for key in self._entries if key[0] == tool]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    async def capture(self, tool: Optional[str], state, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Passes a chat NDJSON byte stream through (chunks need not end on a
+        line) and stores the answer if it completes cleanly.
+        """
+        parts = []
+        complete = False
+        failed = False
+        buffer = LineBuffer()
+        async for chunk in stream:
+            yield chunk
+            for line in buffer.feed(chunk):
+                try:
+                    data = loads(line)
+                except ValueError:
+                    continue
+                if "error" in data:
+                    failed = True
+                content = (data.get("message") or {}).get("content")
+                if content:
+                    parts.append(content)
+                if data.get("done"):
+                    complete = True
+        if complete and not failed:
+            self.store(tool, state, "".join(parts))
+
+    @staticmethod
+    async def replay(answer: str, model: str) -> AsyncIterator[bytes]:
+        """Yields a cached answer as Ollama chat NDJSON lines."""
+        for i in range(0, len(answer), REPLAY_CHUNK_CHARS):
+            yield dumps_line({
+                "model": model,
+                "message": {"role": "assistant", "content": answer[i:i + REPLAY_CHUNK_CHARS]},
+                "done": False
+            })
+        yield dumps_line({
+            "model": model,
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "cached": True
+        })
+
+    def stats(self) -> dict:
+        per_tool = {}
+        for tool, counts in self.per_tool.items():
+            lookups = counts["hits"] + counts["semantic_hits"] + counts["misses"]
+            per_tool[tool] = dict(counts, hit_rate=round(
+                (counts["hits"] + counts["semantic_hits"]) / lookups, 4) if lookups else 0.0)
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "similarity": self.similarity if self.embedder else None,
+            "evictions": self.evictions,
+            "per_tool": per_tool,
+        }
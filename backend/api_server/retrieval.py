@@ -0,0 +1,217 @@
+"""
+Hybrid retrieval for the RAG path: BM25 + vector search, fused with
+reciprocal rank fusion (RRF), optionally reranked.
+
+BM25 runs over the same chunk rows as the local vector index (one inverted
+index per tool partition, rebuilt when the partition changes). Each posting
+list is a pair of numpy arrays, so scoring a query is a handful of
+vectorized adds. Per-stage latency is recorded for /stats.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "is", "are",
+    "it", "this", "that", "with", "as", "at", "by", "be", "i", "do", "how",
+    "can", "my", "you", "your", "what", "from", "if", "then",
+}
+
+
+def bm25_tokens(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a list of chunk dicts (uses 'title' and 'content')."""
+
+    def __init__(self, chunks: List[dict], excluded_rows=None, k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.size = len(chunks)
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = np.zeros(self.size, dtype=np.float32)
+        excluded = set(excluded_rows or ())
+        for row, chunk in enumerate(chunks):
+            if row in excluded:
+                continue
+            tokens = bm25_tokens(f"{chunk.get('title') or ''} {chunk.get('content', '')}")
+            lengths[row] = len(tokens)
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[row] = counts.get(row, 0) + 1
+
+        live = self.size - len(excluded)
+        avgdl = float(lengths.sum()) / live if live else 1.0
+        # Precomputed per-row length normalization: k1 * (1 - b + b * dl / avgdl)
+        self._norm = self.k1 * (1 - self.b + self.b * lengths / max(avgdl, 1e-9))
+        self._postings = {}
+        for token, counts in postings.items():
+            rows = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            idf = math.log(1 + (live - len(counts) + 0.5) / (len(counts) + 0.5))
+            self._postings[token] = (rows, tf, idf)
+
+    def search(self, query: str, k: int) -> List[tuple]:
+        """Returns [(row, score)] for the top-k rows with a positive score."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for token in set(bm25_tokens(query)):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            rows, tf, idf = posting
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + self._norm[rows])
+        hits = np.flatnonzero(scores)
+        if hits.size == 0:
+            return []
+        if hits.size > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(int(row), float(scores[row])) for row in hits]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """Fuses ranked id lists: score(id) = sum(1 / (k + rank))."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+class CrossEncoderReranker:
+    """Reranks (query, chunk) pairs with a sentence-transformers CrossEncoder (optional dependency)."""
+
+    def __init__(self, model: str):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model)
+
+    async def rerank(self, query: str, chunks: List[dict]) -> List[float]:
+        pairs = [(query, chunk.get("content", "")) for chunk in chunks]
+        scores = await asyncio.to_thread(self.model.predict, pairs)
+        return [float(s) for s in scores]
+
+
+class HybridRetriever:
+    """BM25 + vector candidates from the local index, fused with RRF."""
+
+    STAGES = ("vector", "bm25", "fuse", "rerank")
+
+    def __init__(self, vector_index, mode: str = "hybrid", candidates: int = 20, rrf_k: int = 60,
+                 reranker=None, rerank_top: int = 10):
+        self.vector_index = vector_index
+        self.mode = mode
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.reranker = reranker
+        self.rerank_top = rerank_top
+        self._bm25: Dict[str, tuple] = {}
+        self.stage_seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.stage_counts = dict.fromkeys(self.STAGES, 0)
+        self.vector_failures = 0
+
+    def _record(self, stage: str, start: float):
+        self.stage_seconds[stage] += time.perf_counter() - start
+        self.stage_counts[stage] += 1
+
+    async def bm25(self, tool_name: str) -> BM25Index:
+        part = self.vector_index.partition(tool_name)
+        cached = self._bm25.get(tool_name)
+        # Rebuild when the partition has been reloaded with new rows. The build
+        # runs in a thread, and queries arriving meanwhile await the same task.
+        if cached is None or cached[0] is not part.chunks:
+            build = asyncio.ensure_future(asyncio.to_thread(
+                BM25Index, part.chunks, part.manifest.get("tombstones")))
+            self._bm25[tool_name] = cached = (part.chunks, build)
+        try:
+            return await cached[1]
+        except Exception:
+            if self._bm25.get(tool_name) is cached:
+                del self._bm25[tool_name]
+            raise
+
+    async def retrieve(self, tool_name: str, query: str, limit: int = 5) -> List[dict]:
+        part = self.vector_index.partition(tool_name)
+        by_id: Dict[str, dict] = {}
+        rankings = []
+
+        if self.mode in ("hybrid", "vector"):
+            start = time.perf_counter()
+            try:
+                hits = (await self.vector_index.search(tool_name, [query], self.candidates))[0]
+                rankings.append([hit["_id"] for hit in hits])
+                for hit in hits:
+                    by_id[hit["_id"]] = hit
+            except Exception as e:
+                # Lexical results alone are still better than nothing
+                self.vector_failures += 1
+                logger.warning("Vector stage failed for %s: %s", tool_name, e)
+            self._record("vector", start)
+
+        if self.mode in ("hybrid", "bm25"):
+            start = time.perf_counter()
+            hits = (await self.bm25(tool_name)).search(query, self.candidates)
+            ranking = []
+            for row, score in hits:
+                chunk = part.chunks[row]
+                ranking.append(chunk["_id"])
+                by_id.setdefault(chunk["_id"], dict(chunk, score=round(score, 4)))
+            rankings.append(ranking)
+            self._record("bm25", start)
+
+        start = time.perf_counter()
+        fused = reciprocal_rank_fusion(rankings, self.rrf_k)
+        ordered = sorted(fused, key=fused.get, reverse=True)
+        results = [dict(by_id[i], rrf_score=round(fused[i], 5)) for i in ordered]
+        self._record("fuse", start)
+
+        if self.reranker is not None and results:
+            start = time.perf_counter()
+            head = results[:self.rerank_top]
+            scores = await self.reranker.rerank(query, head)
+            for chunk, score in zip(head, scores):
+                chunk["rerank_score"] = round(score, 4)
+            results = sorted(head, key=lambda c: c["rerank_score"], reverse=True) + results[self.rerank_top:]
+            self._record("rerank", start)
+
+        return results[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "candidates": self.candidates,
+            "rerank": self.reranker is not None,
+            "vector_failures": self.vector_failures,
+            "avg_stage_ms": {
+                stage: round(self.stage_seconds[stage] * 1000 / self.stage_counts[stage], 3)
+                for stage in self.STAGES if self.stage_counts[stage]
+            },
+        }
+
+
+def build_retriever(vector_index) -> HybridRetriever:
+    """Configures the retriever from RETRIEVAL_MODE / RETRIEVAL_CANDIDATES / RERANK_MODEL."""
+    reranker = None
+    rerank_model = os.getenv("RERANK_MODEL")
+    if rerank_model:
+        try:
+            reranker = CrossEncoderReranker(rerank_model)
+        except ImportError:
+            logger.warning("sentence-transformers not installed, reranking disabled")
+    return HybridRetriever(
+        vector_index,
+        mode=os.getenv("RETRIEVAL_MODE", "hybrid").lower(),
+        candidates=int(os.getenv("RETRIEVAL_CANDIDATES", "20")),
+        reranker=reranker,
+        rerank_top=int(os.getenv("RERANK_TOP", "10")),
+    )
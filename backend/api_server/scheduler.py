@@ -0,0 +1,192 @@
+"""
+Admission control for generations sent to Ollama.
+
+Ollama runs a fixed number of generations in parallel (OLLAMA_NUM_PARALLEL)
+and queues the rest internally with no priority and no limit, so a burst of
+/chat requests makes every answer slow. The scheduler keeps at most
+`max_inflight` generations per model on the wire, queues the rest in a
+bounded priority queue (streaming answers before classification calls) and
+rejects work it cannot start in time, so callers can return 429 with a
+Retry-After instead of piling up.
+
+    slot = await scheduler.acquire(OLLAMA_MODEL, STREAM)
+    try:
+        ...stream from Ollama...
+    finally:
+        slot.release()
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Optional
+
+from metrics import Histogram
+
+# Lower runs first
+STREAM = 0
+CLASSIFY = 1
+PRIORITY_NAMES = {STREAM: "stream", CLASSIFY: "classify"}
+
+WAIT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class SchedulerSaturated(Exception):
+    """The queue is full or the wait would exceed the caller's deadline."""
+
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(f"{model} is saturated, retry in {retry_after:.0f}s")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class Slot:
+    """One in-flight generation. release() is idempotent."""
+
+    __slots__ = ("_lane", "_released", "started")
+
+    def __init__(self, lane: "ModelLane"):
+        self._lane = lane
+        self._released = False
+        self.started = time.monotonic()
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._lane.release(time.monotonic() - self.started)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class ModelLane:
+    """In-flight limit and priority wait queue for one model."""
+
+    def __init__(self, model: str, max_inflight: int, max_queue: int):
+        self.model = model
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.inflight = 0
+        self._waiters: List[list] = []  # heap of [priority, seq, future]
+        self._seq = itertools.count()
+        # Exponential moving average of how long a generation holds a slot
+        self.avg_service = 5.0
+        self.admitted = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self.rejected = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self.wait = {name: Histogram(WAIT_BUCKETS) for name in PRIORITY_NAMES.values()}
+        self.depth = Histogram(DEPTH_BUCKETS)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for entry in self._waiters if not entry[2].done())
+
+    def estimated_wait(self, ahead: int) -> float:
+        """Seconds until `ahead` queued generations have started."""
+        return (ahead // self.max_inflight + 1) * self.avg_service
+
+    async def acquire(self, priority: int, max_wait: Optional[float]) -> Slot:
+        name = PRIORITY_NAMES[priority]
+        queued = self.queued
+        self.depth.observe(queued)
+        if self.inflight < self.max_inflight and queued == 0:
+            self.inflight += 1
+            self.admitted[name] += 1
+            self.wait[name].observe(0.0)
+            return Slot(self)
+
+        if queued >= self.max_queue:
+            self.rejected[name] += 1
+            raise SchedulerSaturated(self.model, self.estimated_wait(queued))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), max_wait)
+        except asyncio.TimeoutError:
+            self.rejected[name] += 1
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                # Handed a slot just as the deadline passed
+                self._release_slot()
+            raise SchedulerSaturated(self.model, self.estimated_wait(self.queued))
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                self._release_slot()
+            raise
+        self.admitted[name] += 1
+        self.wait[name].observe(time.monotonic() - start)
+        return Slot(self)
+
+    def release(self, held: float):
+        self.avg_service += 0.2 * (held - self.avg_service)
+        self._release_slot()
+
+    def _release_slot(self):
+        # Hand the slot straight to the next live waiter, by priority then arrival
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.inflight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "avg_service_s": round(self.avg_service, 3),
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "queue_depth": self.depth.snapshot(),
+            "wait_seconds": {name: h.snapshot() for name, h in self.wait.items()},
+        }
+
+
+class GenerationScheduler:
+    """Per-model lanes, created on first use."""
+
+    def __init__(self, max_inflight: int = 4, max_queue: int = 64):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.lanes: Dict[str, ModelLane] = {}
+
+    def lane(self, model: str) -> ModelLane:
+        lane = self.lanes.get(model)
+        if lane is None:
+            lane = self.lanes[model] = ModelLane(model, self.max_inflight, self.max_queue)
+        return lane
+
+    async def acquire(self, model: str, priority: int = STREAM, max_wait: Optional[float] = None) -> Slot:
+        """
+        Waits for a generation slot. Raises SchedulerSaturated when the queue
+        is full or no slot frees up within max_wait seconds.
+        """
+        return await self.lane(model).acquire(priority, max_wait)
+
+    def stats(self) -> dict:
+        return {model: lane.stats() for model, lane in self.lanes.items()}
+
+
+def build_scheduler(backends: int = 1) -> GenerationScheduler:
+    """
+    Configures the scheduler from OLLAMA_MAX_INFLIGHT (per backend) and
+    OLLAMA_MAX_QUEUE.
+    """
+    return GenerationScheduler(
+        max_inflight=int(os.getenv("OLLAMA_MAX_INFLIGHT", "4")) * backends,
+        max_queue=int(os.getenv("OLLAMA_MAX_QUEUE", "64")),
+    )
@@ -0,0 +1,65 @@
+import asyncio
+
+from cache import AsyncTTLCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _load_across(cache, key, tag, invalidate):
+    """Starts a load for key, runs invalidate() while it is in flight, then lets it finish."""
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def loader():
+        started.set()
+        await release.wait()
+        return "stale"
+
+    load = asyncio.ensure_future(cache.get_or_load(key, loader, tag))
+    await started.wait()
+    invalidate()
+    release.set()
+    return await load
+
+
+def test_clear_during_load_is_not_stored():
+    async def scenario():
+        cache = AsyncTTLCache()
+        assert await _load_across(cache, "k", "github", cache.clear) == "stale"
+        return cache.get("k")
+
+    assert run(scenario()) is None
+
+
+def test_clear_during_untagged_load_is_not_stored():
+    async def scenario():
+        cache = AsyncTTLCache()
+        await _load_across(cache, "k", None, cache.clear)
+        return cache.get("k")
+
+    assert run(scenario()) is None
+
+
+def test_invalidate_tag_during_load_only_drops_that_tag():
+    async def scenario():
+        cache = AsyncTTLCache()
+        await _load_across(cache, "k", "github", lambda: cache.invalidate_tag("github"))
+        await _load_across(cache, "other", "linear", lambda: cache.invalidate_tag("github"))
+        return cache.get("k"), cache.get("other")
+
+    assert run(scenario()) == (None, "stale")
+
+
+def test_loads_after_clear_are_stored():
+    async def scenario():
+        cache = AsyncTTLCache()
+        cache.clear()
+
+        async def loader():
+            return "fresh"
+
+        await cache.get_or_load("k", loader, "github")
+        return cache.get("k")
+
+    assert run(scenario()) == "fresh"
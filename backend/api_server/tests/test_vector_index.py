@@ -0,0 +1,68 @@
+import json
+import os
+
+import numpy as np
+
+from vector_index import VectorIndex, VectorPartition
+
+
+class _Embedder:
+    name = "test"
+
+
+def _vectors(n, dims=4, value=1.0):
+    return np.full((n, dims), value, dtype=np.float32)
+
+
+def _doc(doc_id):
+    return {"_id": doc_id, "tool_name": "GitHub", "url": f"https://example.com/{doc_id}", "crawled_at": 1}
+
+
+def test_append_after_torn_append_keeps_rows_aligned(tmp_path):
+    path = str(tmp_path / "github")
+    part = VectorPartition(path)
+    part.append(_doc("a"), ["a0", "a1"], _vectors(2, value=1.0), "test")
+
+    # An append that died after writing its rows but before the manifest
+    with open(part.vectors_path, "ab") as f:
+        _vectors(3, value=9.0).tofile(f)
+    with open(part.chunks_path, "a") as f:
+        f.write(json.dumps({"_id": "orphan:0", "content": "orphan"}) + "\n")
+        f.write('{"_id": "orphan:1", "cont')
+
+    part = VectorPartition(path)
+    part.append(_doc("b"), ["b0"], _vectors(1, value=2.0), "test")
+
+    part = VectorPartition(path)
+    assert part.manifest["count"] == 3
+    assert os.path.getsize(part.vectors_path) == 3 * 4 * 4
+    assert [c["_id"] for c in part.chunks] == ["a:0", "a:1", "b:0"]
+    start, end = part.manifest["docs"]["b"]["start"], part.manifest["docs"]["b"]["end"]
+    assert part.vectors[start:end].tolist() == [[2.0] * 4]
+    assert [c["content"] for c in part.chunks[start:end]] == ["b0"]
+
+
+def test_torn_first_append_is_discarded(tmp_path):
+    path = str(tmp_path / "github")
+    os.makedirs(path)
+    part = VectorPartition(path)
+    with open(part.vectors_path, "ab") as f:
+        _vectors(2, value=9.0).tofile(f)
+    with open(part.chunks_path, "a") as f:
+        f.write(json.dumps({"_id": "orphan:0"}) + "\n")
+
+    part.append(_doc("a"), ["a0"], _vectors(1), "test")
+
+    part = VectorPartition(path)
+    assert part.vectors.shape == (1, 4)
+    assert [c["_id"] for c in part.chunks] == ["a:0"]
+
+
+def test_unknown_tools_are_not_cached(tmp_path):
+    index = VectorIndex(str(tmp_path), _Embedder())
+    VectorPartition(str(tmp_path / "github")).append(_doc("a"), ["a0"], _vectors(1), "test")
+
+    for i in range(100):
+        assert not index.has_tool(f"no such tool {i}")
+    assert index.has_tool("GitHub")
+    assert list(index.stats()["tools_loaded"]) == ["github"]
@@ -0,0 +1,97 @@
+"""
+Compiled URL pattern index for tool detection.
+
+Patterns are hostnames with an optional path prefix ("github.com",
+"jira.atlassian.com/browse"). They are stored in a hash table keyed on the
+reversed domain labels, so a lookup parses the URL once and probes at most
+one key per label of its hostname, whatever the number of patterns.
+
+Matching is on label and path-segment boundaries and always prefers the
+longest match: a longer hostname suffix beats a shorter one
+("cloud.google.com" over "google.com"), then a longer path prefix beats a
+shorter one. Ties go to the pattern added first.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# scheme, //authority (user@host:port), path; query and fragment are ignored
+_URL_RE = re.compile(r"^\s*(?:[a-z][a-z0-9+.-]*:(?=//))?(?://)?(?:[^@/?#]*@)?(\[[^\]]*\]|[^:/?#]*)(?::\d*)?([^?#]*)")
+
+
+def _split_pattern(pattern: str) -> Tuple[Tuple[str, ...], str]:
+    """'Jira.Atlassian.com/browse/' -> (('com', 'atlassian', 'jira'), '/browse')"""
+    pattern = pattern.strip().lower()
+    if "://" in pattern:
+        pattern = pattern.split("://", 1)[1]
+    host, _, path = pattern.partition("/")
+    host = host.split(":", 1)[0].strip(".")
+    path = ("/" + path).rstrip("/") if path else ""
+    return tuple(reversed(host.split("."))), path
+
+
+def _split_url(url: str) -> Tuple[Tuple[str, ...], str]:
+    m = _URL_RE.match(url.lower())
+    host, path = m.group(1).strip("."), m.group(2).rstrip("/")
+    if not host:
+        return (), ""
+    labels = host.split(".")
+    labels.reverse()
+    return tuple(labels), path
+
+
+def _path_matches(path: str, prefix: str) -> bool:
+    return not prefix or path == prefix or path.startswith(prefix + "/")
+
+
+class DomainIndex:
+    """Maps URLs to values (tool names) by longest hostname/path match."""
+
+    def __init__(self):
+        # reversed host labels -> [(path_prefix, value)], longest prefix first
+        self._table: Dict[Tuple[str, ...], List[Tuple[str, object]]] = {}
+        self._max_labels = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, pattern: str, value) -> None:
+        labels, path = _split_pattern(pattern)
+        if not labels or not labels[0]:
+            return
+        entries = self._table.setdefault(labels, [])
+        if any(existing == path for existing, _ in entries):
+            return  # first registration wins
+        entries.append((path, value))
+        # Stable sort keeps insertion order between equal-length prefixes
+        entries.sort(key=lambda entry: len(entry[0]), reverse=True)
+        self._max_labels = max(self._max_labels, len(labels))
+        self._size += 1
+
+    def match(self, url: str) -> Optional[Tuple[str, object]]:
+        """Returns (matched pattern, value) for the longest match, or None."""
+        labels, path = _split_url(url)
+        if not labels or not labels[0]:
+            return None
+        table = self._table
+        for length in range(min(len(labels), self._max_labels), 0, -1):
+            entries = table.get(labels[:length])
+            if entries is None:
+                continue
+            for prefix, value in entries:
+                if _path_matches(path, prefix):
+                    return ".".join(reversed(labels[:length])) + prefix, value
+        return None
+
+    def lookup(self, url: str):
+        """Returns the value for the longest match, or None."""
+        found = self.match(url)
+        return found[1] if found else None
+
+    @classmethod
+    def from_mapping(cls, patterns: Dict[str, object]) -> "DomainIndex":
+        index = cls()
+        for pattern, value in patterns.items():
+            index.add(pattern, value)
+        return index
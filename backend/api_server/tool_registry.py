@@ -0,0 +1,156 @@
+"""
+Live tool registry for /detect-tool.
+
+ToolRegistry builds a DomainIndex from tools_config.json and polls the file's
+mtime; a changed file is parsed and compiled off the event loop, then swapped
+in with a single reference assignment, so in-flight lookups never see a
+half-built index and no request is dropped.
+
+KnowledgeCatalog keeps the set of tools that actually have scrapedata in
+Convex, refreshed in the background, to answer has_knowledge.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from tool_index import DomainIndex
+
+logger = logging.getLogger(__name__)
+
+
+def load_tools(path: str) -> List[dict]:
+    """Reads and validates the tool list from tools_config.json."""
+    with open(path) as f:
+        tools = json.load(f).get("tools", [])
+    for tool in tools:
+        if not tool.get("name") or not isinstance(tool.get("patterns"), list):
+            raise ValueError(f"Invalid tool entry: {tool}")
+    return tools
+
+
+def build_index(tools: List[dict]) -> DomainIndex:
+    index = DomainIndex()
+    for tool in tools:
+        for pattern in tool["patterns"]:
+            index.add(pattern, tool)
+    return index
+
+
+class ToolRegistry:
+    """Tool detection index backed by a hot-reloaded config file."""
+
+    def __init__(self, path: str, poll_interval: float = 5.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.index = DomainIndex()
+        self.tools: List[dict] = []
+        self.loaded_at: Optional[float] = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self._stamp = None
+        self._listeners: List[Callable[[List[dict]], None]] = []
+
+    def on_reload(self, listener: Callable[[List[dict]], None]):
+        """Registers a callback that receives the tool list after each (re)load."""
+        self._listeners.append(listener)
+
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _build(self):
+        tools = load_tools(self.path)
+        return tools, build_index(tools)
+
+    def _swap(self, tools: List[dict], index: DomainIndex):
+        self.tools, self.index = tools, index
+        self.loaded_at = time.time()
+        self.reloads += 1
+        for listener in self._listeners:
+            listener(tools)
+
+    def load(self):
+        """Synchronous initial load; raises if the config is unusable."""
+        self._stamp = self._file_stamp()
+        self._swap(*self._build())
+        logger.info("Loaded %d tools (%d patterns) from %s", len(self.tools), len(self.index), self.path)
+
+    async def reload_if_changed(self) -> bool:
+        try:
+            stamp = self._file_stamp()
+        except OSError as e:
+            logger.warning("Tool config not readable: %s", e)
+            return False
+        if stamp == self._stamp:
+            return False
+        # Remember the stamp even on failure so a bad file is not re-parsed every poll
+        self._stamp = stamp
+        try:
+            tools, index = await asyncio.to_thread(self._build)
+        except (OSError, ValueError, KeyError) as e:
+            self.reload_errors += 1
+            logger.error("Tool config reload failed, keeping previous index: %s", e)
+            return False
+        self._swap(tools, index)
+        logger.info("Reloaded %d tools (%d patterns) from %s", len(tools), len(index), self.path)
+        return True
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.reload_if_changed()
+
+    def lookup(self, url: str) -> Optional[dict]:
+        return self.index.lookup(url)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "tools": len(self.tools),
+            "patterns": len(self.index),
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
+
+
+class KnowledgeCatalog:
+    """Cached set of tool names that have knowledge in Convex scrapedata."""
+
+    def __init__(self, fetch: Callable[[], Awaitable[Iterable[str]]], refresh_interval: float = 300.0):
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.tools: Optional[frozenset] = None
+        self.refreshed_at: Optional[float] = None
+        self.refresh_errors = 0
+
+    def has_knowledge(self, tool_name: str) -> bool:
+        # Until the first successful refresh, assume knowledge exists
+        if self.tools is None:
+            return True
+        return tool_name in self.tools
+
+    async def refresh(self):
+        try:
+            self.tools = frozenset(await self.fetch())
+            self.refreshed_at = time.time()
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning("Knowledge catalog refresh failed: %s", e)
+
+    async def run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> dict:
+        return {
+            "tools_with_knowledge": len(self.tools) if self.tools is not None else None,
+            "refreshed_at": self.refreshed_at,
+            "refresh_interval": self.refresh_interval,
+            "refresh_errors": self.refresh_errors,
+        }
@@ -0,0 +1,177 @@
+"""
+Pooled HTTP clients for the upstream services used by the RAG API server.
+
+One httpx.AsyncClient is kept per upstream (Ollama, Convex) for the lifetime
+of the app, so /chat requests reuse warm keep-alive connections instead of
+paying a TCP (and TLS, for Convex cloud) handshake on every call.
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class Upstream:
+    """
+    A named, pooled AsyncClient for a single upstream base URL.
+    The client is created in start() and closed in close(), both driven
+    by the FastAPI lifespan.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        *,
+        timeout: float,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        http2: bool = False,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            logger.warning("[%s] HTTP/2 requested but 'h2' is not installed, using HTTP/1.1", name)
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests_total = 0
+        self.errors_total = 0
+        self.http2_responses = 0
+        self.started_at: Optional[float] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError(f"Upstream '{self.name}' is not started")
+        return self._client
+
+    async def start(self):
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=self.http2,
+            event_hooks={"request": [self._on_request], "response": [self._on_response]},
+        )
+        self.started_at = time.time()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _on_request(self, request: httpx.Request):
+        self.requests_total += 1
+
+    async def _on_response(self, response: httpx.Response):
+        if response.http_version == "HTTP/2":
+            self.http2_responses += 1
+
+    def _pool_stats(self) -> Optional[dict]:
+        """
+        Connection counts from httpcore's pool. httpx does not expose its
+        pool publicly, so every step is looked up defensively; None when the
+        internals are not what this expects (e.g. after an upgrade).
+        """
+        transport = getattr(self._client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return None
+        try:
+            idle = sum(1 for conn in connections if conn.is_idle())
+            return {"open": len(connections), "idle": idle,
+                    "waiting": len(getattr(pool, "_requests", None) or ())}
+        except (AttributeError, TypeError):
+            return None
+
+    def record_error(self):
+        self.errors_total += 1
+
+    def stats(self) -> dict:
+        """Connection pool and request counters for this upstream."""
+        pool = self._pool_stats() if self._client is not None else {"open": 0, "idle": 0, "waiting": 0}
+
+        return {
+            "base_url": self.base_url,
+            "started": self._client is not None,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            # None when the pool cannot be inspected
+            "open_connections": pool and pool["open"],
+            "idle_connections": pool and pool["idle"],
+            "active_connections": pool and pool["open"] - pool["idle"],
+            "requests_waiting": pool and pool["waiting"],
+            "requests_total": self.requests_total,
+            "http2_responses": self.http2_responses,
+            "errors_total": self.errors_total,
+        }
+
+
+def ollama_upstream(base_url: str, name: str = "ollama") -> Upstream:
+    return Upstream(
+        name,
+        base_url,
+        timeout=_env_float("OLLAMA_TIMEOUT", 60.0),
+        max_connections=_env_int("OLLAMA_MAX_CONNECTIONS", 32),
+        max_keepalive_connections=_env_int("OLLAMA_MAX_KEEPALIVE", 16),
+        keepalive_expiry=_env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+def convex_upstream(base_url: str) -> Upstream:
+    return Upstream(
+        "convex",
+        base_url,
+        timeout=_env_float("CONVEX_TIMEOUT", 10.0),
+        max_connections=_env_int("CONVEX_MAX_CONNECTIONS", 32),
+        max_keepalive_connections=_env_int("CONVEX_MAX_KEEPALIVE", 16),
+        keepalive_expiry=_env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+        http2=_env_bool("CONVEX_HTTP2", True),
+    )
@@ -0,0 +1,325 @@
+"""
+Local vector index over Convex scrapedata, served from inside the API process.
+
+Documents are split into overlapping chunks, embedded with a pluggable
+embedder (see embeddings.py) and stored per tool on disk:
+
+    <index_dir>/<tool>/vectors.f32    float32 rows, memory-mapped for search
+    <index_dir>/<tool>/chunks.jsonl   one metadata line per row
+    <index_dir>/<tool>/manifest.json  row count, dims, embedder, docs, tombstones
+
+The manifest is written last (atomically), so a reader never maps rows that
+are not fully on disk. Rows past the manifest's count are left by an append
+that died before its manifest write; the next append cuts both files back
+to the manifest first, so row numbers and offsets never drift. Queries are answered with a batched matrix product and
+argpartition top-k, with no network round trip.
+
+Sync new documents from Convex:
+
+    python vector_index.py sync [--full] [--index-dir DIR]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_CHUNK_CHARS = 1200
+DEFAULT_CHUNK_OVERLAP = 200
+
+
+def tool_slug(tool_name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", tool_name.lower()).strip("-") or "unknown"
+
+
+def chunk_text(text: str, max_chars: int = DEFAULT_CHUNK_CHARS, overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[str]:
+    """Splits on paragraph boundaries into chunks of at most ~max_chars with overlap."""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars - overlap:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = current[-overlap:] + "\n\n" + paragraph if overlap else paragraph
+        else:
+            current = current + "\n\n" + paragraph if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _write_json_atomic(path: str, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class VectorPartition:
+    """All chunks of one tool: a memory-mapped float32 matrix plus metadata."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.chunks_path = os.path.join(path, "chunks.jsonl")
+        self.manifest = {"count": 0, "dims": 0, "embedder": None, "docs": {}, "tombstones": []}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.chunks: List[dict] = []
+        self._stamp = None
+        self._mask: Optional[np.ndarray] = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path) as f:
+            self.manifest = json.load(f)
+        self._stamp = os.stat(self.manifest_path).st_mtime_ns
+        count, dims = self.manifest["count"], self.manifest["dims"]
+        with open(self.chunks_path) as f:
+            self.chunks = [json.loads(line) for _, line in zip(range(count), f)]
+        self.vectors = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, dims))
+            if count else np.zeros((0, dims), dtype=np.float32)
+        )
+        tombstones = self.manifest.get("tombstones", [])
+        self._mask = np.array(tombstones, dtype=np.int64) if tombstones else None
+
+    def reload_if_changed(self) -> bool:
+        try:
+            stamp = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return False
+        if stamp == self._stamp:
+            return False
+        self.load()
+        return True
+
+    @property
+    def size(self) -> int:
+        return self.manifest["count"] - len(self.manifest.get("tombstones", []))
+
+    def doc_version(self, doc_id: str):
+        doc = self.manifest["docs"].get(doc_id)
+        return doc["crawled_at"] if doc else None
+
+    def _truncate_to_manifest(self):
+        """Drops rows a torn append wrote past the manifest's count."""
+        count, dims = self.manifest["count"], self.manifest["dims"]
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > count * dims * 4:
+            os.truncate(self.vectors_path, count * dims * 4)
+        if not os.path.exists(self.chunks_path):
+            return
+        end = self.manifest.get("chunks_bytes")
+        if end is None:
+            # Manifests written before chunks_bytes existed: find the end of row `count`
+            end = 0
+            with open(self.chunks_path, "rb") as f:
+                for _, line in zip(range(count), f):
+                    end += len(line)
+        if os.path.getsize(self.chunks_path) > end:
+            os.truncate(self.chunks_path, end)
+
+    def append(self, doc: dict, chunks: List[str], vectors: np.ndarray, embedder: str):
+        """Adds (or replaces) one document's chunks. Old rows are tombstoned."""
+        os.makedirs(self.path, exist_ok=True)
+        self._truncate_to_manifest()
+        # Updated on a copy: if anything below fails, this partition still matches the disk
+        manifest = dict(self.manifest, docs=dict(self.manifest["docs"]),
+                        tombstones=list(self.manifest.get("tombstones", [])))
+        if manifest["count"] and (manifest["embedder"] != embedder or manifest["dims"] != vectors.shape[1]):
+            raise ValueError(f"{self.path} was built with {manifest['embedder']}, not {embedder}")
+        manifest["embedder"], manifest["dims"] = embedder, int(vectors.shape[1])
+
+        previous = manifest["docs"].get(doc["_id"])
+        if previous:
+            manifest["tombstones"].extend(range(previous["start"], previous["end"]))
+
+        start = manifest["count"]
+        with open(self.vectors_path, "ab") as f:
+            np.ascontiguousarray(vectors, dtype=np.float32).tofile(f)
+        with open(self.chunks_path, "a") as f:
+            for i, text in enumerate(chunks):
+                f.write(json.dumps({
+                    "_id": f"{doc['_id']}:{i}",
+                    "doc_id": doc["_id"],
+                    "tool_name": doc.get("tool_name"),
+                    "url": doc.get("url"),
+                    "title": doc.get("title"),
+                    "content": text,
+                }) + "\n")
+            manifest["chunks_bytes"] = f.tell()
+        manifest["count"] = start + len(chunks)
+        manifest["docs"][doc["_id"]] = {"crawled_at": doc.get("crawled_at"), "start": start, "end": manifest["count"]}
+        _write_json_atomic(self.manifest_path, manifest)
+        self.manifest = manifest
+
+    def search(self, queries: np.ndarray, k: int) -> List[List[tuple]]:
+        """Top-k (chunk, score) per query row; queries must be L2-normalized."""
+        count = self.vectors.shape[0]
+        if count == 0:
+            return [[] for _ in range(len(queries))]
+        scores = self.vectors @ queries.T  # (rows, queries)
+        if self._mask is not None:
+            scores[self._mask] = -np.inf
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for column in range(scores.shape[1]):
+            rows = top[:, column]
+            rows = rows[np.argsort(-scores[rows, column])]
+            results.append([
+                (self.chunks[row], float(scores[row, column]))
+                for row in rows if np.isfinite(scores[row, column])
+            ])
+        return results
+
+
+class VectorIndex:
+    """Per-tool vector partitions under one directory."""
+
+    def __init__(self, index_dir: str, embedder, reload_interval: float = 5.0):
+        self.index_dir = index_dir
+        self.embedder = embedder
+        self.reload_interval = reload_interval
+        self._partitions: Dict[str, VectorPartition] = {}
+        self._checked: Dict[str, float] = {}
+        self.queries = 0
+        self.search_seconds = 0.0
+
+    def partition(self, tool_name: str) -> VectorPartition:
+        slug = tool_slug(tool_name)
+        part = self._partitions.get(slug)
+        if part is None:
+            part = VectorPartition(os.path.join(self.index_dir, slug))
+            # Tool names come from clients; only tools with an index on disk are kept
+            if not os.path.exists(part.manifest_path):
+                return part
+            self._partitions[slug] = part
+            self._checked[slug] = time.monotonic()
+        elif time.monotonic() - self._checked[slug] > self.reload_interval:
+            # Pick up rows appended by a concurrent sync
+            part.reload_if_changed()
+            self._checked[slug] = time.monotonic()
+        return part
+
+    def has_tool(self, tool_name: str) -> bool:
+        part = self.partition(tool_name)
+        return part.size > 0 and part.manifest["embedder"] == self.embedder.name
+
+    async def search(self, tool_name: str, queries: List[str], k: int = 5) -> List[List[dict]]:
+        """Embeds the queries in one batch and returns top-k chunks for each."""
+        part = self.partition(tool_name)
+        if part.size == 0:
+            return [[] for _ in queries]
+        if part.manifest["embedder"] != self.embedder.name:
+            raise ValueError(f"Index for {tool_name} uses {part.manifest['embedder']}, server uses {self.embedder.name}")
+        vectors = np.asarray(await self.embedder.embed(queries), dtype=np.float32)
+        start = time.perf_counter()
+        hits = part.search(vectors, k)
+        self.search_seconds += time.perf_counter() - start
+        self.queries += len(queries)
+        return [[dict(chunk, score=round(score, 4)) for chunk, score in column] for column in hits]
+
+    def stats(self) -> dict:
+        return {
+            "index_dir": self.index_dir,
+            "embedder": self.embedder.name,
+            "tools_loaded": {slug: part.size for slug, part in self._partitions.items()},
+            "queries": self.queries,
+            "avg_search_ms": round(self.search_seconds * 1000 / self.queries, 3) if self.queries else 0.0,
+        }
+
+
+async def sync_from_convex(index: VectorIndex, convex, full: bool = False, page_size: int = 100,
+                           embed_batch: int = 32) -> dict:
+    """
+    Pulls scrapedata pages (newest first) and indexes new or re-crawled
+    documents. Incremental runs stop at the first page with nothing new;
+    use full=True to also pick up re-crawls of older documents.
+    """
+    cursor, added, skipped, pages = None, 0, 0, 0
+    while True:
+        response = await convex.client.post(
+            "/api/query",
+            json={"path": "scrapedata:pageForBackfill", "args": {"cursor": cursor, "limit": page_size}}
+        )
+        response.raise_for_status()
+        result = response.json()["value"]
+        pages += 1
+        changed = 0
+        for doc in result["page"]:
+            part = index.partition(doc["tool_name"])
+            if part.doc_version(doc["_id"]) == doc.get("crawled_at"):
+                skipped += 1
+                continue
+            chunks = chunk_text(doc.get("content", ""))
+            if not chunks:
+                continue
+            title = doc.get("title") or ""
+            vectors = []
+            for i in range(0, len(chunks), embed_batch):
+                batch = chunks[i:i + embed_batch]
+                vectors.extend(await index.embedder.embed([f"{title}\n{c}" for c in batch]))
+            part.append(doc, chunks, np.asarray(vectors, dtype=np.float32), index.embedder.name)
+            added += len(chunks)
+            changed += 1
+        print(f"Page {pages}: {changed} documents indexed ({added} chunks total, {skipped} unchanged)")
+        if result.get("isDone") or (changed == 0 and not full):
+            break
+        cursor = result.get("continueCursor")
+    return {"pages": pages, "chunks_added": added, "documents_unchanged": skipped}
+
+
+async def _main():
+    from embeddings import build_embedder
+    from upstreams import convex_upstream, ollama_upstream
+
+    parser = argparse.ArgumentParser(description="Local vector index for scrapedata")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="Pull new scrapedata documents from Convex and index them")
+    sync.add_argument("--full", action="store_true", help="Scan every page, not just until nothing is new")
+    sync.add_argument("--page-size", type=int, default=100)
+    query = sub.add_parser("query", help="Search one tool's partition")
+    query.add_argument("tool_name")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=5)
+    for p in (sync, query):
+        p.add_argument("--index-dir", default=os.getenv("VECTOR_INDEX_DIR", "vector_store"))
+    args = parser.parse_args()
+
+    ollama = ollama_upstream(os.getenv("OLLAMA_URL", "http://127.0.0.1:11434"))
+    convex = convex_upstream(os.getenv("CONVEX_URL", "https://abundant-porpoise-181.convex.cloud"))
+    await ollama.start()
+    await convex.start()
+    try:
+        index = VectorIndex(args.index_dir, build_embedder(ollama))
+        if args.command == "sync":
+            start = time.perf_counter()
+            summary = await sync_from_convex(index, convex, full=args.full, page_size=args.page_size)
+            summary["seconds"] = round(time.perf_counter() - start, 2)
+            print(json.dumps(summary))
+        else:
+            for hit in (await index.search(args.tool_name, [args.text], args.k))[0]:
+                print(f"{hit['score']:.3f}  {hit['url']}  {hit['content'][:80]!r}")
+    finally:
+        await ollama.close()
+        await convex.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    asyncio.run(_main())
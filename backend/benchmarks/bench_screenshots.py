@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Memory, bytes on the wire and time of sending large screenshots.
+
+Serves a local stand-in for Convex storage, /upload-screenshot and the n8n
+webhook (it decodes every body back to the image and checks its size, and
+advertises all transports in Accept-Post), writes a random image of
+--size-mb and sends it once per mode, each in a fresh subprocess so peaks
+do not mix:
+
+    inline-upload     read, base64, data URI, json (the old upload_screenshot.py)
+    stream-upload     upload_screenshot.py, streamed JSON data URI
+    upload-multipart  upload_screenshot.py, multipart/form-data
+    upload-binary     upload_screenshot.py, raw image/png body
+    inline-relay      download, base64, data URI, json (the old relay scripts)
+    stream-relay      ScreenshotRelay.relay, streamed JSON data URI
+    relay-multipart   ScreenshotRelay.relay, multipart/form-data
+    relay-binary      ScreenshotRelay.relay, raw image/png body
+    relay-auto        ScreenshotRelay.relay, transport negotiated over OPTIONS
+
+Peak RSS is the child's high-water mark (VmHWM, or ru_maxrss off Linux)
+above its peak after imports. Seconds include
+the stand-in decoding the body. Wire MB counts request line, headers and body.
+
+Usage:
+    python benchmarks/bench_screenshots.py --size-mb 50
+    python benchmarks/bench_screenshots.py --size-mb 2 --modes stream-relay relay-binary --output bench.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+sys.path.insert(0, BACKEND)
+
+MODES = ["inline-upload", "stream-upload", "upload-multipart", "upload-binary",
+         "inline-relay", "stream-relay", "relay-multipart", "relay-binary", "relay-auto"]
+TRANSPORT = {"stream": "json", "multipart": "multipart", "binary": "binary", "auto": "auto"}
+
+
+def peak_rss_mb() -> float:
+    # VmHWM on Linux: ru_maxrss survives execve and would report the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024 / 1e6
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def decode_image(content_type: str, headers, body: bytes) -> bytes:
+    """What a receiver does with each transport to get the image back."""
+    if content_type.startswith("image/"):
+        json.loads(headers.get("X-Screenshot-Fields", "{}"))
+        return body
+    if content_type.startswith("multipart/form-data"):
+        boundary = content_type.split("boundary=", 1)[1].encode()
+        for part in body.split(b"--" + boundary)[1:-1]:
+            head, _, content = part[2:].partition(b"\r\n\r\n")
+            if b'name="screenshot"' in head:
+                return content[:-2]
+        return b""
+    screenshot = json.loads(body)["screenshot"]
+    return base64.b64decode(screenshot.split(",", 1)[1])
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Convex (files:getUrl, storage, /upload-screenshot) and the webhook in one."""
+
+    image_path = None
+    last = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, value, status=200):
+        body = json.dumps(value).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Accept-Post", "image/png, image/jpeg, image/webp, multipart/form-data, application/json")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        size = os.path.getsize(self.image_path)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        with open(self.image_path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                self.wfile.write(chunk)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/api/query":
+            port = self.server.server_address[1]
+            return self._json({"status": "success", "value": f"http://127.0.0.1:{port}/api/storage/image"})
+        image = decode_image(self.headers.get("Content-Type", ""), self.headers, body)
+        header_bytes = len(self.requestline) + 2 + sum(len(k) + len(v) + 4 for k, v in self.headers.items()) + 2
+        StandIn.last = {"wire": header_bytes + len(body), "ok": len(image) == os.path.getsize(self.image_path),
+                        "content_type": self.headers.get("Content-Type", "").split(";")[0]}
+        self._json({"success": True, "storageId": "bench", "webhookStatus": 200})
+
+
+def run_child(mode: str, base: str, image_path: str) -> dict:
+    """Runs inside the subprocess: one transfer, then reports peak RSS."""
+    import httpx
+    from screenshot_relay import Screenshot, ScreenshotRelay
+
+    kind, _, variant = mode.partition("-")
+    if "upload" in (kind, variant) and mode != "inline-upload":
+        import upload_screenshot  # needs requests
+        upload_screenshot.CONVEX_URL = base
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "inline-upload":
+        with open(image_path, "rb") as f:
+            image_data = base64.b64encode(f.read()).decode("utf-8")
+        data_uri = f"data:image/png;base64,{image_data}"
+        httpx.post(f"{base}/upload-screenshot", json={"screenshot": data_uri, "metadata": {}}, timeout=120)
+    elif mode == "inline-relay":
+        response = httpx.get(f"{base}/api/storage/image", timeout=120)
+        image_b64 = base64.b64encode(response.content).decode("utf-8")
+        data_uri = f"data:image/png;base64,{image_b64}"
+        httpx.post(f"{base}/webhook", json={"action": "analyze_ui", "screenshot": data_uri,
+                                            "context": {"storage_id": "image"}}, timeout=120)
+    elif "upload" in (kind, variant):
+        upload_screenshot.upload_screenshot(image_path, transport=TRANSPORT[kind if variant == "upload" else variant])
+    else:
+        async def relay():
+            transport = TRANSPORT[kind if variant == "relay" else variant]
+            r = ScreenshotRelay(base, f"{base}/webhook", concurrency=1, retries=0, timeout=120, transport=transport)
+            try:
+                if not await r.relay(Screenshot(storage_id="image")):
+                    raise SystemExit("relay failed")
+            finally:
+                await r.aclose()
+        asyncio.run(relay())
+    seconds = time.perf_counter() - start
+    return {"mode": mode, "seconds": round(seconds, 3), "baseline_mb": round(baseline, 1),
+            "peak_mb": round(peak_rss_mb() - baseline, 1)}
+
+
+def write_image(path: str, size_mb: float):
+    remaining = int(size_mb * 1e6)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        remaining -= 8
+        while remaining > 0:
+            n = min(remaining, 1 << 20)
+            f.write(os.urandom(n))
+            remaining -= n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS, wire bytes and time of screenshot uploads and relays")
+    parser.add_argument("--size-mb", type=float, default=50)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--base", help=argparse.SUPPRESS)
+    parser.add_argument("--image", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.base, args.image)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, "capture.png")
+        write_image(image_path, args.size_mb)
+        StandIn.image_path = image_path
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        results = []
+        print(f"{args.size_mb:g} MB image\n")
+        print(f"{'mode':<17} {'peak RSS MB':>12} {'seconds':>9} {'wire MB':>9}  body")
+        for mode in args.modes:
+            StandIn.last = {}
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode,
+                                  "--base", base, "--image", image_path],
+                                 capture_output=True, text=True, cwd=BACKEND)
+            if out.returncode != 0:
+                print(f"{mode:<17} failed: {out.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            result["wire_mb"] = round(StandIn.last.get("wire", 0) / 1e6, 2)
+            result["content_type"] = StandIn.last.get("content_type")
+            result["decoded"] = StandIn.last.get("ok", False)
+            results.append(result)
+            print(f"{mode:<17} {result['peak_mb']:>12} {result['seconds']:>9} {result['wire_mb']:>9}  "
+                  f"{result['content_type']}{'' if result['decoded'] else ' (image mismatch)'}")
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"size_mb": args.size_mb, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@
  * @module
  */
 
+import type * as doc_chunks from "../doc_chunks.js";
 import type * as enrich from "../enrich.js";
 import type * as executions from "../executions.js";
 import type * as files from "../files.js";
@@ -26,6 +27,7 @@ import type {
 } from "convex/server";
 
 declare const fullApi: ApiFromModules<{
+  doc_chunks: typeof doc_chunks;
   enrich: typeof enrich;
   executions: typeof executions;
   files: typeof files;
@@ -0,0 +1,79 @@
+import { mutation, query } from "./_generated/server";
+import { v } from "convex/values";
+
+const chunkFields = v.object({
+    chunk_id: v.string(),
+    heading: v.string(),
+    position: v.number(),
+    content: v.string(),
+    content_hash: v.string(),
+});
+
+// Replace the chunks of each page (upsert by chunk_id, delete chunks the page no longer has)
+export const upsertPages = mutation({
+    args: {
+        docs: v.array(v.object({
+            tool_name: v.string(),
+            url: v.string(),
+            title: v.optional(v.string()),
+            crawled_at: v.number(),
+            chunks: v.array(chunkFields),
+        })),
+    },
+    handler: async (ctx, args) => {
+        let inserted = 0, updated = 0, deleted = 0;
+        for (const page of args.docs) {
+            const existing = await ctx.db
+                .query("doc_chunks")
+                .withIndex("by_url", (q) => q.eq("url", page.url))
+                .collect();
+            const byId = new Map(existing.map((c) => [c.chunk_id, c]));
+            for (const chunk of page.chunks) {
+                const old = byId.get(chunk.chunk_id);
+                byId.delete(chunk.chunk_id);
+                if (!old) {
+                    await ctx.db.insert("doc_chunks", {
+                        ...chunk,
+                        tool_name: page.tool_name,
+                        url: page.url,
+                        title: page.title,
+                        crawled_at: page.crawled_at,
+                    });
+                    inserted++;
+                } else if (old.content_hash !== chunk.content_hash || old.position !== chunk.position) {
+                    await ctx.db.patch(old._id, { ...chunk, title: page.title, crawled_at: page.crawled_at });
+                    updated++;
+                }
+            }
+            for (const stale of byId.values()) {
+                await ctx.db.delete(stale._id);
+                deleted++;
+            }
+        }
+        return { inserted, updated, deleted };
+    },
+});
+
+// Full-text search over chunks; same argument shape as scrapedata:searchKnowledge
+export const search = query({
+    args: {
+        query: v.string(),
+        tool_name: v.optional(v.string()),
+        limit: v.optional(v.number()),
+    },
+    handler: async (ctx, args) => {
+        const limit = args.limit ?? 5;
+        if (args.tool_name) {
+            return await ctx.db
+                .query("doc_chunks")
+                .withSearchIndex("search_content", (q) =>
+                    q.search("content", args.query).eq("tool_name", args.tool_name!)
+                )
+                .take(limit);
+        }
+        return await ctx.db
+            .query("doc_chunks")
+            .withSearchIndex("search_content", (q) => q.search("content", args.query))
+            .take(limit);
+    },
+});
@@ -5,20 +5,76 @@ import { api } from "./_generated/api";
 
 const http = httpRouter();
 
+// Bodies /upload-screenshot takes; clients read this from OPTIONS to pick a transport
+const ACCEPT_POST = "image/png, image/jpeg, image/webp, multipart/form-data, application/json";
+
+type Upload = { image: Blob | null; metadata?: any; tool_name?: string };
+
+// A client error in the request body or headers; answered with 400, not 500
+class BadUpload extends Error {}
+
+function parseJson(text: string, what: string): any {
+  try {
+    return JSON.parse(text);
+  } catch {
+    throw new BadUpload(`${what} is not valid JSON`);
+  }
+}
+
+// Raw image (fields as JSON in X-Screenshot-Fields), multipart/form-data, or JSON with a base64 data URI
+async function readUpload(request: Request): Promise<Upload | null> {
+  const contentType = (request.headers.get("content-type") || "").toLowerCase();
+  if (contentType.startsWith("image/")) {
+    const fields = parseJson(request.headers.get("x-screenshot-fields") || "{}", "X-Screenshot-Fields") ?? {};
+    return { image: await request.blob(), metadata: fields.metadata, tool_name: fields.tool_name };
+  }
+  if (contentType.startsWith("multipart/form-data")) {
+    const form = await request.formData();
+    const file = form.get("screenshot");
+    const metadata = form.get("metadata");
+    const tool_name = form.get("tool_name");
+    return {
+      image: file instanceof Blob ? file : null,
+      metadata: typeof metadata === "string" ? parseJson(metadata, "metadata") : undefined,
+      tool_name: typeof tool_name === "string" ? tool_name : undefined,
+    };
+  }
+  if (contentType && !contentType.includes("json")) return null;
+
+  const { screenshot, metadata, tool_name } = parseJson(await request.text(), "Request body") ?? {};
+  if (!screenshot) return { image: null, metadata, tool_name };
+
+  const base64Data = screenshot.replace(/^data:image\/\w+;base64,/, '');
+  const binary = atob(base64Data);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+  return { image: new Blob([bytes]), metadata, tool_name };
+}
+
+http.route({
+  path: "/upload-screenshot",
+  method: "OPTIONS",
+  handler: httpAction(async () => {
+    return new Response(null, { status: 204, headers: { "Accept-Post": ACCEPT_POST, Allow: "OPTIONS, POST" } });
+  }),
+});
+
 http.route({
   path: "/upload-screenshot",
   method: "POST",
   handler: httpAction(async (ctx, request) => {
     try {
-      const { screenshot, metadata, tool_name } = await request.json();
-      if (!screenshot) return new Response("No screenshot", { status: 400 });
-
-      const base64Data = screenshot.replace(/^data:image\/\w+;base64,/, '');
-      const binary = atob(base64Data);
-      const bytes = new Uint8Array(binary.length);
-      for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+      const upload = await readUpload(request);
+      if (!upload) {
+        return new Response(JSON.stringify({ error: "Unsupported Content-Type" }), {
+          status: 415,
+          headers: { "Accept-Post": ACCEPT_POST },
+        });
+      }
+      const { image, metadata, tool_name } = upload;
+      if (!image) return new Response("No screenshot", { status: 400 });
 
-      const storageId = await ctx.storage.store(new Blob([bytes]));
+      const storageId = await ctx.storage.store(image);
 
       await ctx.runMutation(api.screenshots.save, {
         storageId,
@@ -30,6 +86,9 @@ http.route({
 
       return new Response(JSON.stringify({ success: true, storageId }), { status: 200 });
     } catch (error: any) {
+      if (error instanceof BadUpload) {
+        return new Response(JSON.stringify({ error: error.message }), { status: 400 });
+      }
       return new Response(JSON.stringify({ error: error.message }), { status: 500 });
     }
   }),
@@ -218,6 +218,26 @@ export default defineSchema({
       filterFields: ["tool_name", "category"]
     }),
 
+  // Heading-aware chunks of scrapedata pages, written by the crawler (crawl_tools.py)
+  doc_chunks: defineTable({
+    chunk_id: v.string(),      // Stable across recrawls: hash of url + heading path + window
+    tool_name: v.string(),
+    url: v.string(),
+    title: v.optional(v.string()),
+    heading: v.string(),       // "Projects > Settings > Labels"
+    position: v.number(),      // Order within the page
+    content: v.string(),
+    content_hash: v.string(),
+    crawled_at: v.number(),
+  })
+    .index("by_chunk_id", ["chunk_id"])
+    .index("by_url", ["url"])
+    .index("by_tool", ["tool_name"])
+    .searchIndex("search_content", {
+      searchField: "content",
+      filterFields: ["tool_name"]
+    }),
+
   chunks: defineTable({
     scrapedataId: v.id("scrapedata"),
     tool_name: v.string(),
@@ -1,57 +1,80 @@
-import { mutation, query } from "./_generated/server";
-import { v } from "convex/values";
+import { mutation, query, MutationCtx } from "./_generated/server";
+import { v, Infer } from "convex/values";
 import { api } from "./_generated/api";
 
-// Insert or update crawled data (upsert by tool+url)
-export const insert = mutation({
-    args: {
-        tool_name: v.string(),
+const scrapedataFields = {
+    tool_name: v.string(),
+    url: v.string(),
+    title: v.optional(v.string()),
+    content: v.string(),
+    summary: v.optional(v.union(v.string(), v.null())),
+    category: v.optional(v.string()),
+    images: v.optional(v.array(v.object({
         url: v.string(),
-        title: v.optional(v.string()),
-        content: v.string(),
-        summary: v.optional(v.union(v.string(), v.null())),
-        category: v.optional(v.string()),
-        images: v.optional(v.array(v.object({
-            url: v.string(),
-            alt: v.optional(v.string()),
-            description: v.optional(v.string())
-        }))),
-        crawled_at: v.number(),
-        metadata: v.optional(v.any()),
-    },
-    handler: async (ctx, args) => {
-        const existing = await ctx.db
-            .query("scrapedata")
-            .withIndex("by_tool", (q) => q.eq("tool_name", args.tool_name))
-            .filter((q) => q.eq(q.field("url"), args.url))
-            .first();
+        alt: v.optional(v.string()),
+        description: v.optional(v.string())
+    }))),
+    crawled_at: v.number(),
+    metadata: v.optional(v.any()),
+};
 
-        let docId;
-        if (existing) {
-            await ctx.db.patch(existing._id, {
-                content: args.content,
-                title: args.title,
-                summary: args.summary,
-                category: args.category,
-                images: args.images,
-                crawled_at: args.crawled_at,
-                metadata: args.metadata,
-            });
-            docId = existing._id;
-        } else {
-            docId = await ctx.db.insert("scrapedata", args);
-        }
+const scrapedataDoc = v.object(scrapedataFields);
+
+async function upsertScrapedata(ctx: MutationCtx, args: Infer<typeof scrapedataDoc>) {
+    const existing = await ctx.db
+        .query("scrapedata")
+        .withIndex("by_tool", (q) => q.eq("tool_name", args.tool_name))
+        .filter((q) => q.eq(q.field("url"), args.url))
+        .first();
 
-        // Keep workflow extraction near real-time as new scraped docs arrive.
-        await ctx.scheduler.runAfter(0, api.workflows.enqueueScrapedataForExtraction, {
-            scrapedataId: docId,
+    let docId;
+    if (existing) {
+        await ctx.db.patch(existing._id, {
+            content: args.content,
+            title: args.title,
+            summary: args.summary,
+            category: args.category,
+            images: args.images,
+            crawled_at: args.crawled_at,
+            metadata: args.metadata,
         });
-        await ctx.scheduler.runAfter(0, api.workflows.processNextJob, {});
+        docId = existing._id;
+    } else {
+        docId = await ctx.db.insert("scrapedata", args);
+    }
 
+    // Keep workflow extraction near real-time as new scraped docs arrive.
+    await ctx.scheduler.runAfter(0, api.workflows.enqueueScrapedataForExtraction, {
+        scrapedataId: docId,
+    });
+    return docId;
+}
+
+// Insert or update crawled data (upsert by tool+url)
+export const insert = mutation({
+    args: scrapedataFields,
+    handler: async (ctx, args) => {
+        const docId = await upsertScrapedata(ctx, args);
+        await ctx.scheduler.runAfter(0, api.workflows.processNextJob, {});
         return docId;
     },
 });
 
+// Bulk upsert for the crawler's writer; one transaction and one job kick per batch
+export const insertMany = mutation({
+    args: { docs: v.array(scrapedataDoc) },
+    handler: async (ctx, args) => {
+        const ids = [];
+        for (const doc of args.docs) {
+            ids.push(await upsertScrapedata(ctx, doc));
+        }
+        if (ids.length > 0) {
+            await ctx.scheduler.runAfter(0, api.workflows.processNextJob, {});
+        }
+        return ids;
+    },
+});
+
 // Get all pages for a specific tool
 export const getByTool = query({
     args: { tool_name: v.string() },
@@ -24,3 +24,14 @@ export const getByTool = query({
       .collect();
   },
 });
+
+// Rows created after `after` (ms), oldest first; screenshot_relay.py --watch polls this
+export const listSince = query({
+  args: { after: v.number(), limit: v.optional(v.number()) },
+  handler: async (ctx, args) => {
+    return await ctx.db
+      .query("screenshots")
+      .withIndex("by_creation_time", (q) => q.gt("_creationTime", args.after))
+      .take(args.limit ?? 100);
+  },
+});
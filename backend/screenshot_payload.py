@@ -0,0 +1,209 @@
+"""
+Streaming request bodies for screenshot uploads, in three transports.
+
+    json       {"screenshot": "data:image/png;base64,...", ...}; what every
+               receiver has always accepted, 33% larger than the image
+    multipart  multipart/form-data with the image as a file part
+    binary     the raw image as the body (Content-Type image/png), other
+               fields as JSON in the X-Screenshot-Fields header
+
+Building the JSON body the usual way holds four copies of the image: the
+raw bytes, the base64 string (1.33x), the data URI and the serialized JSON.
+For high-DPI full-page captures that is tens of MB per request. The bodies
+here are generated piece by piece instead, reading the image in 192 KiB
+chunks from a file (or slicing a bytes/mmap buffer) and, for json,
+base64-encoding each chunk on the way out, so memory per transfer stays
+flat whatever the image size. Lengths are known up front, so requests are
+sent with Content-Length, not chunked.
+
+    body = make_body("binary", "capture.png", {"metadata": {}})
+    requests.post(url, data=body, headers=body.headers)                 # sync
+    await client.post(url, content=body.aiter(), headers=body.headers)  # httpx async
+
+Receivers advertise what they take in an Accept-Post header on OPTIONS
+(Convex /upload-screenshot does); pick_transport() turns that into a
+transport, and anything that does not answer falls back to json.
+"""
+
+import base64
+import json
+import mimetypes
+import mmap
+import os
+import uuid
+from typing import AsyncIterator, Iterator, Optional
+
+# A multiple of 3, so every chunk but the last encodes without padding
+CHUNK_SIZE = 3 * 64 * 1024
+
+TRANSPORTS = ("auto", "binary", "multipart", "json")
+FIELDS_HEADER = "X-Screenshot-Fields"
+
+
+def guess_image_type(name: Optional[str], default: str = "image/png") -> str:
+    content_type = mimetypes.guess_type(name)[0] if name else None
+    return content_type if content_type and content_type.startswith("image/") else default
+
+
+def pick_transport(accept_post: Optional[str], content_type: str = "image/png") -> str:
+    """Best transport a receiver's Accept-Post header allows; json when it lists nothing better."""
+    offered = {t.split(";")[0].strip().lower() for t in (accept_post or "").split(",")}
+    if content_type in offered or "image/*" in offered:
+        return "binary"
+    if "multipart/form-data" in offered:
+        return "multipart"
+    return "json"
+
+
+def _disposition_param(value: str) -> str:
+    """Quoted-string value for Content-Disposition, escaped the way browsers do (WHATWG)."""
+    return '"' + value.replace("\r", "%0D").replace("\n", "%0A").replace('"', "%22") + '"'
+
+
+class ImageBody:
+    """
+    Base for streamed bodies: prefix, the image's chunks through _encode(),
+    suffix. source is a path, a binary file object (read from its current
+    position on every iteration, so a retry can send the body again) or a
+    bytes-like buffer such as an mmap.
+    """
+
+    content_type = "application/octet-stream"
+    prefix = b""
+    suffix = b""
+
+    def __init__(self, source, fields: Optional[dict] = None, field: str = "screenshot",
+                 content_type: Optional[str] = None, chunk_size: int = CHUNK_SIZE):
+        self.source = source
+        self.field = field
+        self.fields = {k: v for k, v in (fields or {}).items() if k != field}
+        self.chunk_size = chunk_size - chunk_size % 3 or 3
+        self._view: Optional[memoryview] = None
+        if isinstance(source, (str, os.PathLike)):
+            self.size = os.path.getsize(source)
+            content_type = content_type or guess_image_type(os.fspath(source))
+        elif isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            self._view = memoryview(source).cast("B")
+            self.size = self._view.nbytes
+        else:
+            self._start = source.tell()
+            self.size = source.seek(0, os.SEEK_END) - self._start
+            source.seek(self._start)
+        self.image_type = content_type or "image/png"
+
+    def _encoded_size(self) -> int:
+        """Bytes _encode() turns the image into."""
+        return self.size
+
+    def _encode(self, chunk: memoryview) -> bytes:
+        return bytes(chunk)
+
+    def __len__(self) -> int:
+        return len(self.prefix) + self._encoded_size() + len(self.suffix)
+
+    @property
+    def headers(self) -> dict:
+        return {"Content-Type": self.content_type, "Content-Length": str(len(self))}
+
+    def _chunks(self) -> Iterator[bytes]:
+        if isinstance(self.source, (str, os.PathLike)):
+            with open(self.source, "rb") as f:
+                yield from self._read(f)
+        elif self._view is not None:
+            for start in range(0, len(self._view), self.chunk_size):
+                yield self._view[start:start + self.chunk_size]
+        else:
+            self.source.seek(self._start)
+            yield from self._read(self.source)
+
+    def _read(self, f) -> Iterator[memoryview]:
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                return
+            # readinto may come up short; top up so only the final chunk has padding
+            while n < self.chunk_size:
+                more = f.readinto(view[n:])
+                if not more:
+                    break
+                n += more
+            yield view[:n]
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self.prefix:
+            yield self.prefix
+        for chunk in self._chunks():
+            yield self._encode(chunk)
+        if self.suffix:
+            yield self.suffix
+
+    async def aiter(self) -> AsyncIterator[bytes]:
+        """Same bytes as iter(); httpx.AsyncClient only accepts async iterables."""
+        for piece in self:
+            yield piece
+
+
+class DataUriBody(ImageBody):
+    """JSON object of `fields` plus `field` set to the image's data URI."""
+
+    content_type = "application/json"
+
+    def __init__(self, source, fields: Optional[dict] = None, field: str = "screenshot",
+                 content_type: Optional[str] = None, chunk_size: int = CHUNK_SIZE):
+        super().__init__(source, fields, field, content_type, chunk_size)
+        # Serialize with an empty value in last position, then open the string back up
+        document = json.dumps({**self.fields, field: ""})
+        self.prefix = (document[:-2] + f"data:{self.image_type};base64,").encode()
+        self.suffix = b'"}'
+
+    def _encoded_size(self) -> int:
+        return 4 * ((self.size + 2) // 3)
+
+    def _encode(self, chunk: memoryview) -> bytes:
+        return base64.b64encode(chunk)
+
+
+class MultipartBody(ImageBody):
+    """multipart/form-data: one part per field (JSON unless a string), then the image."""
+
+    def __init__(self, source, fields: Optional[dict] = None, field: str = "screenshot",
+                 content_type: Optional[str] = None, chunk_size: int = CHUNK_SIZE,
+                 filename: Optional[str] = None):
+        super().__init__(source, fields, field, content_type, chunk_size)
+        self.boundary = uuid.uuid4().hex
+        if filename is None and isinstance(source, (str, os.PathLike)):
+            filename = os.path.basename(os.fspath(source))
+        filename = filename or field + (mimetypes.guess_extension(self.image_type) or ".png")
+        parts = []
+        for name, value in self.fields.items():
+            if isinstance(value, str):
+                parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name={_disposition_param(name)}'
+                             f'\r\n\r\n{value}\r\n')
+            else:
+                parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name={_disposition_param(name)}\r\n'
+                             f'Content-Type: application/json\r\n\r\n{json.dumps(value)}\r\n')
+        parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name={_disposition_param(field)}; '
+                     f'filename={_disposition_param(filename)}\r\nContent-Type: {self.image_type}\r\n\r\n')
+        self.prefix = "".join(parts).encode()
+        self.suffix = f"\r\n--{self.boundary}--\r\n".encode()
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+
+
+class RawImageBody(ImageBody):
+    """The image itself as the body; the other fields go in the X-Screenshot-Fields header."""
+
+    @property
+    def headers(self) -> dict:
+        return {"Content-Type": self.image_type, "Content-Length": str(self.size),
+                FIELDS_HEADER: json.dumps(self.fields, separators=(",", ":"))}
+
+
+def make_body(transport: str, source, fields: Optional[dict] = None, field: str = "screenshot",
+              content_type: Optional[str] = None) -> ImageBody:
+    if transport == "binary":
+        return RawImageBody(source, fields, field, content_type)
+    if transport == "multipart":
+        return MultipartBody(source, fields, field, content_type)
+    return DataUriBody(source, fields, field, content_type)
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Relays screenshots from Convex storage to the n8n webhook.
+
+Replaces send_to_n8n.py, fetch_convex_images.py, send_from_url.py and
+watch_convex.py, which handled one storage ID at a time with blocking
+requests. Here a bounded pool of async workers downloads and posts
+concurrently over pooled connections (one httpx client for Convex, one for
+the webhook). Each step (URL lookup, download, webhook post) is retried on
+its own with jittered backoff on timeouts, 429 and 5xx, honoring
+Retry-After. Images are downloaded to a temporary file and base64-encoded
+into the webhook body as it is sent (screenshot_payload.py), so memory per
+transfer does not grow with the image size. --transport binary or
+multipart skips base64 altogether; the default, auto, uses whatever the
+webhook's Accept-Post offers and the JSON data URI event otherwise.
+
+Inputs are Convex storage IDs (resolved with files:getUrl) or direct file
+URLs, from arguments, a file or stdin:
+
+    python screenshot_relay.py kg2cjm106mn11514gxa8b7n7zx7ztc4d
+    python screenshot_relay.py --file ids.txt --concurrency 32 --failed failed.txt
+    cat ids.txt | python screenshot_relay.py
+    python screenshot_relay.py --watch             # new rows in the screenshots table
+
+Needs httpx.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Iterable, List, Optional
+
+import httpx
+
+from screenshot_payload import CHUNK_SIZE, TRANSPORTS, ImageBody, make_body, pick_transport
+
+CONVEX_URL = os.getenv("CONVEX_URL", "https://abundant-porpoise-181.convex.cloud")
+WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "http://localhost:5678/webhook/navigator-screenshot-event")
+RELAY_CONCURRENCY = int(os.getenv("RELAY_CONCURRENCY", "16"))
+RELAY_RETRIES = int(os.getenv("RELAY_RETRIES", "4"))
+RELAY_TIMEOUT = float(os.getenv("RELAY_TIMEOUT", "60"))
+RELAY_WATCH_INTERVAL = float(os.getenv("RELAY_WATCH_INTERVAL", "10"))
+# auto asks the webhook (OPTIONS, Accept-Post) and uses json unless it offers multipart or raw images
+RELAY_TRANSPORT = os.getenv("RELAY_TRANSPORT", "auto")
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RelayFailed(Exception):
+    """Permanent failure (bad ID, 4xx); not retried."""
+
+
+class RetryableRelay(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """Retry-After in seconds (delta or HTTP date), if the server sent one."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def check(response: httpx.Response, what: str):
+    if response.status_code in RETRYABLE_STATUS:
+        raise RetryableRelay(f"{what}: HTTP {response.status_code}", retry_after(response))
+    if response.status_code >= 400:
+        raise RelayFailed(f"{what}: HTTP {response.status_code} {response.text[:200]}")
+
+
+@dataclass
+class Screenshot:
+    """A storage ID to resolve through Convex, or a direct file URL."""
+    storage_id: Optional[str] = None
+    url: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return self.storage_id or self.url
+
+    @classmethod
+    def parse(cls, line: str) -> Optional["Screenshot"]:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return None
+        if line.startswith(("http://", "https://")):
+            return cls(url=line)
+        return cls(storage_id=line)
+
+
+class ScreenshotRelay:
+    def __init__(self, convex_url: str = CONVEX_URL, webhook_url: str = WEBHOOK_URL,
+                 concurrency: int = RELAY_CONCURRENCY, retries: int = RELAY_RETRIES,
+                 timeout: float = RELAY_TIMEOUT, backoff: float = 1.0, max_backoff: float = 30.0,
+                 source: str = "relay", progress_interval: float = 10.0, transport: str = RELAY_TRANSPORT):
+        self.webhook_url = webhook_url
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.source = source
+        self.transport = transport
+        self._accept_post: Optional[str] = None  # webhook's Accept-Post, probed once for auto
+        self._probe = asyncio.Lock()
+        self.wire_bytes = 0
+        self.progress_interval = progress_interval
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        # Storage URLs from files:getUrl live on the deployment host, so one pool serves both
+        self.convex = httpx.AsyncClient(base_url=convex_url, timeout=timeout, limits=limits,
+                                        follow_redirects=True)
+        self.webhook = httpx.AsyncClient(timeout=timeout, limits=limits)
+        self.started = time.monotonic()
+        self.sent = 0
+        self.failed: List[str] = []
+        self.retried = 0
+        self.bytes = 0
+
+    async def aclose(self):
+        await self.convex.aclose()
+        await self.webhook.aclose()
+
+    async def _with_retries(self, what: str, call):
+        for attempt in range(self.retries + 1):
+            try:
+                return await call()
+            except (RetryableRelay, httpx.TransportError) as e:
+                if attempt >= self.retries:
+                    raise RelayFailed(f"{what}: {e}") from e
+                self.retried += 1
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if isinstance(e, RetryableRelay) and e.retry_after is not None:
+                    delay = max(delay, min(e.retry_after, self.max_backoff))
+                await asyncio.sleep(delay)
+
+    async def _query(self, path: str, args: dict):
+        response = await self.convex.post("/api/query", json={"path": path, "args": args})
+        check(response, path)
+        data = response.json()
+        if data.get("status") != "success":
+            raise RelayFailed(f"{path}: {data.get('errorMessage', data)}")
+        return data.get("value")
+
+    async def resolve(self, shot: Screenshot) -> str:
+        if shot.url:
+            return shot.url
+        url = await self._with_retries("files:getUrl", lambda: self._query("files:getUrl", {"storageId": shot.storage_id}))
+        if not url:
+            raise RelayFailed(f"no file for storage ID {shot.storage_id}")
+        return url
+
+    async def download(self, url: str, f) -> str:
+        """Streams the file into f (a temporary file); returns its content type."""
+        async def get():
+            f.seek(0)
+            f.truncate()
+            async with self.convex.stream("GET", url) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                check(response, "download")
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    f.write(chunk)
+            f.flush()
+            f.seek(0)
+            return response.headers.get("content-type", "image/png").split(";")[0]
+        return await self._with_retries("download", get)
+
+    async def webhook_transport(self, content_type: str) -> str:
+        if self.transport != "auto":
+            return self.transport
+        async with self._probe:
+            if self._accept_post is None:
+                try:
+                    response = await self.webhook.options(self.webhook_url)
+                    self._accept_post = response.headers.get("accept-post", "") if response.status_code < 400 else ""
+                except httpx.HTTPError:
+                    self._accept_post = ""
+                print(f"Webhook transport: {pick_transport(self._accept_post, content_type)}")
+        return pick_transport(self._accept_post, content_type)
+
+    def payload(self, shot: Screenshot, image, content_type: str, transport: str = "json") -> ImageBody:
+        """The webhook event, with the image streamed in (a data URI for json)."""
+        context = {"source": self.source, "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")}
+        if shot.storage_id:
+            context["storage_id"] = shot.storage_id
+        else:
+            context["url"] = shot.url
+        if not content_type.startswith("image/"):
+            content_type = "image/png"
+        return make_body(transport, image, {"action": "analyze_ui", "context": context}, content_type=content_type)
+
+    async def post(self, shot: Screenshot, image, content_type: str) -> tuple:
+        """Posts the event; a webhook that answers 415 to multipart or binary gets json from then on."""
+        while True:
+            transport = await self.webhook_transport(content_type)
+            image.seek(0)  # a previous attempt may have read it to the end
+            body = self.payload(shot, image, content_type, transport)
+
+            async def send():
+                response = await self.webhook.post(self.webhook_url, content=body.aiter(), headers=body.headers)
+                if response.status_code != 415 or transport == "json":
+                    check(response, "webhook")
+                return response.status_code
+
+            status = await self._with_retries("webhook", send)
+            if status != 415 or transport == "json":
+                self.wire_bytes += len(body)
+                return status, body
+            print(f"  Webhook rejected {transport} (415), falling back to json")
+            self.transport = "json"
+
+    async def relay(self, shot: Screenshot) -> bool:
+        # Spooled to disk so a transfer holds one chunk in memory, not the image
+        with tempfile.TemporaryFile() as image:
+            try:
+                url = await self.resolve(shot)
+                content_type = await self.download(url, image)
+                status, body = await self.post(shot, image, content_type)
+            except RelayFailed as e:
+                self.failed.append(shot.key)
+                print(f"  Failed {shot.key}: {e}")
+                return False
+            except Exception as e:
+                # Anything else (a bad response body, a disk error) still only fails this
+                # screenshot; letting it escape would kill the worker and stall run()
+                self.failed.append(shot.key)
+                print(f"  Failed {shot.key}: {type(e).__name__}: {e}")
+                return False
+        self.sent += 1
+        self.bytes += body.size
+        print(f"  Sent {shot.key} ({body.size / 1024:.1f} KB, webhook {status})")
+        return True
+
+    def progress(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.sent / elapsed if elapsed else 0.0
+        return (f"[{elapsed:.0f}s] sent {self.sent}, failed {len(self.failed)}, retried {self.retried}, "
+                f"{rate:.1f}/s, {self.bytes / 1e6:.1f} MB ({self.wire_bytes / 1e6:.1f} MB sent)")
+
+    async def run(self, shots: AsyncIterator[Screenshot]):
+        """Relays everything shots yields with at most `concurrency` transfers in flight."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker():
+            while True:
+                shot = await queue.get()
+                try:
+                    if shot is None:
+                        return
+                    await self.relay(shot)
+                finally:
+                    queue.task_done()
+
+        async def report():
+            while True:
+                await asyncio.sleep(self.progress_interval)
+                print(self.progress())
+
+        self.started = time.monotonic()
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        reporter = asyncio.create_task(report())
+        seen = set()
+        try:
+            async for shot in shots:
+                if shot.key in seen:
+                    continue
+                seen.add(shot.key)
+                await queue.put(shot)  # waits while every worker is busy
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            reporter.cancel()
+            for task in workers:
+                task.cancel()
+
+    async def watch(self, interval: float, since: float, batch: int = 100):
+        """Relays rows added to the screenshots table after `since` (ms), polling every interval seconds."""
+        print("Watching Convex for new screenshots... (Ctrl+C to stop)")
+        cursor = since
+        while True:
+            try:
+                rows = await self._with_retries(
+                    "screenshots:listSince",
+                    lambda: self._query("screenshots:listSince", {"after": cursor, "limit": batch}),
+                )
+            except RelayFailed as e:
+                print(f"  {e}")
+                await asyncio.sleep(interval)
+                continue
+            if rows:
+                cursor = rows[-1]["_creationTime"]
+
+                async def new_shots():
+                    for row in rows:
+                        yield Screenshot(storage_id=row["storageId"])
+                await self.run(new_shots())
+                if len(rows) == batch:
+                    continue  # more waiting
+            await asyncio.sleep(interval)
+
+
+async def read_lines(paths: Iterable[str]) -> AsyncIterator[Screenshot]:
+    """Screenshots from files, one ID or URL per line ("-" is stdin, read as it arrives)."""
+    for path in paths:
+        f = sys.stdin if path == "-" else open(path)
+        try:
+            while True:
+                line = await asyncio.to_thread(f.readline) if f is sys.stdin else f.readline()
+                if not line:
+                    break
+                shot = Screenshot.parse(line)
+                if shot:
+                    yield shot
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+async def inputs(ids: Iterable[str], paths: Iterable[str]) -> AsyncIterator[Screenshot]:
+    """Argument IDs first, then the files."""
+    for item in ids:
+        shot = Screenshot.parse(item)
+        if shot:
+            yield shot
+    async for shot in read_lines(paths):
+        yield shot
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Relay Convex screenshots to the n8n webhook")
+    parser.add_argument("ids", nargs="*", help="Storage IDs or file URLs (default: read stdin)")
+    parser.add_argument("--file", action="append", default=[], help="File with one ID or URL per line ('-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=RELAY_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=RELAY_RETRIES)
+    parser.add_argument("--timeout", type=float, default=RELAY_TIMEOUT)
+    parser.add_argument("--transport", choices=TRANSPORTS, default=RELAY_TRANSPORT,
+                        help="Webhook body: auto (negotiate), binary, multipart or json (base64 data URI)")
+    parser.add_argument("--webhook", default=WEBHOOK_URL)
+    parser.add_argument("--convex", default=CONVEX_URL)
+    parser.add_argument("--failed", help="Write IDs that could not be relayed here, for a rerun with --file")
+    parser.add_argument("--watch", action="store_true", help="Poll the screenshots table and relay new rows")
+    parser.add_argument("--interval", type=float, default=RELAY_WATCH_INTERVAL, help="Seconds between --watch polls")
+    parser.add_argument("--since", type=float, help="With --watch, relay rows created after this ms timestamp (default: now)")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    relay = ScreenshotRelay(args.convex, args.webhook, concurrency=args.concurrency, retries=args.retries,
+                            timeout=args.timeout, source="convex_watcher" if args.watch else "relay",
+                            transport=args.transport)
+    try:
+        if args.watch:
+            since = args.since if args.since is not None else time.time() * 1000
+            await relay.watch(args.interval, since)
+        else:
+            files = args.file
+            if not args.ids and not files:
+                if sys.stdin.isatty():
+                    sys.exit("No screenshots: pass storage IDs or URLs, --file, or pipe them on stdin")
+                files = ["-"]
+            await relay.run(inputs(args.ids, files))
+            print(f"\nDone: {relay.progress()}")
+    finally:
+        await relay.aclose()
+        if args.failed and relay.failed:
+            with open(args.failed, "w") as f:
+                f.write("\n".join(relay.failed) + "\n")
+            print(f"{len(relay.failed)} failed IDs written to {args.failed}")
+    if relay.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nStopped")
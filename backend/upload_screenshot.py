@@ -1,31 +1,44 @@
 #!/usr/bin/env python3
 import requests
-import base64
 import sys
-import json
+import os
 
-CONVEX_URL = "https://abundant-porpoise-181.convex.cloud"
+from screenshot_payload import TRANSPORTS, guess_image_type, make_body, pick_transport
 
-def upload_screenshot(image_path, metadata=None):
+CONVEX_URL = os.getenv("CONVEX_URL", "https://abundant-porpoise-181.convex.cloud")
+# auto: binary or multipart if /upload-screenshot lists it in Accept-Post, else JSON base64
+SCREENSHOT_TRANSPORT = os.getenv("SCREENSHOT_TRANSPORT", "auto")
+
+def negotiate_transport(url, content_type):
+    """Asks the receiver (OPTIONS) which bodies it takes; JSON if it does not say."""
+    try:
+        response = requests.options(url, timeout=10)
+    except requests.RequestException:
+        return "json"
+    return pick_transport(response.headers.get("Accept-Post") if response.ok else None, content_type)
+
+def upload_screenshot(image_path, metadata=None, transport=SCREENSHOT_TRANSPORT):
     """Upload screenshot and auto-trigger n8n"""
     
-    # Read and encode image
-    with open(image_path, 'rb') as f:
-        image_data = base64.b64encode(f.read()).decode('utf-8')
+    url = f"{CONVEX_URL}/upload-screenshot"
+    if transport == "auto":
+        transport = negotiate_transport(url, guess_image_type(image_path))
     
-    data_uri = f"data:image/png;base64,{image_data}"
+    # Streamed from disk, never held in memory whole (base64-encoded chunk by chunk for JSON)
+    body = make_body(transport, image_path, {"metadata": metadata or {}})
     
     # Upload to Convex
     response = requests.post(
-        f"{CONVEX_URL}/upload-screenshot",
-        headers={"Content-Type": "application/json"},
-        json={
-            "screenshot": data_uri,
-            "metadata": metadata or {}
-        },
+        url,
+        headers=body.headers,
+        data=body,
         timeout=60
     )
     
+    if response.status_code == 415 and transport != "json":
+        # Receiver predates binary uploads
+        return upload_screenshot(image_path, metadata, transport="json")
+    
     result = response.json()
     
     if response.status_code == 200:
@@ -39,6 +52,6 @@ def upload_screenshot(image_path, metadata=None):
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python3 upload_screenshot.py <image-path>")
+        print(f"Usage: python3 upload_screenshot.py <image-path> [{'|'.join(TRANSPORTS)}]")
     else:
-        upload_screenshot(sys.argv[1])
+        upload_screenshot(sys.argv[1], transport=sys.argv[2] if len(sys.argv) > 2 else SCREENSHOT_TRANSPORT)
@@ -0,0 +1,291 @@
+"""
+Markdown chunking with boilerplate and near-duplicate removal, run on each
+crawled page before it is ingested.
+
+    chunker = Chunker(max_tokens=250, overlap_tokens=40)
+    chunks = chunker.chunk_page("Linear", url, title, result.markdown)
+
+1. Boilerplate: blocks (paragraphs, list groups) that are mostly links are
+   navigation and dropped; short blocks already seen on min_pages other pages
+   of the same tool (menus, footers, cookie banners) are dropped too.
+2. The rest is split on headings; each section keeps its heading path
+   ("Projects > Settings > Labels") and long sections are packed into
+   windows of about max_tokens words (whitespace tokens) that overlap by
+   up to overlap_tokens.
+3. Chunks whose 64-bit SimHash is within max_distance bits of an earlier
+   chunk of the same tool are dropped as near-duplicates.
+
+Both need memory of the tool's other pages. With a CrawlState passed as
+state, it is loaded from the crawl state database the first time a tool
+is chunked, so an incremental run that only re-chunks changed pages still
+knows the blocks and chunks of the unchanged ones. A page's entry is only
+saved by persist(url), once its chunks are in doc_chunks; if the write
+fails, the next run does not drop those chunks as duplicates of themselves.
+A re-chunked page first forgets its own previous blocks and hashes, so
+it is never counted twice or dropped as a duplicate of itself.
+
+A block only counts as boilerplate from the (min_pages + 1)th page on, so
+the pages before that were chunked with it. When a block crosses the
+threshold, those pages are reported by pop_stale() for the caller to
+re-chunk; this happens once per block, since the counts are persisted.
+
+Chunk ids hash the URL, heading path (numbered when several sections of
+the page share it) and window number, so they are unique within a page and
+stay the same across recrawls while other sections of the page change.
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_WORD = re.compile(r"\w+")
+_SPACE = re.compile(r"\s+")
+
+
+def _digest(text: str, size: int = 8) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=size).hexdigest()
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash over word shingles."""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return 0
+    grams = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    weights = [0] * 64
+    for gram in grams:
+        h = int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "little")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class SimHashIndex:
+    """
+    Near-duplicate lookup for 64-bit hashes. The hash is split into
+    max_distance + 1 bands; two hashes within max_distance bits must agree on
+    at least one band, so only chunks sharing a band are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.width = 64 // self.bands
+        self.tables: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self.owners: Dict[str, List[int]] = defaultdict(list)  # page URL -> hashes it added
+
+    def _keys(self, h: int) -> List[int]:
+        mask = (1 << self.width) - 1
+        return [(h >> (i * self.width)) & mask for i in range(self.bands)]
+
+    def add(self, h: int, owner: str):
+        for table, key in zip(self.tables, self._keys(h)):
+            table[key].append(h)
+        self.owners[owner].append(h)
+
+    def add_if_new(self, h: int, owner: str) -> bool:
+        """Adds h unless a stored hash is within max_distance bits; True if added."""
+        keys = self._keys(h)
+        for table, key in zip(self.tables, keys):
+            for other in table.get(key, ()):
+                if bin(h ^ other).count("1") <= self.max_distance:
+                    return False
+        self.add(h, owner)
+        return True
+
+    def discard(self, owner: str):
+        """Removes every hash owner added."""
+        for h in self.owners.pop(owner, ()):
+            for table, key in zip(self.tables, self._keys(h)):
+                bucket = table[key]
+                bucket.remove(h)
+                if not bucket:
+                    del table[key]
+
+
+def _blocks(markdown: str) -> List[str]:
+    """Blank-line separated blocks; headings are always blocks of their own."""
+    blocks, current = [], []
+    for line in markdown.splitlines():
+        if not line.strip() or _HEADING.match(line):
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            if line.strip():
+                blocks.append(line.strip())
+        else:
+            current.append(line.rstrip())
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def _is_navigation(block: str) -> bool:
+    """Mostly link text: menus, breadcrumbs, 'on this page' lists."""
+    links = _LINK.findall(block)
+    if len(links) < 3:
+        return False
+    plain = _LINK.sub("", block)
+    return len(_WORD.findall(plain)) < len(links) * 2
+
+
+class Chunker:
+    def __init__(self, max_tokens: int = 250, overlap_tokens: int = 40, min_tokens: int = 12,
+                 min_pages: int = 3, max_distance: int = 3, boilerplate_max_chars: int = 400,
+                 state=None):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.min_tokens = min_tokens
+        self.min_pages = min_pages
+        self.boilerplate_max_chars = boilerplate_max_chars
+        self.max_distance = max_distance
+        self.state = state  # CrawlState (or None): block and hash memory across runs
+        self._block_pages: Dict[str, Dict[str, set]] = {}  # tool -> block hash -> URLs it is on
+        self._page_blocks: Dict[str, Dict[str, List[str]]] = {}  # tool -> URL -> its block hashes
+        self._seen: Dict[str, SimHashIndex] = {}
+        self._unsaved: Dict[str, Tuple[str, List[str], List[int]]] = {}  # URL -> (tool, blocks, hashes)
+        self._boilerplate: Dict[str, set] = {}  # tool -> block hashes that crossed min_pages
+        self._stale: set = set()  # (tool, URL) chunked with a block that has since become boilerplate
+        self.stats = {"pages": 0, "chunks": 0, "boilerplate_blocks": 0, "near_duplicates": 0, "stale_pages": 0}
+
+    def _load(self, tool: str):
+        if tool in self._seen:
+            return
+        block_pages, page_blocks = defaultdict(set), {}
+        seen = SimHashIndex(self.max_distance)
+        if self.state is not None:
+            stored_blocks, stored_hashes = self.state.chunk_state(tool)
+            for url, keys in stored_blocks.items():
+                page_blocks[url] = keys
+                for key in keys:
+                    block_pages[key].add(url)
+            for url, hashes in stored_hashes.items():
+                for h in hashes:
+                    seen.add(h, url)
+        self._block_pages[tool], self._page_blocks[tool], self._seen[tool] = block_pages, page_blocks, seen
+        self._boilerplate[tool] = {key for key, urls in block_pages.items() if len(urls) > self.min_pages}
+
+    def _strip_boilerplate(self, tool: str, url: str, blocks: List[str]) -> Tuple[List[str], List[str]]:
+        """(blocks kept, hashes of the page's short blocks)."""
+        pages = self._block_pages[tool]
+        for key in self._page_blocks[tool].pop(url, ()):
+            pages[key].discard(url)
+        kept, keys = [], []
+        for block in blocks:
+            if _HEADING.match(block):
+                kept.append(block)
+                continue
+            if _is_navigation(block):
+                self.stats["boilerplate_blocks"] += 1
+                continue
+            if len(block) <= self.boilerplate_max_chars:
+                key = _digest(_SPACE.sub(" ", block.lower()))
+                if url not in pages[key]:
+                    pages[key].add(url)
+                    keys.append(key)
+                if len(pages[key]) > self.min_pages:
+                    if key not in self._boilerplate[tool]:
+                        self._boilerplate[tool].add(key)
+                        self._stale.update((tool, other) for other in pages[key] if other != url)
+                    self.stats["boilerplate_blocks"] += 1
+                    continue
+            kept.append(block)
+        self._page_blocks[tool][url] = keys
+        return kept, keys
+
+    def _sections(self, blocks: List[str]) -> List[Tuple[str, List[str]]]:
+        """(heading path, body blocks) per heading."""
+        path: List[Tuple[int, str]] = []
+        sections: List[Tuple[str, List[str]]] = [("", [])]
+        for block in blocks:
+            match = _HEADING.match(block)
+            if match:
+                level, title = len(match.group(1)), _LINK.sub(r"\1", match.group(2)).strip()
+                path = [(lvl, t) for lvl, t in path if lvl < level] + [(level, title)]
+                sections.append((" > ".join(t for _, t in path), []))
+            else:
+                sections[-1][1].append(block)
+        return [(heading, body) for heading, body in sections if body]
+
+    def _windows(self, blocks: List[str]) -> List[str]:
+        """
+        Packs whole blocks into windows of up to max_tokens words; the next
+        window starts with the trailing blocks that fit in overlap_tokens.
+        Only a block longer than a window is cut mid-block.
+        """
+        units = []
+        for block in blocks:
+            words = block.split()
+            if len(words) <= self.max_tokens:
+                units.append((block, len(words)))
+                continue
+            step = self.max_tokens - self.overlap_tokens
+            for start in range(0, len(words) - self.overlap_tokens, step):
+                piece = words[start:start + self.max_tokens]
+                units.append((" ".join(piece), len(piece)))
+
+        windows, current, size = [], [], 0
+        for unit, n in units:
+            if current and size + n > self.max_tokens:
+                windows.append("\n\n".join(u for u, _ in current))
+                keep, kept = [], 0
+                for previous in reversed(current):
+                    if kept + previous[1] > self.overlap_tokens:
+                        break
+                    keep.insert(0, previous)
+                    kept += previous[1]
+                current, size = keep, kept
+            current.append((unit, n))
+            size += n
+        if current:
+            windows.append("\n\n".join(u for u, _ in current))
+        return windows
+
+    def chunk_page(self, tool: str, url: str, title: Optional[str], markdown: str) -> List[dict]:
+        self.stats["pages"] += 1
+        self._load(tool)
+        seen = self._seen[tool]
+        seen.discard(url)
+        kept, block_keys = self._strip_boilerplate(tool, url, _blocks(markdown or ""))
+        chunks = []
+        occurrences: Dict[str, int] = defaultdict(int)
+        for heading, body in self._sections(kept):
+            # Sibling sections can share a heading path ("Example" under each of
+            # several same-named parents); number the repeats so ids stay unique
+            occurrence = occurrences[heading]
+            occurrences[heading] += 1
+            section = f"{heading}~{occurrence}" if occurrence else heading
+            for window, piece in enumerate(self._windows(body)):
+                if len(piece.split()) < self.min_tokens:
+                    continue
+                content = f"{heading}\n\n{piece}" if heading else piece
+                if not seen.add_if_new(simhash(content), url):
+                    self.stats["near_duplicates"] += 1
+                    continue
+                chunks.append({
+                    "chunk_id": _digest(f"{url}#{section}#{window}"),
+                    "heading": heading or title or "",
+                    "position": len(chunks),
+                    "content": content,
+                    "content_hash": _digest(content),
+                })
+        self.stats["chunks"] += len(chunks)
+        if self.state is not None:
+            self._unsaved[url] = (tool, block_keys, list(seen.owners.get(url, [])))
+        return chunks
+
+    def pop_stale(self) -> List[Tuple[str, str]]:
+        """(tool, URL) of pages whose chunks still hold a block that is now boilerplate."""
+        stale, self._stale = sorted(self._stale), set()
+        self.stats["stale_pages"] += len(stale)
+        return stale
+
+    def persist(self, url: str):
+        """Saves the blocks and chunk hashes of a page whose chunks Convex accepted."""
+        entry = self._unsaved.pop(url, None)
+        if entry is not None:
+            tool, blocks, hashes = entry
+            self.state.save_chunk_state(tool, url, blocks, hashes)
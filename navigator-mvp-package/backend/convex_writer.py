@@ -0,0 +1,168 @@
+"""
+Batched, non-blocking Convex writes for the crawler.
+
+The Convex Python client is synchronous, so calling it from a crawl
+coroutine stalls every in-flight fetch for a full round trip. ConvexWriter
+takes documents on a bounded asyncio queue, groups them into
+scrapedata:insertMany batches (by count, size or age) and runs each mutation
+in a worker thread, at most max_inflight at a time. Throttled or failed
+batches are retried with jittered backoff. A full queue makes put() wait,
+so a slow Convex slows the crawl instead of growing memory.
+
+    writer = ConvexWriter(client.mutation, batch_size=20)
+    writer.start()
+    await writer.put(doc)
+    await writer.close()    # flushes what is left
+"""
+
+import asyncio
+import random
+import time
+from typing import Callable, List, Optional
+
+_CLOSE = object()
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Throttling, timeouts and server errors are retried; a ConvexError raised
+    by the mutation itself (bad arguments) would fail the same way again.
+    """
+    return type(error).__name__ != "ConvexError"
+
+
+class ConvexWriter:
+    def __init__(
+        self,
+        mutate: Callable[[str, dict], object],
+        mutation: str = "scrapedata:insertMany",
+        single_mutation: Optional[str] = "scrapedata:insert",
+        batch_size: int = 20,
+        max_batch_bytes: int = 4_000_000,
+        flush_interval: float = 1.0,
+        max_inflight: int = 2,
+        queue_size: int = 200,
+        retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        on_written: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        self.mutate = mutate
+        self.mutation = mutation
+        self.single_mutation = single_mutation  # used when batch_size is 1 (no insertMany deployed)
+        self.batch_size = max(1, batch_size)
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_written = on_written  # called with each batch Convex accepted
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._writes: set = set()
+        self._batcher: Optional[asyncio.Task] = None
+        self.started = time.monotonic()
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.retried = 0
+        self.bytes = 0
+        self.write_seconds = 0.0
+
+    def start(self):
+        self.started = time.monotonic()
+        self._batcher = asyncio.create_task(self._run())
+
+    async def put(self, doc: dict):
+        await self.queue.put(doc)
+
+    async def close(self):
+        await self.queue.put(_CLOSE)
+        await self._batcher
+        if self._writes:
+            await asyncio.gather(*self._writes)
+
+    @staticmethod
+    def _size(doc: dict) -> int:
+        """Rough argument size of a page (content) or a page's chunks."""
+        text = len(doc.get("content") or "") + sum(len(c.get("content") or "") for c in doc.get("chunks", ()))
+        return text + len(doc.get("url") or "") + 512
+
+    async def _run(self):
+        batch: List[dict] = []
+        size = 0
+        deadline = None
+        while True:
+            timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            try:
+                doc = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                doc = None  # batch is old enough
+            if doc is not None and doc is not _CLOSE:
+                doc_size = self._size(doc)
+                if batch and size + doc_size > self.max_batch_bytes:
+                    await self._dispatch(batch, size)
+                    batch, size, deadline = [], 0, None
+                batch.append(doc)
+                size += doc_size
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                await self._dispatch(batch, size)
+                batch, size, deadline = [], 0, None
+            if doc is _CLOSE:
+                return
+
+    async def _dispatch(self, batch: List[dict], size: int):
+        await self._slots.acquire()  # blocks the batcher, and through the queue the crawl, when writes lag
+        task = asyncio.create_task(self._write(batch, size))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: List[dict], size: int):
+        if self.batch_size == 1 and self.single_mutation:
+            name, args = self.single_mutation, batch[0]
+        else:
+            name, args = self.mutation, {"docs": batch}
+        try:
+            for attempt in range(self.retries + 1):
+                start = time.monotonic()
+                try:
+                    await asyncio.to_thread(self.mutate, name, args)
+                except Exception as e:
+                    self.write_seconds += time.monotonic() - start
+                    if attempt >= self.retries or not is_retryable(e):
+                        self.failed += len(batch)
+                        print(f"  Convex write failed for {len(batch)} docs: {e}")
+                        return
+                    self.retried += 1
+                    await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+                    continue
+                self.write_seconds += time.monotonic() - start
+                self.written += len(batch)
+                self.batches += 1
+                self.bytes += size
+                if self.on_written is not None:
+                    self.on_written(batch)
+                return
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retried": self.retried,
+            "queued": self.queue.qsize(),
+            "docs_per_second": round(self.written / elapsed, 2) if elapsed else 0.0,
+            "avg_batch_ms": round(self.write_seconds * 1000 / max(self.batches + self.retried, 1), 1),
+        }
+
+    def progress(self) -> str:
+        s = self.stats()
+        return (f"writes {s['written']} ({s['docs_per_second']} docs/s, {s['batches']} batches, "
+                f"queued {s['queued']}, failed {s['failed']})")
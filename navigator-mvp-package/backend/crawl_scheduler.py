@@ -0,0 +1,268 @@
+"""
+Concurrent, polite crawl scheduler.
+
+URLs wait in a frontier grouped by host. Workers take the next URL whose host
+is below its concurrency limit and past its politeness interval, so one slow
+or large site never holds every worker. Failed fetches are retried with
+exponential backoff and jitter; a Retry-After on a 429/503 also pushes the
+whole host back.
+
+    scheduler = CrawlScheduler(fetch, handle, concurrency=16, per_host=2, host_rate=1.0)
+    scheduler.add(CrawlTask("https://linear.app/docs", tool="Linear"))
+    stats = await scheduler.run()
+
+fetch(task) returns a result or raises: FetchFailed marks the URL failed,
+anything else (RetryableFetch, timeouts, browser errors) schedules a retry.
+handle(task, result) stores the result and may add() more tasks.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from urllib.parse import urlsplit
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class FetchFailed(Exception):
+    """Permanent failure (404, robots, non-HTML); never retried."""
+
+
+class RetryableFetch(Exception):
+    """Transient failure; retry_after (seconds) also delays the host."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class CrawlTask:
+    url: str
+    tool: str
+    depth: int = 0
+    attempt: int = 0
+    rechunk: bool = False  # refetch only to re-chunk the page (see Chunker.pop_stale)
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.url).netloc.lower()
+
+
+@dataclass
+class HostState:
+    pending: Deque[CrawlTask] = field(default_factory=deque)
+    inflight: int = 0
+    next_start: float = 0.0
+    fetched: int = 0
+
+
+class Frontier:
+    """Per-host queues with a concurrency limit and a minimum start interval per host."""
+
+    def __init__(self, per_host: int = 2, host_rate: float = 1.0):
+        self.per_host = per_host
+        self.min_interval = 1.0 / host_rate if host_rate > 0 else 0.0
+        self.hosts: Dict[str, HostState] = {}
+        self.delayed: List[tuple] = []  # (due, seq, task) retries waiting out their backoff
+        self._seq = itertools.count()
+        self._rotation: Deque[str] = deque()
+        self._active: Dict[int, CrawlTask] = {}
+        self._changed = asyncio.Event()
+
+    def push(self, task: CrawlTask, delay: float = 0.0):
+        if delay > 0:
+            heapq.heappush(self.delayed, (time.monotonic() + delay, next(self._seq), task))
+        else:
+            host = self.hosts.get(task.host)
+            if host is None:
+                host = self.hosts[task.host] = HostState()
+                self._rotation.append(task.host)
+            host.pending.append(task)
+        self._changed.set()
+
+    def defer_host(self, host: str, delay: float):
+        state = self.hosts.get(host)
+        if state is not None:
+            state.next_start = max(state.next_start, time.monotonic() + delay)
+
+    def done(self, task: CrawlTask):
+        self.hosts[task.host].inflight -= 1
+        self._active.pop(id(task), None)
+        self._changed.set()
+
+    def tasks(self) -> List[CrawlTask]:
+        """Everything not yet finished: in flight, queued and waiting to retry."""
+        return (list(self._active.values()) + [t for h in self.hosts.values() for t in h.pending]
+                + [entry[2] for entry in self.delayed])
+
+    @property
+    def queued(self) -> int:
+        return sum(len(h.pending) for h in self.hosts.values()) + len(self.delayed)
+
+    @property
+    def inflight(self) -> int:
+        return sum(h.inflight for h in self.hosts.values())
+
+    def _promote_due(self, now: float):
+        while self.delayed and self.delayed[0][0] <= now:
+            self.push(heapq.heappop(self.delayed)[2])
+
+    def _take_ready(self, now: float) -> Optional[CrawlTask]:
+        """Round-robins over hosts so every site makes progress."""
+        for _ in range(len(self._rotation)):
+            name = self._rotation[0]
+            self._rotation.rotate(-1)
+            host = self.hosts[name]
+            if host.pending and host.inflight < self.per_host and host.next_start <= now:
+                host.inflight += 1
+                host.next_start = now + self.min_interval
+                host.fetched += 1
+                task = host.pending.popleft()
+                self._active[id(task)] = task
+                return task
+        return None
+
+    def _next_wakeup(self, now: float) -> Optional[float]:
+        times = [h.next_start for h in self.hosts.values() if h.pending and h.inflight < self.per_host]
+        if self.delayed:
+            times.append(self.delayed[0][0])
+        return max(min(times) - now, 0.0) if times else None
+
+    async def get(self) -> Optional[CrawlTask]:
+        """Next task to fetch, or None once nothing is queued, delayed or in flight."""
+        while True:
+            now = time.monotonic()
+            self._promote_due(now)
+            task = self._take_ready(now)
+            if task is not None:
+                return task
+            if not self.queued and not self.inflight:
+                self._changed.set()  # wake the other idle workers so they exit too
+                return None
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=self._next_wakeup(now))
+            except asyncio.TimeoutError:
+                pass
+
+
+@dataclass
+class CrawlStats:
+    started: float = field(default_factory=time.monotonic)
+    succeeded: int = 0
+    failed: int = 0
+    retried: int = 0
+    bytes: int = 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def as_dict(self) -> dict:
+        elapsed = self.elapsed()
+        return {
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "bytes": self.bytes,
+            "elapsed_s": round(elapsed, 1),
+            "pages_per_second": round(self.succeeded / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class CrawlScheduler:
+    def __init__(
+        self,
+        fetch: Callable[[CrawlTask], Awaitable[Any]],
+        handle: Callable[[CrawlTask, Any], Awaitable[None]],
+        concurrency: int = 8,
+        per_host: int = 2,
+        host_rate: float = 1.0,
+        retries: int = 3,
+        backoff: float = 2.0,
+        max_backoff: float = 60.0,
+        progress_interval: float = 10.0,
+        progress_extra: Optional[Callable[[], str]] = None,
+    ):
+        self.fetch = fetch
+        self.handle = handle
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.progress_interval = progress_interval
+        self.progress_extra = progress_extra  # e.g. the writer's progress, appended to each line
+        self.frontier = Frontier(per_host=per_host, host_rate=host_rate)
+        self.stats = CrawlStats()
+
+    def add(self, task: CrawlTask):
+        self.frontier.push(task)
+
+    def _retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def _process(self, task: CrawlTask):
+        try:
+            result = await self.fetch(task)
+        except Exception as e:
+            if isinstance(e, FetchFailed) or task.attempt >= self.retries:
+                self.stats.failed += 1
+                print(f"  Failed: {task.url} after {task.attempt + 1} attempts - {e}")
+                return
+            delay = self._retry_delay(task.attempt)
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after:
+                delay = max(delay, retry_after)
+                self.frontier.defer_host(task.host, retry_after)
+            self.stats.retried += 1
+            task.attempt += 1
+            self.frontier.push(task, delay=delay)
+            return
+        self.stats.succeeded += 1
+        self.stats.bytes += len(getattr(result, "markdown", None) or "")
+        try:
+            await self.handle(task, result)
+        except Exception as e:
+            print(f"  Error processing {task.url}: {e}")
+
+    async def _worker(self):
+        while True:
+            task = await self.frontier.get()
+            if task is None:
+                return
+            try:
+                await self._process(task)
+            except asyncio.CancelledError:
+                self.frontier.push(task)  # unfinished: keep it in the frontier for checkpoints
+                raise
+            finally:
+                self.frontier.done(task)
+
+    def progress(self) -> str:
+        s = self.stats.as_dict()
+        return (f"[{s['elapsed_s']:>6}s] ok {s['succeeded']} failed {s['failed']} retries {s['retried']} | "
+                f"queued {self.frontier.queued} in flight {self.frontier.inflight} "
+                f"hosts {len(self.frontier.hosts)} | {s['pages_per_second']} pages/s"
+                + (f" | {self.progress_extra()}" if self.progress_extra else ""))
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            print(self.progress())
+
+    async def run(self) -> dict:
+        self.stats = CrawlStats()
+        reporter = asyncio.create_task(self._report()) if self.progress_interval > 0 else None
+        try:
+            await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+        print(self.progress())
+        return self.stats.as_dict()
@@ -0,0 +1,219 @@
+"""
+Local crawl state for incremental recrawls (SQLite).
+
+For every URL the crawler stores the validators the server sent (ETag,
+Last-Modified), a hash of the normalized markdown that was last written to
+Convex, and the page's outgoing links. On the next run:
+
+  * URLs with validators are checked with a conditional HEAD first; a 304
+    skips the browser render and the Convex write entirely,
+  * pages that changed on the wire but whose normalized markdown hashes the
+    same are not written again (no scrapedata:insert, no re-extraction),
+  * the stored links let a link-following crawl walk through unchanged pages.
+
+It also keeps the chunker's per-tool memory (chunking.py): which short
+blocks each page had, for boilerplate counts, and the SimHashes of each
+page's chunks, for near-duplicate checks. Without them every run would
+start from nothing and re-ingest a tool's boilerplate and duplicates.
+
+The hash is only recorded once Convex confirmed the write, so a failed
+write is retried on the next run. A second hash records the version whose
+chunks reached doc_chunks; while it lags behind (a --no-chunks run, a
+failed chunk write, a page written before chunking existed) the page gets
+no conditional HEAD and its chunks are written even if the page itself
+is unchanged.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    chunks_hash TEXT,
+    links TEXT,
+    checked_at REAL,
+    changed_at REAL
+);
+CREATE TABLE IF NOT EXISTS chunk_blocks (
+    tool TEXT NOT NULL,
+    url TEXT NOT NULL,
+    block TEXT NOT NULL,
+    PRIMARY KEY (tool, url, block)
+);
+CREATE TABLE IF NOT EXISTS chunk_hashes (
+    tool TEXT NOT NULL,
+    url TEXT NOT NULL,
+    simhash INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunk_hashes_by_page ON chunk_hashes (tool, url);
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+# Cache-busting query strings on asset and link URLs (?v=123, ?t=...) change on every deploy
+_URL_QUERY = re.compile(r"(\]\([^)\s?]+)\?[^)\s]*")
+
+
+def content_hash(markdown: str) -> str:
+    """sha256 of the markdown with whitespace collapsed and link query strings dropped."""
+    normalized = _WHITESPACE.sub(" ", _URL_QUERY.sub(r"\1", markdown or "")).strip()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def header(headers, name: str) -> Optional[str]:
+    """Case-insensitive lookup in a plain dict or httpx.Headers."""
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is None:
+        lowered = name.lower()
+        value = next((v for k, v in headers.items() if k.lower() == lowered), None)
+    return value
+
+
+class NotModified:
+    """Fetch result for a page the server answered with 304."""
+
+    success = True
+    markdown = ""
+    metadata: dict = {}
+
+    def __init__(self, links: List[str]):
+        self.links = {"internal": [{"href": href} for href in links]}
+
+
+class CrawlState:
+    def __init__(self, path: str, commit_every: int = 50):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # Databases from before chunking lack the column; their pages get chunks on the next run
+        if "chunks_hash" not in {row[1] for row in self.conn.execute("PRAGMA table_info(pages)")}:
+            self.conn.execute("ALTER TABLE pages ADD COLUMN chunks_hash TEXT")
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self.counts = {"not_modified": 0, "unchanged": 0, "changed": 0, "new": 0}
+
+    def get(self, url: str) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash, chunks_hash, links FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "content_hash": row[2],
+                "chunks_hash": row[3], "links": json.loads(row[4]) if row[4] else []}
+
+    def conditional_headers(self, url: str, chunked: bool = False) -> dict:
+        """
+        If-None-Match / If-Modified-Since for a URL we have stored content
+        for (and, when chunked, stored chunks of that content).
+        """
+        page = self.get(url)
+        if not page or not page["content_hash"]:
+            return {}
+        if chunked and page["chunks_hash"] != page["content_hash"]:
+            return {}
+        headers = {}
+        if page["etag"]:
+            headers["If-None-Match"] = page["etag"]
+        if page["last_modified"]:
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def _execute(self, sql: str, params: tuple):
+        self.conn.execute(sql, params)
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def not_modified(self, url: str):
+        self.counts["not_modified"] += 1
+        self._execute("UPDATE pages SET checked_at = ? WHERE url = ?", (time.time(), url))
+
+    def observe(self, url: str, tool: str, etag: Optional[str], last_modified: Optional[str],
+                digest: str, links: List[str]) -> bool:
+        """
+        Records a fetched page's links; True if its content differs from what
+        was last written and it needs a Convex write. Validators of a changed
+        page are only stored by written(), so a lost write is not hidden
+        behind a 304 next time.
+        """
+        page = self.get(url)
+        changed = page is None or page["content_hash"] != digest
+        self.counts["new" if page is None else "changed" if changed else "unchanged"] += 1
+        now = time.time()
+        if page is None:
+            self._execute("INSERT INTO pages (url, tool, links, checked_at) VALUES (?, ?, ?, ?)",
+                          (url, tool, json.dumps(links), now))
+        elif changed:
+            self._execute("UPDATE pages SET tool = ?, links = ?, checked_at = ? WHERE url = ?",
+                          (tool, json.dumps(links), now, url))
+        else:
+            self._execute(
+                "UPDATE pages SET tool = ?, etag = ?, last_modified = ?, links = ?, checked_at = ? WHERE url = ?",
+                (tool, etag, last_modified, json.dumps(links), now, url),
+            )
+        return changed
+
+    def needs_chunks(self, url: str, digest: str) -> bool:
+        """True if doc_chunks does not have the chunks of this content yet."""
+        page = self.get(url)
+        return page is None or page["chunks_hash"] != digest
+
+    def chunks_stale(self, url: str):
+        """The page's chunks in doc_chunks are out of date; re-chunk it on the next fetch."""
+        self._execute("UPDATE pages SET chunks_hash = NULL WHERE url = ?", (url,))
+
+    def written(self, url: str, digest: str, etag: Optional[str], last_modified: Optional[str],
+                chunked: bool = False):
+        """Convex has the content with this hash (and its chunks, when chunked)."""
+        self._execute(
+            "UPDATE pages SET content_hash = ?, chunks_hash = CASE WHEN ? THEN ? ELSE chunks_hash END, "
+            "etag = ?, last_modified = ?, changed_at = ? WHERE url = ?",
+            (digest, chunked, digest, etag, last_modified, time.time(), url),
+        )
+
+    def chunk_state(self, tool: str) -> Tuple[Dict[str, List[str]], Dict[str, List[int]]]:
+        """(short block hashes per URL, chunk SimHashes per URL) the chunker stored for a tool."""
+        blocks: Dict[str, List[str]] = {}
+        for url, block in self.conn.execute("SELECT url, block FROM chunk_blocks WHERE tool = ?", (tool,)):
+            blocks.setdefault(url, []).append(block)
+        hashes: Dict[str, List[int]] = {}
+        for url, h in self.conn.execute("SELECT url, simhash FROM chunk_hashes WHERE tool = ?", (tool,)):
+            # SQLite integers are signed 64-bit
+            hashes.setdefault(url, []).append(h & 0xFFFFFFFFFFFFFFFF)
+        return blocks, hashes
+
+    def save_chunk_state(self, tool: str, url: str, blocks: List[str], hashes: List[int]):
+        """Replaces a page's short block hashes and chunk SimHashes."""
+        self.conn.execute("DELETE FROM chunk_blocks WHERE tool = ? AND url = ?", (tool, url))
+        self.conn.execute("DELETE FROM chunk_hashes WHERE tool = ? AND url = ?", (tool, url))
+        self.conn.executemany("INSERT OR IGNORE INTO chunk_blocks (tool, url, block) VALUES (?, ?, ?)",
+                              [(tool, url, block) for block in blocks])
+        self.conn.executemany("INSERT INTO chunk_hashes (tool, url, simhash) VALUES (?, ?, ?)",
+                              [(tool, url, h - (1 << 64) if h >= 1 << 63 else h) for h in hashes])
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def summary(self) -> str:
+        c = self.counts
+        return (f"not modified {c['not_modified']}, unchanged {c['unchanged']}, "
+                f"changed {c['changed']}, new {c['new']}")
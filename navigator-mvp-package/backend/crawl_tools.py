@@ -1,5 +1,6 @@
-
+import argparse
 import asyncio
+import httpx
 import os
 import json
 from datetime import datetime, timezone
@@ -7,6 +8,12 @@ from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
 from convex import ConvexClient
 from dotenv import load_dotenv
 
+from convex_writer import ConvexWriter
+from crawl_scheduler import CrawlScheduler, CrawlTask, FetchFailed, RetryableFetch, RETRYABLE_STATUS
+from chunking import Chunker
+from crawl_state import CrawlState, NotModified, content_hash, header
+from docs_crawl import BloomFilter, CrawlRules, DocsCrawl, normalize_url, page_links
+
 # Load environment variables
 load_dotenv()
 
@@ -16,81 +23,311 @@ if not CONVEX_URL:
 
 client = ConvexClient(CONVEX_URL)
 
-# Sample list of tools to crawl (Phase 1 test)
-TOOLS_TO_CRAWL = [
-    {
-        "name": "Linear",
-        "url": "https://linear.app",
-        "docs_url": "https://linear.app/docs"
-    },
-    {
-        "name": "Notion",
-        "url": "https://www.notion.so/product",
-        "docs_url": "https://www.notion.so/help"
-    },
-    {
-        "name": "Figma",
-        "url": "https://www.figma.com",
-        "docs_url": "https://help.figma.com/hc/en-us"
-    }
-]
-
-async def crawl_tool(crawler, tool):
-    print(f"Crawling {tool['name']}...")
-    
-    urls = [tool['url']]
-    if tool.get('docs_url'):
-        urls.append(tool['docs_url'])
-
-    for url in urls:
+HERE = os.path.dirname(os.path.abspath(__file__))
+TOOLS_CONFIG = os.getenv("TOOLS_CONFIG", os.path.join(HERE, "tools_config.json"))
+
+# Crawl scheduling
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))      # arun calls in flight overall
+CRAWL_PER_HOST = int(os.getenv("CRAWL_PER_HOST", "2"))            # arun calls in flight per host
+CRAWL_HOST_RATE = float(os.getenv("CRAWL_HOST_RATE", "1.0"))      # request starts per second per host
+CRAWL_RETRIES = int(os.getenv("CRAWL_RETRIES", "3"))
+
+# Link-following mode (--follow-links)
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "3"))
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "500"))           # per tool
+CRAWL_SEEN_CAPACITY = int(os.getenv("CRAWL_SEEN_CAPACITY", "1000000"))
+CRAWL_CHECKPOINT = os.getenv("CRAWL_CHECKPOINT", os.path.join(HERE, "crawl_checkpoint.json"))
+
+# Chunked ingest into doc_chunks (heading-aware windows, boilerplate and near-duplicates removed)
+CRAWL_CHUNKS = os.getenv("CRAWL_CHUNKS", "true").lower() in ("1", "true", "yes", "on")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "250"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+# Incremental recrawls: validators and content hashes per URL
+CRAWL_STATE_DB = os.getenv("CRAWL_STATE_DB", os.path.join(HERE, "crawl_state.sqlite3"))
+
+# Convex writer: batched scrapedata:insertMany calls off the event loop
+CONVEX_WRITE_BATCH = int(os.getenv("CONVEX_WRITE_BATCH", "20"))          # 1 = scrapedata:insert per page
+CONVEX_WRITE_INFLIGHT = int(os.getenv("CONVEX_WRITE_INFLIGHT", "2"))
+CONVEX_WRITE_FLUSH_SECONDS = float(os.getenv("CONVEX_WRITE_FLUSH_SECONDS", "1.0"))
+
+# RAG API endpoint told which tools got new pages, so its knowledge and answer caches drop them; '' disables
+CACHE_INVALIDATE_URL = os.getenv("CACHE_INVALIDATE_URL", "http://127.0.0.1:8000/cache/invalidate")
+
+
+def load_tools(path: str, names=None) -> list:
+    """Tools from a tools config ({"tools": [...]}) or a JSON/JSONL list of tools."""
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            tools = [json.loads(line) for line in f if line.strip()]
+        else:
+            data = json.load(f)
+            tools = data["tools"] if isinstance(data, dict) else data
+
+    wanted = {n.lower() for n in names} if names else None
+    return [tool for tool in tools if not wanted or tool["name"].lower() in wanted]
+
+
+def seed_urls(tool: dict) -> list:
+    """A tool's "url" (default https://<first pattern>) and optional "docs_url"."""
+    url = tool.get("url") or (f"https://{tool['patterns'][0]}" if tool.get("patterns") else None)
+    return [u for u in (url, tool.get("docs_url")) if u]
+
+
+def make_fetch(crawler, state: CrawlState = None, http: httpx.AsyncClient = None, chunked: bool = False):
+    run_config = CrawlerRunConfig(
+        cache_mode=CacheMode.BYPASS,
+        word_count_threshold=10,  # Minimum words to consider meaningful
+    )
+
+    async def fetch(task: CrawlTask):
+        # Cheap conditional HEAD before rendering a page we already have; the
+        # browser fetches changed pages anyway, so a GET here would download
+        # them twice. Servers that refuse HEAD get a GET whose body is not read.
+        probe = state and http and not task.rechunk
+        conditional = state.conditional_headers(task.url, chunked) if probe else {}
+        probed = None
+        if conditional:
+            try:
+                response = await http.head(task.url, headers=conditional)
+                if response.status_code in (405, 501):
+                    async with http.stream("GET", task.url, headers=conditional) as response:
+                        pass
+                if response.status_code == 304:
+                    return NotModified(state.get(task.url)["links"])
+                probed = response.headers
+            except httpx.HTTPError:
+                pass  # let the browser fetch decide
+
+        result = await crawler.arun(url=task.url, config=run_config)
+        if result.success:
+            if probed is not None and not getattr(result, "response_headers", None):
+                # Validators of the page as it was just served, if the browser did not keep its own
+                result.response_headers = {k: v for k, v in probed.items()
+                                           if k.lower() in ("etag", "last-modified")}
+            return result
+        status = getattr(result, "status_code", None)
+        if status is None or status in RETRYABLE_STATUS:
+            headers = getattr(result, "response_headers", None) or {}
+            retry_after = headers.get("retry-after") or headers.get("Retry-After")
+            raise RetryableFetch(f"{status} {result.error_message}",
+                                 retry_after=float(retry_after) if str(retry_after).isdigit() else None)
+        raise FetchFailed(f"{status} {result.error_message}")
+
+    return fetch
+
+
+def make_store(writer: ConvexWriter, docs: DocsCrawl = None, state: CrawlState = None,
+               pending: dict = None, full: bool = False,
+               chunker: Chunker = None, chunk_writer: ConvexWriter = None, scheduler: CrawlScheduler = None):
+    async def store_page(task: CrawlTask, result):
+        if isinstance(result, NotModified):
+            state.not_modified(task.url)
+            print(f"  Not modified: {task.url}")
+            if docs is not None:
+                docs.on_page(task, result)
+            return
+
+        if state is not None:
+            digest = content_hash(result.markdown)
+            headers = getattr(result, "response_headers", None)
+            validators = (header(headers, "ETag"), header(headers, "Last-Modified"))
+            links = [u for u in (normalize_url(h, task.url) for h in page_links(result)) if u]
+            changed = state.observe(task.url, task.tool, *validators, digest, links)
+            # A re-chunk fetch can come back while the page's first writes of this content are queued
+            previous = pending.get(task.url)
+            outstanding = previous[1] if previous is not None and previous[0][0] == digest else 0
+            write_page = (changed or full) and not outstanding
+            write_chunks = chunker is not None and (
+                write_page or task.rechunk or state.needs_chunks(task.url, digest))
+            if not write_page and not write_chunks:
+                print(f"  Unchanged: {task.url}")
+                if docs is not None:
+                    docs.on_page(task, result)
+                return
+            # Recorded once every write for the page landed
+            pending[task.url] = [(digest, *validators), outstanding + int(write_page) + int(write_chunks)]
+        else:
+            write_page, write_chunks = not task.rechunk, chunker is not None
+
+        title = result.metadata.get("title", task.tool)
+        crawled_at = int(datetime.now(timezone.utc).timestamp() * 1000)
+        chunks = chunker.chunk_page(task.tool, task.url, title, result.markdown) if write_chunks else None
+        print(f"  {'Successfully crawled' if write_page else 'Unchanged, chunks missing'}: {task.url} "
+              f"({len(result.markdown)} chars{f', {len(chunks)} chunks' if chunks is not None else ''})")
+
+        if write_page:
+            # Queued for the writer (scrapedata:insertMany in convex/scrapedata.ts)
+            await writer.put({
+                "tool_name": task.tool,
+                "url": task.url,
+                "title": title,
+                "content": result.markdown,
+                "summary": f"Crawled content from {task.url}",
+                "crawled_at": crawled_at,
+                "metadata": result.metadata
+            })
+        if chunks is not None:
+            # doc_chunks:upsertPages also deletes chunks the page no longer has
+            await chunk_writer.put({
+                "tool_name": task.tool,
+                "url": task.url,
+                "title": title,
+                "crawled_at": crawled_at,
+                "chunks": chunks,
+            })
+            # Pages chunked before one of their blocks turned out to be boilerplate
+            for tool, url in chunker.pop_stale():
+                print(f"  Re-chunking {url}: a block on it is now {tool} boilerplate")
+                if state is not None:
+                    state.chunks_stale(url)
+                scheduler.add(CrawlTask(url=url, tool=tool, rechunk=True))
+        if docs is not None and not task.rechunk:
+            docs.on_page(task, result)
+
+    return store_page
+
+
+async def invalidate_caches(http: httpx.AsyncClient, url: str, tools) -> None:
+    """Best effort: the API may not be running, and its caches expire on their own anyway."""
+    for tool in sorted(tools):
         try:
-            # Configure crawl run
-            run_config = CrawlerRunConfig(
-                cache_mode=CacheMode.BYPASS,
-                word_count_threshold=10,  # Minimum words to consider meaningful
-            )
+            response = await http.post(url, json={"tool_name": tool})
+            response.raise_for_status()
+            print(f"  Invalidated API caches for {tool}: {response.json()}")
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"  Could not invalidate API caches for {tool}: {e}")
+            return
 
-            result = await crawler.arun(url=url, config=run_config)
-            
-            if result.success:
-                print(f"  Successfully crawled: {url} ({len(result.markdown)} chars)")
-                
-                # Store in Convex
-                # Using 'scrapedata' table we just created
-                client.mutation("scrapedata:insert", { # We'll need to define this mutation or use internal insert if using admin key, 
-                                                       # but simpler to use generic 'insert' wrapper if available, 
-                                                       # or standard convex client usually maps table access. 
-                                                       # For now, let's assume we might need a mutation or direct db access.
-                                                       # EDIT: Convex Python client fits 'mutation(name, args)' pattern. 
-                                                       # We need to ensure a mutation exists or use 'any' generic if valid.
-                                                       # Since we don't have a 'scrapedata:insert' mutation yet, I will write a simple one below 
-                                                       # and ask you to add it, OORRRR allow me to add a quick mutation to your schema file first.
-                    "tool_name": tool['name'],
-                    "url": url,
-                    "title": result.metadata.get("title", tool['name']),
-                    "content": result.markdown,
-                    "summary": f"Crawled content from {url}",
-                    "crawled_at": int(datetime.now(timezone.utc).timestamp() * 1000),
-                    "metadata": result.metadata
-                })
-                # Note: The above mutation call assumes 'scrapedata:insert' exists. 
-                # I will add this mutation to your convex/scrapedata.ts file in a moment.
-                
-            else:
-                print(f"  Failed: {url} - {result.error_message}")
-                
-        except Exception as e:
-            print(f"  Error processing {url}: {e}")
 
 async def main():
+    parser = argparse.ArgumentParser(description="Crawl tool sites into Convex scrapedata")
+    parser.add_argument("--frontier", default=TOOLS_CONFIG,
+                        help="tools_config.json, or a JSON/JSONL list of {name, url, docs_url}")
+    parser.add_argument("--tools", nargs="+", help="Only crawl these tool names")
+    parser.add_argument("--concurrency", type=int, default=CRAWL_CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=CRAWL_PER_HOST)
+    parser.add_argument("--host-rate", type=float, default=CRAWL_HOST_RATE)
+    parser.add_argument("--retries", type=int, default=CRAWL_RETRIES)
+    parser.add_argument("--follow-links", action="store_true",
+                        help="Crawl whole docs sites: sitemaps plus links, within each tool's crawl rules")
+    parser.add_argument("--max-depth", type=int, default=CRAWL_MAX_DEPTH)
+    parser.add_argument("--max-pages", type=int, default=CRAWL_MAX_PAGES, help="Pages per tool")
+    parser.add_argument("--checkpoint", default=CRAWL_CHECKPOINT)
+    parser.add_argument("--resume", action="store_true", help="Continue from --checkpoint")
+    parser.add_argument("--state-db", default=CRAWL_STATE_DB, help="SQLite crawl state; '' disables it")
+    parser.add_argument("--full", action="store_true",
+                        help="Fetch and write every page, ignoring stored validators and hashes")
+    parser.add_argument("--no-chunks", dest="chunks", action="store_false", default=CRAWL_CHUNKS,
+                        help="Only write whole pages to scrapedata, not doc_chunks")
+    parser.add_argument("--write-batch", type=int, default=CONVEX_WRITE_BATCH)
+    parser.add_argument("--write-inflight", type=int, default=CONVEX_WRITE_INFLIGHT)
+    args = parser.parse_args()
+
+    tools = load_tools(args.frontier, args.tools)
+    print(f"Crawling {len(tools)} tools{' (following links)' if args.follow_links else ''} "
+          f"({args.concurrency} concurrent, {args.per_host} per host, {args.host_rate}/s per host)")
+
     browser_config = BrowserConfig(
         headless=True,
         verbose=True
     )
-    
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        for tool in TOOLS_TO_CRAWL:
-            await crawl_tool(crawler, tool)
+
+    state = CrawlState(args.state_db) if args.state_db else None
+    pending = {}  # url -> [(hash, etag, last_modified), writes outstanding] until Convex has them all
+    chunker = chunk_writer = None
+    written_tools = set()  # tools with at least one write Convex accepted this run
+
+    def record_written(batch):
+        for doc in batch:
+            written_tools.add(doc["tool_name"])
+            if state is None:
+                continue
+            if "chunks" in doc:
+                # Boilerplate counts and SimHashes only count once the chunks are in doc_chunks
+                chunker.persist(doc["url"])
+            entry = pending.get(doc["url"])
+            if entry is None:
+                continue
+            entry[1] -= 1
+            if entry[1] == 0:
+                del pending[doc["url"]]
+                state.written(doc["url"], *entry[0], chunked=chunker is not None)
+
+    writer = ConvexWriter(
+        client.mutation, batch_size=args.write_batch, max_inflight=args.write_inflight,
+        flush_interval=CONVEX_WRITE_FLUSH_SECONDS, on_written=record_written,
+    )
+    writer.start()
+    if args.chunks:
+        chunker = Chunker(max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, state=state)
+        chunk_writer = ConvexWriter(
+            client.mutation, mutation="doc_chunks:upsertPages", single_mutation=None,
+            batch_size=args.write_batch, max_inflight=args.write_inflight,
+            flush_interval=CONVEX_WRITE_FLUSH_SECONDS, on_written=record_written,
+        )
+        chunk_writer.start()
+
+    def progress() -> str:
+        parts = [writer.progress()]
+        if chunk_writer is not None:
+            parts.append(f"chunk {chunk_writer.progress()}")
+        if state is not None:
+            parts.append(state.summary())
+        return " | ".join(parts)
+
+    docs = None
+    http = httpx.AsyncClient(timeout=20, follow_redirects=True)
+    try:
+        async with AsyncWebCrawler(config=browser_config) as crawler:
+            scheduler = CrawlScheduler(
+                make_fetch(crawler, state, None if args.full else http, chunker is not None), None,
+                concurrency=args.concurrency, per_host=args.per_host,
+                host_rate=args.host_rate, retries=args.retries,
+                progress_extra=progress,
+            )
+            if args.follow_links:
+                rules = {t["name"]: CrawlRules.for_tool(t, seed_urls(t), args.max_depth, args.max_pages)
+                         for t in tools}
+                docs = DocsCrawl(scheduler, rules, BloomFilter(CRAWL_SEEN_CAPACITY), args.checkpoint)
+                if args.resume and os.path.exists(args.checkpoint):
+                    print(f"Resuming {docs.load_checkpoint()} URLs from {args.checkpoint}")
+                else:
+                    for tool in tools:
+                        queued = await docs.seed(tool["name"], seed_urls(tool), http)
+                        print(f"  {tool['name']}: {queued} seed URLs")
+            else:
+                for tool in tools:
+                    for url in seed_urls(tool):
+                        scheduler.add(CrawlTask(url=url, tool=tool["name"]))
+            scheduler.handle = make_store(writer, docs, state, pending, args.full,
+                                          chunker, chunk_writer, scheduler)
+            try:
+                stats = await scheduler.run()
+            except BaseException:
+                if docs is not None:
+                    docs.save_checkpoint()
+                    print(f"Interrupted; resume with --follow-links --resume ({args.checkpoint})")
+                raise
+            if docs is not None:
+                docs.finish()
+    finally:
+        await writer.close()
+        if chunk_writer is not None:
+            await chunk_writer.close()
+        # Both writers are drained, so every confirmed write is visible to the API's next lookup
+        if written_tools and CACHE_INVALIDATE_URL:
+            await invalidate_caches(http, CACHE_INVALIDATE_URL, written_tools)
+        await http.aclose()
+        if state is not None:
+            state.close()
+
+    print(f"Crawl: {json.dumps(stats)}")
+    print(f"Writes: {json.dumps(writer.stats())}")
+    if chunker is not None:
+        print(f"Chunks: {json.dumps(chunker.stats)} writes {json.dumps(chunk_writer.stats())}")
+    if state is not None:
+        print(f"Recrawl: {state.summary()}")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,294 @@
+"""
+Link-following docs crawl on top of CrawlScheduler.
+
+Each tool is seeded from its landing/docs URLs and, when the site has one,
+its sitemap (robots.txt Sitemap: lines or /sitemap.xml, including sitemap
+indexes and .gz files). Every crawled page's links are normalized, checked
+against the tool's rules (allowed hosts, include/exclude regexes, depth and
+page limits) and queued unless already seen.
+
+Seen URLs live in a Bloom filter (about 2.4 MB per million URLs at a 1e-4
+false-positive rate), so large frontiers fit in memory; a false positive
+only skips a page. The frontier, seen filter and per-tool counts are
+checkpointed to JSON periodically, so an interrupted crawl resumes where it
+stopped.
+
+Per-tool rules come from the tool's "crawl" entry in tools_config.json:
+
+    "crawl": {"include": ["/docs/", "/help/"], "exclude": ["/changelog"],
+              "max_depth": 3, "max_pages": 500, "sitemap": true}
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import httpx
+
+from crawl_scheduler import CrawlScheduler, CrawlTask
+
+# Never worth rendering as a docs page
+SKIP_EXTENSIONS = re.compile(
+    r"\.(png|jpe?g|gif|svg|webp|ico|pdf|zip|gz|tar|dmg|exe|mp4|webm|mp3|woff2?|ttf|css|js|json|xml|rss)$",
+    re.IGNORECASE,
+)
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|ref|ref_src|fbclid|gclid|mc_cid|mc_eid|_hsenc|_hsmi)$", re.IGNORECASE)
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Canonical form used for dedupe: absolute http(s), lowercase host, no
+    default port, fragment or tracking parameters, sorted query and no
+    trailing slash (except the root). None for URLs that are not crawlable.
+    """
+    if base:
+        url = urljoin(base, url)
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if parts.port and not (scheme == "http" and parts.port == 80 or scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(k)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; serializable for checkpoints."""
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 1e-4):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """Adds item; False if it was (probably) already present."""
+        new = False
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def to_dict(self) -> dict:
+        return {"capacity": self.capacity, "error_rate": self.error_rate, "count": self.count,
+                "bits": base64.b64encode(gzip.compress(bytes(self.bits))).decode()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BloomFilter":
+        bloom = cls(data["capacity"], data["error_rate"])
+        bloom.bits = bytearray(gzip.decompress(base64.b64decode(data["bits"])))
+        bloom.count = data["count"]
+        return bloom
+
+
+@dataclass
+class CrawlRules:
+    tool: str
+    hosts: List[str]
+    include: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+    max_depth: int = 3
+    max_pages: int = 500
+    sitemap: bool = True
+
+    def __post_init__(self):
+        self._include = [re.compile(p) for p in self.include]
+        self._exclude = [re.compile(p) for p in self.exclude]
+
+    def allows(self, url: str) -> bool:
+        parts = urlsplit(url)
+        host = parts.netloc
+        if not any(host == h or host.endswith("." + h) for h in self.hosts):
+            return False
+        if SKIP_EXTENSIONS.search(parts.path):
+            return False
+        if self._include and not any(p.search(url) for p in self._include):
+            return False
+        return not any(p.search(url) for p in self._exclude)
+
+    @classmethod
+    def for_tool(cls, tool: dict, seeds: List[str], max_depth: int, max_pages: int) -> "CrawlRules":
+        crawl = tool.get("crawl") or {}
+        hosts = {urlsplit(normalize_url(u) or u).netloc for u in seeds}
+        hosts.update(p.split("/")[0].lower() for p in tool.get("patterns", []))
+        hosts = {h[4:] if h.startswith("www.") else h for h in hosts if h}
+        return cls(
+            tool=tool["name"],
+            hosts=sorted(hosts),
+            include=crawl.get("include", []),
+            exclude=crawl.get("exclude", []),
+            max_depth=crawl.get("max_depth", max_depth),
+            max_pages=crawl.get("max_pages", max_pages),
+            sitemap=crawl.get("sitemap", True),
+        )
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_sitemap(data: bytes) -> tuple:
+    """(page URLs, child sitemap URLs) from a urlset or sitemapindex document."""
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    pages, children = [], []
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError:
+        return pages, children
+    target = children if _local(root.tag) == "sitemapindex" else pages
+    for element in root.iter():
+        if _local(element.tag) == "loc" and element.text:
+            target.append(element.text.strip())
+    return pages, children
+
+
+async def sitemap_urls(http: httpx.AsyncClient, seed: str, limit: int,
+                       accept: Callable[[str], bool] = lambda url: True, max_sitemaps: int = 50) -> List[str]:
+    """Normalized page URLs from the site's sitemaps that pass accept(), at most limit of them."""
+    root = urlunsplit(urlsplit(seed)[:2] + ("/", "", ""))
+    queue: List[str] = []
+    try:
+        robots = await http.get(urljoin(root, "/robots.txt"))
+        if robots.status_code == 200:
+            queue = [line.split(":", 1)[1].strip() for line in robots.text.splitlines()
+                     if line.lower().startswith("sitemap:")]
+    except httpx.HTTPError:
+        pass
+    queue = queue or [urljoin(root, "/sitemap.xml")]
+
+    pages: List[str] = []
+    seen = set()
+    while queue and len(seen) < max_sitemaps and len(pages) < limit:
+        url = queue.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        try:
+            response = await http.get(url)
+        except httpx.HTTPError:
+            continue
+        if response.status_code != 200:
+            continue
+        found, children = parse_sitemap(response.content)
+        pages.extend(u for u in map(normalize_url, found) if u and accept(u))
+        queue.extend(children)
+    return pages[:limit]
+
+
+def page_links(result) -> List[str]:
+    """hrefs from a crawl4ai result (result.links = {"internal": [...], "external": [...]})."""
+    links = getattr(result, "links", None) or {}
+    hrefs = []
+    for group in ("internal", "external"):
+        for link in links.get(group, []):
+            href = link.get("href") if isinstance(link, dict) else link
+            if href:
+                hrefs.append(href)
+    return hrefs
+
+
+class DocsCrawl:
+    def __init__(self, scheduler: CrawlScheduler, rules: Dict[str, CrawlRules],
+                 seen: Optional[BloomFilter] = None, checkpoint_path: Optional[str] = None,
+                 checkpoint_interval: float = 30.0):
+        self.scheduler = scheduler
+        self.rules = rules
+        self.seen = seen or BloomFilter()
+        self.pages: Dict[str, int] = {tool: 0 for tool in rules}
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self._last_checkpoint = time.monotonic()
+
+    def discover(self, tool: str, url: str, depth: int, base: Optional[str] = None, seed: bool = False) -> bool:
+        """
+        Queues url for tool if it passes the rules, limits and seen filter.
+        Seeds skip the include/exclude rules, since the tool lists them explicitly.
+        """
+        rules = self.rules[tool]
+        url = normalize_url(url, base)
+        if url is None or depth > rules.max_depth or self.pages[tool] >= rules.max_pages:
+            return False
+        if not (seed or rules.allows(url)) or not self.seen.add(url):
+            return False
+        self.pages[tool] += 1
+        self.scheduler.add(CrawlTask(url=url, tool=tool, depth=depth))
+        return True
+
+    async def seed(self, tool: str, urls: List[str], http: Optional[httpx.AsyncClient] = None) -> int:
+        rules = self.rules[tool]
+        queued = sum(self.discover(tool, u, 0, seed=True) for u in urls)
+        if rules.sitemap and http is not None and urls:
+            for url in await sitemap_urls(http, urls[0], limit=rules.max_pages, accept=rules.allows):
+                queued += self.discover(tool, url, 1)
+        return queued
+
+    def on_page(self, task: CrawlTask, result):
+        """Queues the page's links one level deeper and checkpoints when due."""
+        if task.depth < self.rules[task.tool].max_depth:
+            for href in page_links(result):
+                self.discover(task.tool, href, task.depth + 1, base=task.url)
+        if self.checkpoint_path and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.save_checkpoint()
+
+    def save_checkpoint(self):
+        state = {
+            "saved_at": time.time(),
+            "pages": self.pages,
+            "seen": self.seen.to_dict(),
+            "tasks": [{"url": t.url, "tool": t.tool, "depth": t.depth}
+                      for t in self.scheduler.frontier.tasks()],
+        }
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+        self._last_checkpoint = time.monotonic()
+
+    def load_checkpoint(self) -> int:
+        """Restores seen URLs, counts and unfinished tasks; returns tasks requeued."""
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        self.seen = BloomFilter.from_dict(state["seen"])
+        self.pages.update(state["pages"])
+        for task in state["tasks"]:
+            if task["tool"] in self.rules:
+                self.scheduler.add(CrawlTask(url=task["url"], tool=task["tool"], depth=task["depth"]))
+        return len(state["tasks"])
+
+    def finish(self):
+        """Removes the checkpoint once the crawl completed."""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
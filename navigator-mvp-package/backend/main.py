@@ -34,6 +34,12 @@ app.add_middleware(
 # Configuration
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
 CONVEX_URL = os.getenv("CONVEX_URL", "https://abundant-porpoise-181.convex.cloud")
+# doc_chunks:search returns heading-sized chunks; scrapedata:searchKnowledge whole pages
+KNOWLEDGE_SEARCH_PATH = os.getenv("KNOWLEDGE_SEARCH_PATH", "doc_chunks:search")
+# Searched when KNOWLEDGE_SEARCH_PATH finds nothing (tools not recrawled with chunks yet); '' disables
+KNOWLEDGE_FALLBACK_PATH = os.getenv("KNOWLEDGE_FALLBACK_PATH", "scrapedata:searchKnowledge")
+# Per-source cap in the RAG prompt (a 250-token chunk is roughly 1500 characters)
+MAX_SOURCE_CHARS = int(os.getenv("MAX_SOURCE_CHARS", "1500"))
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen3:8b")
 
 # Request models
@@ -161,31 +167,38 @@ Respond with ONLY one word: "general" or "domain-specific"
 
 async def query_convex_knowledge(tool_name: str, query: str, limit: int = 5):
     """
-    Queries Convex scrapedata database for relevant knowledge chunks.
-    Uses simple text search for now (can be upgraded to vector search).
+    Queries Convex for relevant knowledge chunks (doc_chunks by default,
+    see KNOWLEDGE_SEARCH_PATH), then KNOWLEDGE_FALLBACK_PATH if that finds
+    nothing. Uses simple text search for now (can be upgraded to vector
+    search).
     """
+    paths = [KNOWLEDGE_SEARCH_PATH]
+    if KNOWLEDGE_FALLBACK_PATH and KNOWLEDGE_FALLBACK_PATH != KNOWLEDGE_SEARCH_PATH:
+        paths.append(KNOWLEDGE_FALLBACK_PATH)
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{CONVEX_URL}/api/query",
-                json={
-                    "path": "knowledge:searchKnowledge",
-                    "args": {
-                        "query": query,
-                        "tool_name": tool_name,
-                        "limit": limit
+            for path in paths:
+                response = await client.post(
+                    f"{CONVEX_URL}/api/query",
+                    json={
+                        "path": path,
+                        "args": {
+                            "query": query,
+                            "tool_name": tool_name,
+                            "limit": limit
+                        }
                     }
-                }
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                chunks = data.get("value", [])
-                print(f"Retrieved {len(chunks)} chunks from scrapedata for {tool_name}")
-                return chunks
-            else:
-                print(f"Convex query failed: {response.status_code} - {response.text}")
-                return []
+                )
+
+                if response.status_code == 200:
+                    data = response.json()
+                    chunks = data.get("value", [])
+                    print(f"Retrieved {len(chunks)} chunks from {path} for {tool_name}")
+                    if chunks:
+                        return chunks
+                else:
+                    print(f"Convex query failed: {response.status_code} - {response.text}")
+            return []
     except Exception as e:
         print(f"Error querying Convex scrapedata: {e}")
         return []
@@ -212,7 +225,10 @@ Key principles:
     if tool_name and knowledge_chunks:
         system += f"\n\nYou are currently helping with {tool_name}. Use the following knowledge base:\n\n"
         for i, chunk in enumerate(knowledge_chunks, 1):
-            system += f"[Source {i}]\n{chunk.get('content', '')[:500]}...\n\n"
+            content = chunk.get('content', '')
+            if len(content) > MAX_SOURCE_CHARS:
+                content = content[:MAX_SOURCE_CHARS] + "..."
+            system += f"[Source {i}]\n{content}\n\n"
 
     # Add page context
     system += f"\n\nCurrent page context:\n{context_text[:2000]}\n"